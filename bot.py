@@ -1,10 +1,21 @@
 import discord
 from discord.ext import commands
 import os
+import sys
+import ast
 import asyncio
+import importlib
+import time
 import json
+import hashlib
+import aiohttp
+from datetime import datetime
 from dotenv import load_dotenv
 import logging
+from utils.userdata_store import UserdataStore
+from utils.scheduler import Scheduler
+from utils.handoff import signal_ready
+from utils.metrics import CommandMetrics, InstrumentedCommandTree, MetricsServer, install_response_timing
 
 
 # Load environment variables từ .env (chỉ dùng khi không có trong system env)
@@ -18,6 +29,57 @@ logging.basicConfig(
 )
 
 COMMAND_IGNORE_FILE = "data/command_ignore.json"
+COMMAND_SYNC_FILE = "data/command_sync.json"
+
+# Userdata database (SQLite WAL, ghi theo batch)
+USERDATA_DB_FILE = os.environ.get('USERDATA_DB_FILE') or os.getenv('USERDATA_DB_FILE', 'data/userdata.db')
+USERDATA_FLUSH_INTERVAL = float(os.environ.get('USERDATA_FLUSH_INTERVAL') or os.getenv('USERDATA_FLUSH_INTERVAL', '2'))
+USERDATA_CACHE_SIZE = int(os.environ.get('USERDATA_CACHE_SIZE') or os.getenv('USERDATA_CACHE_SIZE', '4096'))
+
+# Thời gian tối đa cho import/setup của một cog, và ngưỡng đánh dấu cog chậm (giây)
+COG_LOAD_TIMEOUT = float(os.environ.get('COG_LOAD_TIMEOUT') or os.getenv('COG_LOAD_TIMEOUT', '60'))
+COG_SLOW_THRESHOLD = float(os.environ.get('COG_SLOW_THRESHOLD') or os.getenv('COG_SLOW_THRESHOLD', '1'))
+
+# Đặt FORCE_COMMAND_SYNC=true để luôn sync lại slash commands khi khởi động
+FORCE_COMMAND_SYNC = (os.environ.get('FORCE_COMMAND_SYNC') or os.getenv('FORCE_COMMAND_SYNC', 'false')).lower() == 'true'
+
+# Cấu hình connection pool dùng chung cho mọi HTTP request ra ngoài (GitHub, webhook, Steam...)
+HTTP_POOL_LIMIT = int(os.environ.get('HTTP_POOL_LIMIT') or os.getenv('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.environ.get('HTTP_POOL_LIMIT_PER_HOST') or os.getenv('HTTP_POOL_LIMIT_PER_HOST', '10'))
+HTTP_DNS_CACHE_TTL = int(os.environ.get('HTTP_DNS_CACHE_TTL') or os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+HTTP_KEEPALIVE_TIMEOUT = float(os.environ.get('HTTP_KEEPALIVE_TIMEOUT') or os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+HTTP_TIMEOUT_TOTAL = float(os.environ.get('HTTP_TIMEOUT_TOTAL') or os.getenv('HTTP_TIMEOUT_TOTAL', '30'))
+HTTP_TIMEOUT_CONNECT = float(os.environ.get('HTTP_TIMEOUT_CONNECT') or os.getenv('HTTP_TIMEOUT_CONNECT', '10'))
+
+# Endpoint Prometheus cho metrics của slash commands (METRICS_PORT=0 để tắt)
+METRICS_HOST = os.environ.get('METRICS_HOST') or os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT') or os.getenv('METRICS_PORT', '9464'))
+
+def preload_cog_imports(path):
+    """Đọc COG_DEPENDENCIES và import các module ở top-level của file cog mà không chạy file đó
+
+    Chạy trong worker thread. Trả về danh sách COG_DEPENDENCIES (list rỗng nếu không khai báo).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    
+    dependencies = []
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.append(node.module)
+        elif isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == 'COG_DEPENDENCIES' for target in node.targets
+        ):
+            dependencies = list(ast.literal_eval(node.value))
+    
+    for module in modules:
+        if not module.startswith('cogs.'):
+            importlib.import_module(module)
+    return dependencies
+
 
 class DiscordBot(commands.Bot):
     def __init__(self):
@@ -36,7 +98,8 @@ class DiscordBot(commands.Bot):
         super().__init__(
             command_prefix='!',
             intents=intents,
-            application_id=application_id
+            application_id=application_id,
+            tree_cls=InstrumentedCommandTree
         )
         
         self.guild_id = guild_id
@@ -45,6 +108,30 @@ class DiscordBot(commands.Bot):
         
         self._commands_added = False
         self.ignored_commands = self._load_ignored_commands()
+        
+        # Session HTTP dùng chung, được tạo trong setup_hook và đóng trong close()
+        self.http_session: aiohttp.ClientSession | None = None
+        
+        # Userdata store, được mở trong setup_hook và flush/đóng trong close()
+        self.userdata_database = UserdataStore(
+            USERDATA_DB_FILE,
+            flush_interval=USERDATA_FLUSH_INTERVAL,
+            cache_size=USERDATA_CACHE_SIZE
+        )
+        
+        # Scheduler theo giờ thực, cogs đăng ký job qua self.scheduler.add_job(...)
+        self.scheduler = Scheduler(self)
+        
+        # Metrics của slash commands (latency, TTFR, lỗi, timeout), xem /metrics
+        install_response_timing()
+        self.metrics = CommandMetrics()
+        self.metrics_server = MetricsServer(self.metrics, METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+        
+        # Thông tin đo thời gian khởi động
+        self.started_at = time.perf_counter()
+        self.cog_load_report = {}
+        self.cog_load_total = 0.0
+        self.ready_after = None
     
     def _load_ignored_commands(self):
         """Load danh sách commands bị ignore từ file JSON"""
@@ -75,55 +162,251 @@ class DiscordBot(commands.Bot):
         base_name = command_name.replace("dev_", "", 1) if command_name.startswith("dev_") else command_name
         return base_name in self.ignored_commands or command_name in self.ignored_commands
         
-    def userdata(self):
+    def userdata(self) -> UserdataStore:
         return self.userdata_database
     
-    def get_userdata(self,user_id, variable):
+    async def get_userdata(self, user_id, variable):
         try:
-            cursor = self.userdata().cursor()
-            cursor.execute("SELECT value FROM userdata WHERE user_id = ? AND variable = ?", (user_id, variable))
-            result = cursor.fetchone()
+            value = await self.userdata().get(user_id, variable)
             # return [user name, variable, value,status]
-            return [self.user.name, variable, result[0], "success"] if result else [self.user.name, variable, None, "error"]
+            return [self.user.name, variable, value, "success"] if value is not None else [self.user.name, variable, None, "error"]
         except Exception as e:
             logging.error(f"Lỗi khi get userdata cho {self.user.name} với {variable}: {e}")
             return [self.user.name, variable, None, "error"]
 
-    def set_userdata(self,user_id, variable, value):
+    async def set_userdata(self, user_id, variable, value):
         try:
-            cursor = self.userdata().cursor()
-            cursor.execute("INSERT INTO userdata (user_id, variable, value) VALUES (?, ?, ?) ON CONFLICT(user_id, variable) DO UPDATE SET value = ?", (user_id, variable, value, value))
-            self.userdata().commit()
-            #  return [self.user.name, variable, value, "success"]
+            # Ghi vào bộ đệm, được flush theo batch bởi UserdataStore
+            self.userdata().set(user_id, variable, value)
             return [self.user.name, variable, value, "success"]
         except Exception as e:
             logging.error(f"Lỗi khi set userdata cho {self.user.name} với {variable}: {e}")
             return [self.user.name, variable, value, "error"]
 
+    async def get_userdata_bulk(self, keys):
+        """Đọc nhiều userdata cùng lúc: keys là list (user_id, variable), trả về dict"""
+        return await self.userdata().get_many(keys)
+
+    def set_userdata_bulk(self, items):
+        """Ghi nhiều userdata cùng lúc: items là dict {(user_id, variable): value}"""
+        self.userdata().set_many(items)
+
+    def _create_http_session(self) -> aiohttp.ClientSession:
+        """Tạo ClientSession với connection pool, keep-alive và DNS cache"""
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+        )
+        timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT_TOTAL, connect=HTTP_TIMEOUT_CONNECT)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
     async def setup_hook(self):
         """Called when the bot is starting up"""
         logging.info(f'{self.user} đã đăng nhập!')
+        self.http_session = self._create_http_session()
+        logging.info(f"🌐 Đã tạo HTTP session dùng chung (pool: {HTTP_POOL_LIMIT}, mỗi host: {HTTP_POOL_LIMIT_PER_HOST})")
+        await self.userdata_database.open()
+        self.scheduler.start()
+        if self.metrics_server:
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                logging.error(f"❌ Không mở được metrics endpoint {METRICS_HOST}:{METRICS_PORT}: {e}")
+                self.metrics_server = None
         await self.load_cogs()
+
+    async def close(self):
+        """Đóng HTTP session dùng chung và flush userdata trước khi tắt bot"""
+        try:
+            await self.scheduler.stop()
+            await super().close()
+        finally:
+            if self.metrics_server:
+                await self.metrics_server.stop()
+            if self.http_session and not self.http_session.closed:
+                await self.http_session.close()
+                logging.info("🌐 Đã đóng HTTP session dùng chung")
+            try:
+                await self.userdata_database.close()
+            except Exception as e:
+                logging.error(f"❌ Lỗi khi đóng userdata database: {e}")
         
+    def _discover_cogs(self):
+        """Danh sách tên cog (tên file không có .py) trong thư mục cogs"""
+        return sorted(
+            filename[:-3] for filename in os.listdir('./cogs')
+            if filename.endswith('.py') and not filename.startswith('__')
+        )
+    
+    async def _import_cog(self, name):
+        """Import trước các module mà cog dùng (trong worker thread), đo thời gian và đọc COG_DEPENDENCIES
+        
+        Bản thân module cog không được import ở đây (load_extension sẽ chạy nó đúng một lần),
+        chỉ các import ở top-level của nó (discord, aiohttp, PIL, utils...) được nạp sẵn vào sys.modules.
+        """
+        entry = self.cog_load_report[name]
+        started = time.perf_counter()
+        try:
+            entry['dependencies'] = await asyncio.wait_for(
+                asyncio.to_thread(preload_cog_imports, os.path.join('cogs', f'{name}.py')),
+                timeout=COG_LOAD_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            entry['status'] = 'timeout'
+            entry['error'] = f'Import quá {COG_LOAD_TIMEOUT:.0f}s'
+        except Exception as e:
+            entry['status'] = 'import_failed'
+            entry['error'] = f'{type(e).__name__}: {e}'
+            logging.exception(e)
+        finally:
+            entry['import_time'] = time.perf_counter() - started
+    
+    async def _discard_partial_cog(self, name):
+        """Gỡ phần cog đã đăng ký khi load_extension bị huỷ giữa chừng (timeout)"""
+        key = f'cogs.{name}'
+        if key in self.extensions:
+            await self.unload_extension(key)
+            return
+        for cog_name, cog in list(self.cogs.items()):
+            if type(cog).__module__ == key:
+                await self.remove_cog(cog_name)
+        sys.modules.pop(key, None)
+    
+    async def _setup_cog(self, name):
+        """Chạy load_extension (module cog + setup()) cho một cog và đo thời gian"""
+        entry = self.cog_load_report[name]
+        started = time.perf_counter()
+        try:
+            logging.info(f'⏳ Đang load cog: {name}.py...')
+            await asyncio.wait_for(self.load_extension(f'cogs.{name}'), timeout=COG_LOAD_TIMEOUT)
+            entry['status'] = 'loaded'
+            logging.info(f'✅ Đã load cog: {name}.py')
+        except asyncio.TimeoutError:
+            entry['status'] = 'timeout'
+            entry['error'] = f'setup() quá {COG_LOAD_TIMEOUT:.0f}s'
+            logging.error(f'❌ Load cog {name}.py quá thời gian')
+            await self._discard_partial_cog(name)
+        except Exception as e:
+            entry['status'] = 'setup_failed'
+            entry['error'] = f'{type(e).__name__}: {e}'
+            logging.error(f'❌ Lỗi load cog {name}.py: {e}')
+            logging.exception(e)
+        finally:
+            entry['setup_time'] = time.perf_counter() - started
+    
+    def _resolve_cog_levels(self, names):
+        """Chia cogs thành các tầng theo COG_DEPENDENCIES (cogs cùng tầng load song song)"""
+        remaining = {
+            name: set(self.cog_load_report[name]['dependencies'])
+            for name in names
+        }
+        levels = []
+        done = set()
+        while remaining:
+            level = sorted(name for name, deps in remaining.items() if deps <= done)
+            if not level:
+                # Còn lại đều là vòng lặp hoặc phụ thuộc cog không tồn tại
+                for name, deps in remaining.items():
+                    entry = self.cog_load_report[name]
+                    entry['status'] = 'skipped'
+                    entry['error'] = f"Dependency không hợp lệ: {', '.join(sorted(deps - done))}"
+                break
+            levels.append(level)
+            done.update(level)
+            for name in level:
+                del remaining[name]
+        return levels
+    
     async def load_cogs(self):
-        """Load all cogs from cogs folder"""
+        """Load all cogs from cogs folder
+        
+        Import trước các dependency của tất cả cogs song song, sau đó chạy setup() theo từng tầng dependency.
+        Kết quả đo thời gian được lưu trong self.cog_load_report.
+        """
         logging.info("="*60)
         logging.info("BẮT ĐẦU LOAD COGS")
         logging.info("="*60)
         
-        for filename in os.listdir('./cogs'):
-            if filename.endswith('.py') and not filename.startswith('__'):
-                try:
-                    logging.info(f'⏳ Đang load cog: {filename}...')
-                    await self.load_extension(f'cogs.{filename[:-3]}')
-                    logging.info(f'✅ Đã load cog: {filename}')
-                except Exception as e:
-                    logging.error(f'❌ Lỗi load cog {filename}: {e}')
-                    logging.exception(e)
+        started = time.perf_counter()
+        names = self._discover_cogs()
+        self.cog_load_report = {
+            name: {
+                'name': name,
+                'status': 'pending',
+                'dependencies': [],
+                'import_time': 0.0,
+                'setup_time': 0.0,
+                'error': None
+            }
+            for name in names
+        }
+        
+        # Phase 1: import song song trong worker threads
+        await asyncio.gather(*(self._import_cog(name) for name in names))
+        importable = [name for name in names if self.cog_load_report[name]['status'] == 'pending']
+        
+        # Phase 2: setup() theo tầng, cogs không phụ thuộc nhau chạy đồng thời
+        loaded = set()
+        for level in self._resolve_cog_levels(importable):
+            ready = []
+            for name in level:
+                entry = self.cog_load_report[name]
+                failed_deps = [dep for dep in entry['dependencies'] if dep not in loaded]
+                if failed_deps:
+                    entry['status'] = 'skipped'
+                    entry['error'] = f"Dependency load thất bại: {', '.join(failed_deps)}"
+                    logging.error(f'❌ Bỏ qua cog {name}.py: {entry["error"]}')
+                else:
+                    ready.append(name)
+            await asyncio.gather(*(self._setup_cog(name) for name in ready))
+            loaded.update(name for name in ready if self.cog_load_report[name]['status'] == 'loaded')
+        
+        self.cog_load_total = time.perf_counter() - started
+        self.log_startup_report()
         
         logging.info("="*60)
         logging.info("HOÀN TẤT LOAD COGS")
         logging.info("="*60)
+    
+    def format_startup_report(self):
+        """Trả về các dòng báo cáo thời gian load cogs (chậm nhất lên đầu)"""
+        status_icons = {
+            'loaded': '✅',
+            'import_failed': '❌',
+            'setup_failed': '❌',
+            'timeout': '⏱',
+            'skipped': '⏭',
+            'pending': '⏳'
+        }
+        entries = sorted(
+            self.cog_load_report.values(),
+            key=lambda e: e['import_time'] + e['setup_time'],
+            reverse=True
+        )
+        lines = []
+        for entry in entries:
+            total = entry['import_time'] + entry['setup_time']
+            slow = " 🐢" if total >= COG_SLOW_THRESHOLD else ""
+            line = (
+                f"{status_icons.get(entry['status'], '❔')} {entry['name']}: "
+                f"import {entry['import_time'] * 1000:.0f}ms | setup {entry['setup_time'] * 1000:.0f}ms{slow}"
+            )
+            if entry['error']:
+                line += f" — {entry['error']}"
+            lines.append(line)
+        return lines
+    
+    def log_startup_report(self):
+        """Ghi báo cáo thời gian load cogs ra log"""
+        logging.info(f"📊 Startup report - load {len(self.cog_load_report)} cogs trong {self.cog_load_total:.2f}s")
+        for line in self.format_startup_report():
+            logging.info(f"  {line}")
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        """Ghi metrics khi slash command chạy xong không lỗi (lỗi được ghi trong tree.on_error)"""
+        self.metrics.finish(interaction)
 
     async def on_ready(self):
         """Called when bot is ready"""
@@ -146,47 +429,7 @@ class DiscordBot(commands.Bot):
         # Sync slash commands to guild for faster testing (chỉ sync một lần)
         if not self._commands_added:
             try:
-                # Clear global commands trước (để tránh conflict)
-                self.tree.clear_commands(guild=None)
-                await self.tree.sync()  # Sync empty global commands
-                logging.info("Đã xóa global commands")
-                
-                # Debug: kiểm tra số lượng commands trong tree
-                guild_obj = discord.Object(id=self.guild_id)
-                all_commands = self.tree.get_commands(guild=guild_obj)
-                global_commands = self.tree.get_commands()
-                
-                logging.info(f"Debug: {len(all_commands)} commands trong guild tree")
-                logging.info(f"Debug: {len(global_commands)} commands trong global tree")
-                
-                # Filter out ignored commands
-                commands_to_sync = []
-                ignored_count = 0
-                
-                for cmd in all_commands:
-                    if self.is_command_ignored(cmd.name):
-                        logging.warning(f"🚫 Bỏ qua command: {cmd.name} (trong ignore list)")
-                        ignored_count += 1
-                    else:
-                        commands_to_sync.append(cmd)
-                        logging.info(f"✅ Command sẽ sync: {cmd.name}")
-                
-                # Xóa tất cả commands và chỉ thêm lại những commands không bị ignore
-                self.tree.clear_commands(guild=guild_obj)
-                for cmd in commands_to_sync:
-                    self.tree.add_command(cmd, guild=guild_obj)
-                
-                # Sync guild commands
-                synced_guild = await self.tree.sync(guild=guild_obj)
-                
-                logging.info(f"Đã sync {len(synced_guild)} guild commands tới guild {self.guild_id}")
-                if ignored_count > 0:
-                    logging.info(f"🚫 Đã bỏ qua {ignored_count} commands")
-                
-                # List all guild commands
-                for cmd in synced_guild:
-                    logging.info(f"  - /{cmd.name}: {cmd.description}")
-                    
+                await self.sync_commands(force=FORCE_COMMAND_SYNC)
                 self._commands_added = True
                 
                 logging.info("="*60)
@@ -196,6 +439,122 @@ class DiscordBot(commands.Bot):
             except Exception as e:
                 logging.error(f"Lỗi khi sync guild commands: {e}")
                 logging.exception(e)
+        
+        # Báo cho process cũ (deploy handoff) / systemd rằng bot mới đã phục vụ được.
+        # Gửi cả khi sync lỗi (ví dụ 429): bot đã login và load cogs, commands đã đăng ký từ trước vẫn chạy,
+        # còn Type=notify mà không nhận READY=1 thì systemd sẽ kill bot sau TimeoutStartSec.
+        if self.ready_after is None:
+            self.ready_after = time.perf_counter() - self.started_at
+            logging.info(f"⏱  Thời gian từ lúc khởi động tới khi sẵn sàng: {self.ready_after:.2f}s")
+            signal_ready()
+    
+    def _load_sync_state(self):
+        """Đọc fingerprint của lần sync commands gần nhất"""
+        try:
+            if os.path.exists(COMMAND_SYNC_FILE):
+                with open(COMMAND_SYNC_FILE, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.warning(f"⚠️  Không đọc được {COMMAND_SYNC_FILE}: {e}")
+        return {}
+    
+    def _save_sync_state(self, fingerprint, command_names):
+        """Lưu fingerprint sau khi sync thành công"""
+        try:
+            os.makedirs("data", exist_ok=True)
+            state = {
+                'application_id': self.application_id,
+                'guild_id': self.guild_id,
+                'fingerprint': fingerprint,
+                'commands': command_names,
+                'synced_at': datetime.now().isoformat()
+            }
+            tmp_path = f"{COMMAND_SYNC_FILE}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, COMMAND_SYNC_FILE)
+        except Exception as e:
+            logging.error(f"❌ Lỗi khi lưu {COMMAND_SYNC_FILE}: {e}")
+    
+    def compute_command_fingerprint(self, commands_to_sync):
+        """Tính fingerprint từ payload của các commands sẽ sync (global luôn rỗng)"""
+        payloads = sorted(
+            (cmd.to_dict(self.tree) for cmd in commands_to_sync),
+            key=lambda payload: payload['name']
+        )
+        raw = json.dumps(
+            {
+                'application_id': self.application_id,
+                'guild_id': self.guild_id,
+                'global': [],
+                'guild': payloads
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    async def sync_commands(self, force: bool = False):
+        """Sync slash commands lên Discord, bỏ qua nếu fingerprint không đổi
+        
+        Args:
+            force: True để luôn sync lại dù fingerprint giống lần trước
+        
+        Returns:
+            bool: True nếu đã gọi API sync, False nếu bỏ qua
+        """
+        # Clear global commands trong tree local (để tránh conflict)
+        self.tree.clear_commands(guild=None)
+        
+        guild_obj = discord.Object(id=self.guild_id)
+        all_commands = self.tree.get_commands(guild=guild_obj)
+        logging.info(f"Debug: {len(all_commands)} commands trong guild tree")
+        
+        # Filter out ignored commands
+        commands_to_sync = []
+        ignored_count = 0
+        
+        for cmd in all_commands:
+            if self.is_command_ignored(cmd.name):
+                logging.warning(f"🚫 Bỏ qua command: {cmd.name} (trong ignore list)")
+                ignored_count += 1
+            else:
+                commands_to_sync.append(cmd)
+                logging.info(f"✅ Command sẽ sync: {cmd.name}")
+        
+        # Xóa tất cả commands và chỉ thêm lại những commands không bị ignore
+        self.tree.clear_commands(guild=guild_obj)
+        for cmd in commands_to_sync:
+            self.tree.add_command(cmd, guild=guild_obj)
+        
+        if ignored_count > 0:
+            logging.info(f"🚫 Đã bỏ qua {ignored_count} commands")
+        
+        fingerprint = self.compute_command_fingerprint(commands_to_sync)
+        previous = self._load_sync_state().get('fingerprint')
+        
+        if not force and previous == fingerprint:
+            logging.info(f"⏭  Command tree không đổi (fingerprint {fingerprint[:12]}), bỏ qua sync")
+            return False
+        
+        if force:
+            logging.info("🔁 Force sync commands")
+        
+        # Sync empty global commands
+        await self.tree.sync()
+        logging.info("Đã xóa global commands")
+        
+        # Sync guild commands
+        synced_guild = await self.tree.sync(guild=guild_obj)
+        logging.info(f"Đã sync {len(synced_guild)} guild commands tới guild {self.guild_id}")
+        
+        # List all guild commands
+        for cmd in synced_guild:
+            logging.info(f"  - /{cmd.name}: {cmd.description}")
+        
+        self._save_sync_state(fingerprint, sorted(cmd.name for cmd in commands_to_sync))
+        return True
     
     # Built-in slash command callbacks
     async def _botinfo_callback(self, interaction: discord.Interaction):
@@ -1,135 +1,326 @@
-import discord
-from discord import app_commands
-from discord.ext import commands
-import os
-import json
-import logging
-from dotenv import load_dotenv
-from utils.command_helper import get_command_name
-
-# Load environment variables từ .env (chỉ dùng khi không có trong system env)
-load_dotenv()
-
-# Ưu tiên lấy từ system environment variables
-GUILD_ID = int(os.environ.get('GUILD_ID') or os.getenv('GUILD_ID'))
-OWNER_ID = int(os.environ.get('OWNER_ID') or os.getenv('OWNER_ID'))
-
-class AddImage(commands.Cog):
-    
-    def __init__(self, bot):
-        self.bot = bot
-        # Tạo command với tên động
-        self.add_all_images_cmd = app_commands.Command(
-            name=get_command_name("add_all_images"),
-            description="Add all images from image folder as emojis and create JSON output",
-            callback=self.add_all_images_callback
-        )
-        self.bot.tree.add_command(self.add_all_images_cmd, guild=discord.Object(id=GUILD_ID))
-    
-    async def cog_unload(self):
-        self.bot.tree.remove_command(self.add_all_images_cmd.name, guild=discord.Object(id=GUILD_ID))
-    
-    async def add_all_images_callback(self, interaction: discord.Interaction):
-        # Check if user is owner or admin
-        if interaction.user.id != OWNER_ID:
-            await interaction.response.send_message("❌ Chỉ owner mới được dùng lệnh này!", ephemeral=True)
-            return
-        
-        # Defer the response since this might take time
-        await interaction.response.defer()
-        
-        # Path to image folder
-        image_folder = './image'
-        
-        if not os.path.exists(image_folder):
-            await interaction.followup.send("❌ Thư mục 'image' không tồn tại!")
-            return
-        
-        # Get all image files
-        image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
-        image_files = [f for f in os.listdir(image_folder) if f.lower().endswith(image_extensions)]
-        
-        if not image_files:
-            await interaction.followup.send("❌ Không tìm thấy file ảnh nào trong thư mục 'image'!")
-            return
-        
-        # Prepare JSON data
-        emoji_data = []
-        
-        # Add emojis
-        added_count = 0
-        failed_count = 0
-        
-        for image_file in image_files:
-            try:
-                # Create emoji name from filename (lowercase, remove extension, replace spaces with underscores)
-                emoji_name = os.path.splitext(image_file)[0].lower().replace(' ', '_').replace('-', '_')
-                
-                # Ensure emoji name is valid (alphanumeric + underscores, max 32 chars)
-                emoji_name = ''.join(c for c in emoji_name if c.isalnum() or c == '_')[:32]
-                
-                # Skip if name is empty or starts with number
-                if not emoji_name or emoji_name[0].isdigit():
-                    emoji_name = f"emoji_{added_count}"
-                
-                # Full path to image
-                image_path = os.path.join(image_folder, image_file)
-                
-                # Create emoji (for bot application)
-                with open(image_path, 'rb') as image:
-                    emoji = await self.bot.create_application_emoji(
-                        name=emoji_name,
-                        image=image.read()
-                    )
-                
-                # Add to JSON data
-                emoji_data.append({
-                    "filename": image_file,
-                    "emoji_name": emoji_name,
-                    "emoji_id": str(emoji.id),
-                    "emoji_mention": f"<:{emoji_name}:{emoji.id}>"
-                })
-                
-                added_count += 1
-                
-            except Exception as e:
-                failed_count += 1
-                logging.error(f"❌ Lỗi khi thêm emoji {image_file}: {e}")
-        
-        # Create JSON output
-        json_output = {
-            "total_images": len(image_files),
-            "added_emojis": added_count,
-            "failed_emojis": failed_count,
-            "emojis": emoji_data
-        }
-        
-        # Save JSON to file
-        json_filename = "emoji_data.json"
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(json_output, f, indent=2, ensure_ascii=False)
-        
-        # Send summary
-        summary = f"✅ Đã thêm {added_count} emoji thành công!\n"
-        if failed_count > 0:
-            summary += f"❌ {failed_count} emoji thất bại.\n"
-        summary += f"📄 File JSON đã được tạo: {json_filename}"
-        
-        # Send the JSON file
-        try:
-            await interaction.followup.send(
-                content=summary,
-                file=discord.File(json_filename)
-            )
-        except Exception as e:
-            # If file sending fails, send JSON as text
-            json_text = json.dumps(json_output, indent=2, ensure_ascii=False)
-            if len(json_text) > 2000:
-                json_text = json_text[:1997] + "..."
-            
-            await interaction.followup.send(
-                content=f"{summary}\n\n```json\n{json_text}\n```"
-            )
-
-async def setup(bot):
-    await bot.add_cog(AddImage(bot))
+import discord
+from discord import app_commands
+from discord.ext import commands
+import os
+import json
+import random
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from utils.command_helper import get_command_name
+from utils.image_preprocess import preprocess_image
+from utils.image_manifest import ImageManifest
+
+# Load environment variables từ .env (chỉ dùng khi không có trong system env)
+load_dotenv()
+
+# Ưu tiên lấy từ system environment variables
+GUILD_ID = int(os.environ.get('GUILD_ID') or os.getenv('GUILD_ID'))
+OWNER_ID = int(os.environ.get('OWNER_ID') or os.getenv('OWNER_ID'))
+EMOJI_UPLOAD_CONCURRENCY = int(os.environ.get('EMOJI_UPLOAD_CONCURRENCY') or os.getenv('EMOJI_UPLOAD_CONCURRENCY', '3'))
+EMOJI_UPLOAD_MAX_RETRIES = int(os.environ.get('EMOJI_UPLOAD_MAX_RETRIES') or os.getenv('EMOJI_UPLOAD_MAX_RETRIES', '5'))
+EMOJI_PREPROCESS_WORKERS = int(os.environ.get('EMOJI_PREPROCESS_WORKERS') or os.getenv('EMOJI_PREPROCESS_WORKERS', str(min(4, os.cpu_count() or 1))))
+EMOJI_UPLOAD_BACKOFF = 1.0
+EMOJI_PROGRESS_INTERVAL = 3.0
+EMOJI_DATA_FILE = "emoji_data.json"
+
+class AddImage(commands.Cog):
+    
+    def __init__(self, bot):
+        self.bot = bot
+        # Manifest ảnh -> emoji, cogs khác có thể tra cứu qua self.manifest.resolve(filename)
+        self.manifest = ImageManifest().load()
+        # Process pool resize ảnh, tạo lần đầu dùng và giữ cho tới khi unload cog
+        self._preprocess_pool = None
+        # Lưu tiến độ định kỳ và lần lưu cuối cùng ghi chung file tạm -> không cho chạy chồng lên nhau
+        self._save_lock = asyncio.Lock()
+        # Tạo command với tên động
+        self.add_all_images_cmd = app_commands.Command(
+            name=get_command_name("add_all_images"),
+            description="Add all images from image folder as emojis and create JSON output",
+            callback=self.add_all_images_callback
+        )
+        self.bot.tree.add_command(self.add_all_images_cmd, guild=discord.Object(id=GUILD_ID))
+    
+    async def cog_unload(self):
+        self.bot.tree.remove_command(self.add_all_images_cmd.name, guild=discord.Object(id=GUILD_ID))
+        if self._preprocess_pool:
+            # Không chờ worker trên event loop, ảnh còn trong hàng đợi bị huỷ
+            self._preprocess_pool.shutdown(wait=False, cancel_futures=True)
+            self._preprocess_pool = None
+        # Lưu tiến độ định kỳ và lần lưu cuối cùng ghi chung file tạm -> không cho chạy chồng lên nhau
+        self._save_lock = asyncio.Lock()
+    
+    def get_preprocess_pool(self):
+        """Process pool dùng chung cho mọi lần chạy lệnh
+        
+        Dùng forkserver/spawn thay vì fork: process bot có nhiều thread (userdata, price history...)
+        nên fork trực tiếp từ nó không an toàn.
+        """
+        if self._preprocess_pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._preprocess_pool = ProcessPoolExecutor(max_workers=EMOJI_PREPROCESS_WORKERS, mp_context=context)
+        return self._preprocess_pool
+    
+    def load_emoji_data(self):
+        """Đọc emoji_data.json của lần chạy trước"""
+        try:
+            if os.path.exists(EMOJI_DATA_FILE):
+                with open(EMOJI_DATA_FILE, 'r', encoding='utf-8') as f:
+                    return json.load(f).get('emojis', [])
+        except Exception as e:
+            logging.error(f"❌ Lỗi đọc {EMOJI_DATA_FILE}: {e}")
+        return []
+    
+    def _write_emoji_data(self, data):
+        tmp_path = f"{EMOJI_DATA_FILE}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, EMOJI_DATA_FILE)
+    
+    @staticmethod
+    def make_emoji_name(image_file, index):
+        """Tạo tên emoji hợp lệ từ tên file"""
+        # Create emoji name from filename (lowercase, remove extension, replace spaces with underscores)
+        emoji_name = os.path.splitext(image_file)[0].lower().replace(' ', '_').replace('-', '_')
+        
+        # Ensure emoji name is valid (alphanumeric + underscores, max 32 chars)
+        emoji_name = ''.join(c for c in emoji_name if c.isalnum() or c == '_')[:32]
+        
+        # Skip if name is empty or starts with number
+        if not emoji_name or emoji_name[0].isdigit():
+            emoji_name = f"emoji_{index}"
+        return emoji_name
+    
+    async def upload_emoji(self, name, image_bytes):
+        """Tạo application emoji, retry với exponential backoff khi bị rate limit hoặc lỗi server"""
+        for attempt in range(EMOJI_UPLOAD_MAX_RETRIES + 1):
+            try:
+                return await self.bot.create_application_emoji(name=name, image=image_bytes)
+            except discord.RateLimited as e:
+                if attempt == EMOJI_UPLOAD_MAX_RETRIES:
+                    raise
+                delay = e.retry_after
+            except discord.HTTPException as e:
+                if (e.status != 429 and e.status < 500) or attempt == EMOJI_UPLOAD_MAX_RETRIES:
+                    raise
+                delay = EMOJI_UPLOAD_BACKOFF * (2 ** attempt)
+            delay = min(delay, 60) + random.uniform(0, 0.5)
+            logging.warning(f"⏳ Upload emoji {name} bị giới hạn, thử lại sau {delay:.1f}s (lần {attempt + 1})")
+            await asyncio.sleep(delay)
+    
+    def seed_manifest_from_emoji_data(self, current):
+        """Lần đầu dùng manifest: nhận lại các emoji đã ghi trong emoji_data.json để không upload lại"""
+        seeded = 0
+        for entry in self.load_emoji_data():
+            file_entry = current.get(entry.get('filename'))
+            if not file_entry or not entry.get('emoji_id') or file_entry['hash'] in self.manifest.emojis:
+                continue
+            self.manifest.set_emoji(file_entry['hash'], entry['emoji_name'], entry['emoji_id'])
+            seeded += 1
+        if seeded:
+            logging.info(f"📄 Đã nhận {seeded} emoji có sẵn từ {EMOJI_DATA_FILE}")
+    
+    async def delete_emoji(self, content_hash):
+        """Xóa application emoji của một nội dung không còn được dùng"""
+        emoji_info = self.manifest.remove_emoji(content_hash)
+        if not emoji_info:
+            return
+        try:
+            emoji = await self.bot.fetch_application_emoji(int(emoji_info['emoji_id']))
+            await emoji.delete()
+            logging.info(f"🗑  Đã xóa emoji cũ {emoji_info['emoji_name']}")
+        except discord.NotFound:
+            pass
+        except Exception as e:
+            logging.error(f"❌ Lỗi khi xóa emoji {emoji_info['emoji_name']}: {e}")
+    
+    async def save_outputs(self, total_images, failed_count):
+        """Lưu manifest và emoji_data.json, trả về nội dung JSON output"""
+        async with self._save_lock:
+            json_output = {
+                "total_images": total_images,
+                "added_emojis": len(self.manifest.emoji_entries()),
+                "failed_emojis": failed_count,
+                "emojis": self.manifest.emoji_entries()
+            }
+            # Serialize trên event loop (upload vẫn đang sửa manifest), worker thread chỉ ghi bytes
+            manifest_data = self.manifest.dumps()
+            emoji_data = json.dumps(json_output, indent=2, ensure_ascii=False).encode('utf-8')
+            # Huỷ coroutine không dừng được worker thread -> giữ lock cho tới khi thread ghi xong
+            write = asyncio.ensure_future(asyncio.to_thread(self._write_outputs, manifest_data, emoji_data))
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                await write
+                raise
+            return json_output
+    
+    def _write_outputs(self, manifest_data, emoji_data):
+        self.manifest.write(manifest_data)
+        self._write_emoji_data(emoji_data)
+    
+    async def add_all_images_callback(self, interaction: discord.Interaction):
+        # Check if user is owner or admin
+        if interaction.user.id != OWNER_ID:
+            await interaction.response.send_message("❌ Chỉ owner mới được dùng lệnh này!", ephemeral=True)
+            return
+        
+        # Defer the response since this might take time
+        await interaction.response.defer()
+        
+        # Path to image folder
+        image_folder = './image'
+        
+        if not os.path.exists(image_folder):
+            await interaction.followup.send("❌ Thư mục 'image' không tồn tại!")
+            return
+        
+        # Scan thư mục: chỉ hash lại các file có size/mtime thay đổi
+        image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+        current = await asyncio.to_thread(self.manifest.scan, image_folder, image_extensions)
+        
+        if not current:
+            await interaction.followup.send("❌ Không tìm thấy file ảnh nào trong thư mục 'image'!")
+            return
+        
+        if not self.manifest.files:
+            self.seed_manifest_from_emoji_data(current)
+        
+        delta = self.manifest.diff(current)
+        uploads = delta['uploads']
+        file_index = {name: index for index, name in enumerate(sorted(current))}
+        
+        # Giải phóng tên emoji của nội dung cũ không còn file nào dùng (vd: file bị sửa nội dung)
+        upload_names = {self.make_emoji_name(name, file_index[name]) for name in uploads.values()}
+        for content_hash in self.manifest.orphaned_emojis(current):
+            if self.manifest.emojis[content_hash]['emoji_name'] in upload_names:
+                await self.delete_emoji(content_hash)
+        
+        self.manifest.commit_files(current)
+        taken_names = {emoji['emoji_name'] for emoji in self.manifest.emojis.values()}
+        
+        logging.info(
+            f"🖼  Image delta: {len(delta['new'])} mới, {len(delta['changed'])} đổi nội dung, "
+            f"{len(delta['renamed'])} đổi tên, {len(delta['duplicates'])} trùng, {len(delta['unchanged'])} không đổi, "
+            f"{len(delta['removed'])} đã xóa -> {len(uploads)} cần upload"
+        )
+        
+        # Add emojis
+        added_count = 0
+        failed_count = 0
+        semaphore = asyncio.Semaphore(EMOJI_UPLOAD_CONCURRENCY)
+        
+        async def process(content_hash, image_file):
+            nonlocal added_count, failed_count
+            async with semaphore:
+                try:
+                    emoji_name = self.make_emoji_name(image_file, file_index[image_file])
+                    if emoji_name in taken_names:
+                        # Tên đã thuộc về nội dung khác vẫn còn được dùng -> thêm hậu tố hash
+                        emoji_name = f"{emoji_name[:25]}_{content_hash[:6]}"
+                    
+                    # Kiểm tra/resize ảnh trong process pool trước khi tốn một round trip lên Discord
+                    image_path = os.path.join(image_folder, image_file)
+                    prepared = await loop.run_in_executor(pool, preprocess_image, image_path)
+                    if not prepared['success']:
+                        raise ValueError(prepared['message'])
+                    if prepared['processed'] and not prepared['cached']:
+                        logging.info(f"🖼  Đã resize {image_file}: {prepared['message']}")
+                    
+                    # Đọc file ngoài event loop
+                    image_bytes = await asyncio.to_thread(read_file_bytes, prepared['path'])
+                    
+                    # Create emoji (for bot application)
+                    emoji = await self.upload_emoji(emoji_name, image_bytes)
+                    
+                    # Ghi vào manifest theo hash nội dung
+                    self.manifest.set_emoji(content_hash, emoji_name, emoji.id)
+                    
+                    added_count += 1
+                    
+                except Exception as e:
+                    failed_count += 1
+                    logging.error(f"❌ Lỗi khi thêm emoji {image_file}: {e}")
+        
+        def progress_text():
+            finished = added_count + failed_count
+            return (
+                f"⏳ Đang upload emoji: **{finished}/{len(uploads)}**\n"
+                f"✅ {added_count} thành công | ❌ {failed_count} thất bại | "
+                f"⏭ {len(current) - len(uploads)} không cần upload"
+            )
+        
+        async def report_progress():
+            # Cập nhật tiến độ và lưu manifest định kỳ để có thể resume
+            while True:
+                await asyncio.sleep(EMOJI_PROGRESS_INTERVAL)
+                try:
+                    await self.save_outputs(len(current), failed_count)
+                    await interaction.edit_original_response(content=progress_text())
+                except Exception as e:
+                    logging.warning(f"⚠️  Không thể cập nhật tiến độ: {e}")
+        
+        loop = asyncio.get_running_loop()
+        progress_task = asyncio.create_task(report_progress())
+        try:
+            if uploads:
+                pool = self.get_preprocess_pool()
+                await asyncio.gather(*(
+                    process(content_hash, image_file) for content_hash, image_file in uploads.items()
+                ))
+        finally:
+            progress_task.cancel()
+            # Chờ lần lưu tiến độ đang chạy dở (nếu có) kết thúc trước khi lưu lần cuối
+            try:
+                await progress_task
+            except asyncio.CancelledError:
+                pass
+        
+        # Save manifest + JSON output
+        json_filename = EMOJI_DATA_FILE
+        json_output = await self.save_outputs(len(current), failed_count)
+        
+        try:
+            await interaction.edit_original_response(content=progress_text().replace("⏳ Đang upload", "🏁 Đã upload"))
+        except Exception:
+            pass
+        
+        # Send summary
+        summary = f"✅ Đã thêm {added_count} emoji thành công!\n"
+        summary += (
+            f"🆕 {len(delta['new'])} mới | ✏️ {len(delta['changed'])} đổi nội dung | "
+            f"🔀 {len(delta['renamed'])} đổi tên | 👯 {len(delta['duplicates'])} trùng nội dung | "
+            f"⏭ {len(delta['unchanged'])} không đổi\n"
+        )
+        if failed_count > 0:
+            summary += f"❌ {failed_count} emoji thất bại (chạy lại lệnh để thử lại).\n"
+        summary += f"📄 File JSON đã được tạo: {json_filename}"
+        
+        # Send the JSON file
+        try:
+            await interaction.followup.send(
+                content=summary,
+                file=discord.File(json_filename)
+            )
+        except Exception as e:
+            # If file sending fails, send JSON as text
+            json_text = json.dumps(json_output, indent=2, ensure_ascii=False)
+            if len(json_text) > 2000:
+                json_text = json_text[:1997] + "..."
+            
+            await interaction.followup.send(
+                content=f"{summary}\n\n```json\n{json_text}\n```"
+            )
+
+
+def read_file_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+async def setup(bot):
+    await bot.add_cog(AddImage(bot))
@@ -0,0 +1,84 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import os
+from dotenv import load_dotenv
+from utils.command_helper import get_command_name
+
+# Load environment variables từ .env (chỉ dùng khi không có trong system env)
+load_dotenv()
+
+# Ưu tiên lấy từ system environment variables
+GUILD_ID = int(os.environ.get('GUILD_ID') or os.getenv('GUILD_ID'))
+
+
+class BotStatus(commands.Cog):
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Tạo command với tên động
+        self.startup_command = app_commands.Command(
+            name=get_command_name("startup"),
+            description="Xem báo cáo thời gian khởi động và load từng cog",
+            callback=self.startup_callback
+        )
+        self.bot.tree.add_command(self.startup_command, guild=discord.Object(id=GUILD_ID))
+        
+        self.metrics_command = app_commands.Command(
+            name=get_command_name("metrics"),
+            description="Xem thời gian chạy, lỗi và timeout của các slash commands",
+            callback=self.metrics_callback
+        )
+        self.bot.tree.add_command(self.metrics_command, guild=discord.Object(id=GUILD_ID))
+
+    async def cog_unload(self):
+        self.bot.tree.remove_command(self.startup_command.name, guild=discord.Object(id=GUILD_ID))
+        self.bot.tree.remove_command(self.metrics_command.name, guild=discord.Object(id=GUILD_ID))
+
+    async def startup_callback(self, interaction: discord.Interaction):
+        report = self.bot.cog_load_report
+        failed = [e for e in report.values() if e['status'] != 'loaded']
+
+        embed = discord.Embed(
+            title="📊 Startup Report",
+            description="\n".join(self.bot.format_startup_report())[:4000] or "Chưa có dữ liệu",
+            color=discord.Color.red() if failed else discord.Color.green()
+        )
+        embed.add_field(name="Cogs", value=f"{len(report) - len(failed)}/{len(report)} loaded", inline=True)
+        embed.add_field(name="Load cogs", value=f"{self.bot.cog_load_total:.2f}s", inline=True)
+        ready_text = f"{self.bot.ready_after:.2f}s" if self.bot.ready_after is not None else "Chưa sẵn sàng"
+        embed.add_field(name="Tới khi sẵn sàng", value=ready_text, inline=True)
+        embed.set_footer(text=f"Stage: {self.bot.stage}")
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    async def metrics_callback(self, interaction: discord.Interaction):
+        rows = self.bot.metrics.summary()
+
+        def seconds(value):
+            if value is None:
+                return "—"
+            return "> 300s" if value == float('inf') else f"{value:.2f}s"
+
+        embed = discord.Embed(
+            title="📈 Command Metrics",
+            description=None if rows else "Chưa có command nào chạy xong",
+            color=discord.Color.red() if any(row['errors'] or row['timeouts'] for row in rows) else discord.Color.blue()
+        )
+        for row in rows[:25]:
+            value = (
+                f"{row['count']} lần • TB {seconds(row['avg'])} • p50 ≤ {seconds(row['p50'])} • p95 ≤ {seconds(row['p95'])}\n"
+                f"Response đầu p95 ≤ {seconds(row['ttfr_p95'])} • ❌ {row['errors']} • ⏱ {row['timeouts']}"
+            )
+            if row['stages']:
+                value += "\n" + " • ".join(f"{stage} {seconds(avg)}" for stage, avg in row['stages'].items())
+            embed.add_field(name=f"/{row['command']}", value=value[:1024], inline=False)
+
+        server = self.bot.metrics_server
+        embed.set_footer(text=f"Prometheus: http://{server.host}:{server.port}/metrics" if server else "Prometheus endpoint: tắt")
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(BotStatus(bot))
@@ -3,11 +3,16 @@ from discord import app_commands
 from discord.ext import commands
 import os
 import json
-import aiohttp
+import time
+import asyncio
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
 from utils.clone_or_pull import clone_or_pull_repo
+from utils.repo_registry import RepoRegistry
+from utils.github_refresher import GitHubRefresher, GITHUB_API_URL, github_headers, repo_fields_from_api
+from utils.scheduler import every
+from utils.webhook_publisher import WebhookPublisher
 from utils.command_helper import get_command_name
 
 # Load environment variables từ .env (chỉ dùng khi không có trong system env)
@@ -20,6 +25,27 @@ WEBHOOK_URL = "https://discord.com/api/webhooks/1453237521583706195/gPrq4zU3OLe6
 REPOS_FILE = "data/github_repos.json"
 PROJECTS_DIR = "projects"
 
+# /syncall: số repo chạy git (clone/pull) và docker build cùng lúc, khoảng cách cập nhật embed (giây)
+SYNC_GIT_CONCURRENCY = int(os.environ.get('SYNC_GIT_CONCURRENCY') or os.getenv('SYNC_GIT_CONCURRENCY', '4'))
+SYNC_DOCKER_CONCURRENCY = int(os.environ.get('SYNC_DOCKER_CONCURRENCY') or os.getenv('SYNC_DOCKER_CONCURRENCY', '2'))
+SYNC_PROGRESS_INTERVAL = 3
+
+# Số repos mỗi tin nhắn webhook (giới hạn Discord: 25 fields và 6000 ký tự mỗi embed)
+WEBHOOK_REPOS_PER_PAGE = 15
+
+# /listrepos: số repos mỗi trang, thời gian các nút còn hoạt động (giây), các kiểu sắp xếp
+LIST_REPOS_PER_PAGE = 10
+LIST_VIEW_TIMEOUT = 600
+LIST_SORT_OPTIONS = {
+    'added': "Mới thêm",
+    'stars': "Stars",
+    'language': "Ngôn ngữ"
+}
+
+# Chu kỳ làm mới metadata (stars, forks, issues...) của các repo từ GitHub API (phút)
+GITHUB_REFRESH_INTERVAL_MINUTES = int(os.environ.get('GITHUB_REFRESH_INTERVAL_MINUTES') or os.getenv('GITHUB_REFRESH_INTERVAL_MINUTES', '60'))
+REFRESH_JOB_NAME = "github_metadata_refresh"
+
 
 class GitHubManager(commands.Cog):
     
@@ -28,6 +54,26 @@ class GitHubManager(commands.Cog):
         self.ensure_data_file()
         self.ensure_projects_dir()
         
+        # Registry repos trong bộ nhớ (load một lần, có index theo full_name/name/url)
+        self.registry = RepoRegistry(REPOS_FILE)
+        self.registry.load()
+        
+        # Cache trang embed của /listrepos, chỉ bị xoá khi registry.version đổi
+        self._pages_cache = {}
+        self._pages_version = None
+        
+        # Danh sách repos trên webhook: sửa tin nhắn đã gửi, chỉ gửi lại trang thay đổi
+        self.webhook = WebhookPublisher(lambda: self.bot.http_session, WEBHOOK_URL, self.build_webhook_pages)
+        
+        # Làm mới metadata định kỳ bằng conditional request (ETag), tự giãn cách theo rate limit
+        self.refresher = GitHubRefresher(self.registry, lambda: self.bot.http_session)
+        self.bot.scheduler.add_job(
+            REFRESH_JOB_NAME,
+            self.refresh_metadata,
+            every(minutes=GITHUB_REFRESH_INTERVAL_MINUTES),
+            run_on_first_start=True
+        )
+        
         # Tạo các commands với tên động
         # Command: addrepo
         @app_commands.command(name=get_command_name("addrepo"), description="Thêm link GitHub repository public")
@@ -51,11 +97,25 @@ class GitHubManager(commands.Cog):
         async def removerepo_cmd(interaction: discord.Interaction, repo_identifier: str):
             await self.remove_repo_callback(interaction, repo_identifier)
         
+        @removerepo_cmd.autocomplete('repo_identifier')
+        async def removerepo_autocomplete(interaction: discord.Interaction, current: str):
+            return self.repo_autocomplete(current)
+        
+        # Command: syncall
+        @app_commands.command(name=get_command_name("syncall"), description="Clone/pull và deploy lại tất cả repositories")
+        @app_commands.describe(force="Pull và deploy lại kể cả repo không có commit mới")
+        async def syncall_cmd(interaction: discord.Interaction, force: bool = False):
+            await self.sync_all_callback(interaction, force)
+        
         # Lưu references
         self.addrepo_cmd = addrepo_cmd
         self.listrepos_cmd = listrepos_cmd
         self.updatewebhook_cmd = updatewebhook_cmd
         self.removerepo_cmd = removerepo_cmd
+        self.syncall_cmd = syncall_cmd
+        
+        # Chỉ một /syncall chạy tại một thời điểm
+        self._sync_lock = asyncio.Lock()
         
         # Thêm commands vào tree
         guild_obj = discord.Object(id=GUILD_ID)
@@ -63,13 +123,23 @@ class GitHubManager(commands.Cog):
         self.bot.tree.add_command(listrepos_cmd, guild=guild_obj)
         self.bot.tree.add_command(updatewebhook_cmd, guild=guild_obj)
         self.bot.tree.add_command(removerepo_cmd, guild=guild_obj)
+        self.bot.tree.add_command(syncall_cmd, guild=guild_obj)
     
+    async def refresh_metadata(self):
+        """Job: làm mới metadata rồi cập nhật webhook nếu có repo thay đổi"""
+        counts = await self.refresher.refresh_all()
+        if counts and counts.get('updated'):
+            self.webhook.request_publish()
+
     async def cog_unload(self):
+        self.bot.scheduler.remove_job(REFRESH_JOB_NAME)
+        await self.webhook.stop()
         guild_obj = discord.Object(id=GUILD_ID)
         self.bot.tree.remove_command(self.addrepo_cmd.name, guild=guild_obj)
         self.bot.tree.remove_command(self.listrepos_cmd.name, guild=guild_obj)
         self.bot.tree.remove_command(self.updatewebhook_cmd.name, guild=guild_obj)
         self.bot.tree.remove_command(self.removerepo_cmd.name, guild=guild_obj)
+        self.bot.tree.remove_command(self.syncall_cmd.name, guild=guild_obj)
 
     def ensure_projects_dir(self):
         """Đảm bảo thư mục projects tồn tại"""
@@ -82,19 +152,6 @@ class GitHubManager(commands.Cog):
             with open(REPOS_FILE, 'w', encoding='utf-8') as f:
                 json.dump([], f)
 
-    def load_repos(self):
-        """Đọc danh sách repos từ file JSON"""
-        try:
-            with open(REPOS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return []
-
-    def save_repos(self, repos):
-        """Lưu danh sách repos vào file JSON"""
-        with open(REPOS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(repos, f, indent=2, ensure_ascii=False)
-
     async def get_repo_info(self, repo_url):
         """Lấy thông tin repository từ GitHub API"""
         try:
@@ -108,48 +165,43 @@ class GitHubManager(commands.Cog):
             repo_name = parts[-1]
             
             # Gọi GitHub API
-            api_url = f"https://api.github.com/repos/{owner}/{repo_name}"
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}"
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(api_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            "name": data.get("name"),
-                            "full_name": data.get("full_name"),
-                            "owner": data.get("owner", {}).get("login"),
-                            "description": data.get("description", "Không có mô tả"),
-                            "html_url": data.get("html_url"),
-                            "stars": data.get("stargazers_count", 0),
-                            "forks": data.get("forks_count", 0),
-                            "language": data.get("language", "Unknown"),
-                            "created_at": data.get("created_at"),
-                            "updated_at": data.get("updated_at"),
-                            "open_issues": data.get("open_issues_count", 0),
-                            "added_date": datetime.now().isoformat()
-                        }
-                    else:
-                        return None
+            async with self.bot.http_session.get(api_url, headers=github_headers()) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return {
+                        **repo_fields_from_api(data),
+                        "added_date": datetime.now().isoformat()
+                    }
+                else:
+                    return None
         except Exception as e:
             logging.error(f"Error getting repo info: {e}")
             return None
 
-    async def send_to_webhook(self, repos):
-        """Gửi danh sách repos lên Discord webhook"""
-        try:
+    def build_webhook_pages(self):
+        """Các trang (mỗi trang một tin nhắn webhook) của danh sách repos, tối đa WEBHOOK_REPOS_PER_PAGE repos mỗi trang"""
+        repos = self.registry.all()
+        chunks = [repos[i:i + WEBHOOK_REPOS_PER_PAGE] for i in range(0, len(repos), WEBHOOK_REPOS_PER_PAGE)] or [[]]
+        pages = []
+        for page_index, chunk in enumerate(chunks):
             # Tạo embed
             embed = {
                 "title": "📚 Danh sách GitHub Repositories",
                 "color": 0x2ecc71,
                 "timestamp": datetime.now().isoformat(),
                 "fields": [],
+                # Chỉ trang cuối ghi tổng số, để thêm repo mới không làm đổi các trang trước
                 "footer": {
-                    "text": f"Tổng số repos: {len(repos)}"
+                    "text": f"Trang {page_index + 1}" + (
+                        f" • Tổng số repos: {len(repos)}" if page_index == len(chunks) - 1 else ""
+                    )
                 }
             }
             
             # Thêm thông tin từng repo
-            for i, repo in enumerate(repos[:25], 1):  # Discord giới hạn 25 fields
+            for i, repo in enumerate(chunk, page_index * WEBHOOK_REPOS_PER_PAGE + 1):
                 desc = repo.get('description') or "Không có mô tả"
                 desc_text = f"{desc[:100]}..." if len(desc) > 100 else desc
                 
@@ -163,14 +215,8 @@ class GitHubManager(commands.Cog):
                     "inline": False
                 }
                 embed["fields"].append(field)
-            
-            # Gửi webhook
-            async with aiohttp.ClientSession() as session:
-                async with session.post(WEBHOOK_URL, json={"embeds": [embed]}) as response:
-                    return response.status == 204
-        except Exception as e:
-            logging.error(f"Error sending webhook: {e}")
-            return False
+            pages.append({"embeds": [embed]})
+        return pages
 
     async def add_repo_callback(self, interaction: discord.Interaction, github_url: str):
         """Command thêm GitHub repository"""
@@ -182,31 +228,30 @@ class GitHubManager(commands.Cog):
             return
         
         # Lấy thông tin repo
-        repo_info = await self.get_repo_info(github_url)
+        with self.bot.metrics.stage(interaction, 'github_api'):
+            repo_info = await self.get_repo_info(github_url)
         
         if not repo_info:
             await interaction.followup.send("❌ Không thể lấy thông tin repository! Kiểm tra lại URL hoặc repo có thể là private.", ephemeral=True)
             return
         
-        # Load repos hiện tại
-        repos = self.load_repos()
-        
-        # Kiểm tra repo đã tồn tại chưa
-        existing = next((r for r in repos if r['full_name'] == repo_info['full_name']), None)
-        
-        if existing:
+        # Thêm repo mới (registry trả về False nếu full_name đã tồn tại)
+        if not self.registry.add(repo_info):
             await interaction.followup.send(f"⚠️ Repository **{repo_info['full_name']}** đã tồn tại trong danh sách!", ephemeral=True)
             return
         
-        # Thêm repo mới
-        repos.append(repo_info)
-        self.save_repos(repos)
+        await self.registry.save()
+        
+        # Cập nhật webhook (gộp với các thay đổi khác trong vài giây)
+        self.webhook.request_publish()
         
         # Clone hoặc pull repository
-        clone_result = await clone_or_pull_repo(repo_info, PROJECTS_DIR)
+        # Tiến độ build/deploy được cập nhật vào response gốc trong lúc chạy
+        async def show_progress(text):
+            await interaction.edit_original_response(content=text[:2000])
         
-        # Gửi lên webhook
-        webhook_sent = await self.send_to_webhook(repos)
+        with self.bot.metrics.stage(interaction, 'clone_or_pull'):
+            clone_result = await clone_or_pull_repo(repo_info, PROJECTS_DIR, progress=show_progress)
         
         # Tạo embed phản hồi
         embed = discord.Embed(
@@ -223,109 +268,310 @@ class GitHubManager(commands.Cog):
         
         # Thêm thông tin về clone/pull
         if clone_result['success']:
-            action_text = "📥 Clone" if clone_result['action'] == 'cloned' else "🔄 Pull"
-            embed.add_field(name=f"{action_text} Status", value=clone_result['message'], inline=False)
+            action_text = {'cloned': "📥 Clone", 'up_to_date': "⏭ Skip"}.get(clone_result['action'], "🔄 Pull")
+            timings = " • ".join(f"{phase} {seconds:.1f}s" for phase, seconds in clone_result['timings'].items())
+            value = clone_result['message'] + (f"\n⏱ {timings}" if timings else "")
+            embed.add_field(name=f"{action_text} Status", value=value[:1024], inline=False)
         else:
             embed.add_field(name="⚠️ Git Status", value=clone_result['message'], inline=False)
         
-        if webhook_sent:
-            embed.set_footer(text="✅ Đã cập nhật lên webhook")
-        else:
-            embed.set_footer(text="⚠️ Không thể cập nhật lên webhook")
+        embed.set_footer(text="🔄 Webhook sẽ được cập nhật trong giây lát")
         
         await interaction.followup.send(embed=embed)
 
+    def render_repo_pages(self, sort):
+        """Render toàn bộ trang embed của /listrepos theo một kiểu sắp xếp"""
+        repos = self.registry.all()
+        if sort == 'stars':
+            repos.sort(key=lambda repo: repo.get('stars') or 0, reverse=True)
+        elif sort == 'language':
+            repos.sort(key=lambda repo: ((repo.get('language') or 'Unknown').lower(), repo['full_name'].lower()))
+        else:
+            # Mới thêm lên đầu; repo cũ không có added_date xếp cuối
+            repos.sort(key=lambda repo: repo.get('added_date') or '', reverse=True)
+        
+        chunks = [repos[i:i + LIST_REPOS_PER_PAGE] for i in range(0, len(repos), LIST_REPOS_PER_PAGE)]
+        pages = []
+        for page_index, chunk in enumerate(chunks):
+            embed = discord.Embed(
+                title="📚 Danh sách GitHub Repositories",
+                color=discord.Color.blue()
+            )
+            for i, repo in enumerate(chunk, page_index * LIST_REPOS_PER_PAGE + 1):
+                embed.add_field(
+                    name=f"{i}. {repo['full_name']}",
+                    value=(
+                        f"⭐ {repo['stars']} | 🍴 {repo['forks']} | 💻 {repo['language']}\n"
+                        f"[Xem trên GitHub]({repo['html_url']})"
+                    ),
+                    inline=False
+                )
+            embed.set_footer(
+                text=f"Trang {page_index + 1}/{len(chunks)} • Tổng số repos: {len(repos)} • Sắp xếp: {LIST_SORT_OPTIONS[sort]}"
+            )
+            pages.append(embed)
+        return pages
+
+    def get_repo_pages(self, sort):
+        """Trang embed đã render sẵn, cache theo (sort, registry.version)"""
+        if self._pages_version != self.registry.version:
+            # Registry đã thay đổi -> bỏ toàn bộ trang cũ
+            self._pages_cache.clear()
+            self._pages_version = self.registry.version
+        pages = self._pages_cache.get(sort)
+        if pages is None:
+            pages = self.render_repo_pages(sort)
+            self._pages_cache[sort] = pages
+        return pages
+
     async def list_repos_callback(self, interaction: discord.Interaction):
-        """Command hiển thị danh sách repos"""
-        repos = self.load_repos()
-        
-        if not repos:
+        """Command hiển thị danh sách repos (có phân trang và sắp xếp)"""
+        if not len(self.registry):
             await interaction.response.send_message("📭 Chưa có repository nào được thêm!", ephemeral=True)
             return
         
-        # Tạo embed
-        embed = discord.Embed(
-            title="📚 Danh sách GitHub Repositories",
-            color=discord.Color.blue(),
-            timestamp=datetime.now()
-        )
-        
-        # Thêm từng repo (giới hạn 25 fields)
-        for i, repo in enumerate(repos[:25], 1):
-            embed.add_field(
-                name=f"{i}. {repo['full_name']}",
-                value=(
-                    f"⭐ {repo['stars']} | 🍴 {repo['forks']} | 💻 {repo['language']}\n"
-                    f"[Xem trên GitHub]({repo['html_url']})"
-                ),
-                inline=False
-            )
-        
-        embed.set_footer(text=f"Tổng số repos: {len(repos)}")
-        
-        await interaction.response.send_message(embed=embed)
+        view = RepoListView(self, interaction.user.id)
+        response = await interaction.response.send_message(embed=view.current_embed(), view=view)
+        view.message = response.resource
 
     async def update_webhook_callback(self, interaction: discord.Interaction):
         """Command cập nhật webhook"""
         await interaction.response.defer()
         
-        repos = self.load_repos()
+        repos = self.registry.all()
         
         if not repos:
             await interaction.followup.send("📭 Chưa có repository nào để cập nhật!", ephemeral=True)
             return
         
-        # Gửi lên webhook
-        webhook_sent = await self.send_to_webhook(repos)
+        # Đăng ngay, chỉ các trang thay đổi mới được sửa/gửi
+        result = await self.webhook.publish_now()
         
-        if webhook_sent:
-            await interaction.followup.send(f"✅ Đã cập nhật {len(repos)} repositories lên webhook!")
+        if result and not result['failed']:
+            await interaction.followup.send(
+                f"✅ Đã cập nhật {len(repos)} repositories lên webhook! "
+                f"({result['edited']} sửa, {result['created']} mới, {result['unchanged']} không đổi, {result['deleted']} xoá)"
+            )
         else:
             await interaction.followup.send("❌ Không thể cập nhật lên webhook!", ephemeral=True)
 
+    def repo_autocomplete(self, current):
+        """Gợi ý repo từ prefix index trong bộ nhớ (gọi mỗi lần gõ phím)"""
+        return [
+            app_commands.Choice(name=full_name[:100], value=full_name[:100])
+            for full_name in self.registry.suggest(current, limit=25)
+        ]
+
     async def remove_repo_callback(self, interaction: discord.Interaction, repo_identifier: str):
         """Command xóa repository"""
-        repos = self.load_repos()
-        
-        # Chuẩn hóa input (loại bỏ khoảng trắng, chuyển về lowercase để so sánh)
-        search_term = repo_identifier.strip().lower()
-        
-        # Tìm repo phù hợp (so sánh với name, full_name, và html_url)
-        found_repo = None
-        for repo in repos:
-            repo_name = repo.get('name', '').lower()
-            repo_full_name = repo.get('full_name', '').lower()
-            repo_url = repo.get('html_url', '').lower()
-            
-            # Kiểm tra khớp với name, full_name, hoặc url
-            if (search_term == repo_name or 
-                search_term == repo_full_name or 
-                search_term == repo_url or
-                search_term in repo_url):  # Cho phép match cả URL đầy đủ
-                found_repo = repo
-                break
+        # Tìm repo phù hợp qua index (name, full_name, hoặc url)
+        found_repo = self.registry.find(repo_identifier)
         
         if not found_repo:
+            suggestions = self.registry.suggest(repo_identifier, limit=5)
+            hint = f"\nCó phải bạn muốn: {', '.join(f'`{name}`' for name in suggestions)}?" if suggestions else ""
             await interaction.response.send_message(
                 f"❌ Không tìm thấy repository **{repo_identifier}**!\n"
-                f"Hãy thử với: tên repo, owner/repo, hoặc URL GitHub đầy đủ.", 
+                f"Hãy thử với: tên repo, owner/repo, hoặc URL GitHub đầy đủ.{hint}", 
                 ephemeral=True
             )
             return
         
-        # Xóa repo tìm được
-        repos = [r for r in repos if r.get('full_name') != found_repo.get('full_name')]
-        
-        # Lưu lại
-        self.save_repos(repos)
+        # Xóa repo tìm được và lưu lại
+        self.registry.remove(found_repo['full_name'])
+        await self.registry.save()
         
-        # Cập nhật webhook
-        await self.send_to_webhook(repos)
+        # Cập nhật webhook (debounce)
+        self.webhook.request_publish()
         
         await interaction.response.send_message(
             f"✅ Đã xóa repository **{found_repo['full_name']}** khỏi danh sách!"
         )
 
 
+    def build_sync_embed(self, statuses, started, done):
+        """Embed tổng hợp trạng thái /syncall"""
+        finished = sum(1 for status in statuses.values() if status['done'])
+        failed = sum(1 for status in statuses.values() if status['done'] and not status['success'])
+        lines = [f"{status['icon']} **{full_name}** – {status['text']}" for full_name, status in statuses.items()]
+        description = "\n".join(lines)
+        if len(description) > 4000:
+            description = description[:4000] + "\n..."
+        
+        if not done:
+            color = discord.Color.blue()
+        else:
+            color = discord.Color.red() if failed else discord.Color.green()
+        embed = discord.Embed(
+            title="🔄 Sync tất cả repositories" + (" – xong" if done else ""),
+            description=description or "Không có repository nào",
+            color=color,
+            timestamp=datetime.now()
+        )
+        embed.set_footer(
+            text=f"{finished}/{len(statuses)} xong • {failed} lỗi • {time.perf_counter() - started:.0f}s "
+                 f"• git x{SYNC_GIT_CONCURRENCY}, docker x{SYNC_DOCKER_CONCURRENCY}"
+        )
+        return embed
+    
+    async def sync_all_callback(self, interaction: discord.Interaction, force: bool = False):
+        """Command chạy clone_or_pull_repo song song cho mọi repo trong registry"""
+        if self._sync_lock.locked():
+            await interaction.response.send_message("⏳ Đang có một lần /syncall chạy, vui lòng chờ!", ephemeral=True)
+            return
+        
+        async with self._sync_lock:
+            await interaction.response.defer()
+            
+            repos = self.registry.all()
+            if not repos:
+                await interaction.followup.send("📭 Chưa có repository nào trong danh sách!")
+                return
+            
+            started = time.perf_counter()
+            statuses = {
+                repo['full_name']: {'icon': "⏳", 'text': "Đang chờ", 'done': False, 'success': False}
+                for repo in repos
+            }
+            changed = asyncio.Event()
+            git_semaphore = asyncio.Semaphore(SYNC_GIT_CONCURRENCY)
+            docker_semaphore = asyncio.Semaphore(SYNC_DOCKER_CONCURRENCY)
+            
+            async def sync_repo(repo):
+                status = statuses[repo['full_name']]
+                
+                async def show_progress(text):
+                    # Chỉ lấy dòng đầu (phase) của tiến độ docker
+                    status['icon'] = "🐳"
+                    status['text'] = text.split("\n", 1)[0].split("– ", 1)[-1]
+                    changed.set()
+                
+                status['icon'] = "🔄"
+                status['text'] = "Đang chạy"
+                changed.set()
+                repo_started = time.perf_counter()
+                result = await clone_or_pull_repo(
+                    repo, PROJECTS_DIR,
+                    force=force,
+                    progress=show_progress,
+                    git_semaphore=git_semaphore,
+                    docker_semaphore=docker_semaphore
+                )
+                elapsed = time.perf_counter() - repo_started
+                
+                status['done'] = True
+                status['success'] = result['success'] and (result['skipped'] or result['docker_deployed'])
+                if result['skipped']:
+                    status['icon'], status['text'] = "⏭", "Không có commit mới"
+                elif status['success']:
+                    status['icon'], status['text'] = "✅", f"{result['action']} + deploy ({elapsed:.0f}s)"
+                else:
+                    # Git lỗi: dòng đầu; git ok nhưng docker lỗi: dòng thứ hai (thông báo của docker)
+                    lines = result['message'].split("\n")
+                    reason = lines[1] if result['success'] and len(lines) > 1 else lines[0]
+                    status['icon'], status['text'] = "❌", reason.strip('`')[:150] or result['action']
+                changed.set()
+            
+            async def refresh_embed():
+                while True:
+                    await changed.wait()
+                    changed.clear()
+                    try:
+                        await interaction.edit_original_response(embed=self.build_sync_embed(statuses, started, False))
+                    except discord.HTTPException as e:
+                        logging.warning(f"Không cập nhật được embed /syncall: {e}")
+                    await asyncio.sleep(SYNC_PROGRESS_INTERVAL)
+            
+            await interaction.edit_original_response(embed=self.build_sync_embed(statuses, started, False))
+            refresher = asyncio.create_task(refresh_embed())
+            try:
+                await asyncio.gather(*(sync_repo(repo) for repo in repos))
+            finally:
+                refresher.cancel()
+            
+            embed = self.build_sync_embed(statuses, started, True)
+            try:
+                await interaction.edit_original_response(embed=embed)
+            except discord.HTTPException as e:
+                # Token interaction hết hạn sau 15 phút, lần sync dài thì gửi kết quả thành tin nhắn mới
+                logging.warning(f"Không cập nhật được embed /syncall, gửi tin nhắn mới: {e}")
+                await interaction.channel.send(embed=embed)
+
+
+class RepoListView(discord.ui.View):
+    """Nút chuyển trang + chọn kiểu sắp xếp cho /listrepos (trang lấy từ cache của cog)
+
+    Chỉ người gọi lệnh được bấm; trạng thái trang/sắp xếp là chung của cả tin nhắn.
+    """
+    
+    def __init__(self, cog, author_id, sort='added'):
+        super().__init__(timeout=LIST_VIEW_TIMEOUT)
+        self.cog = cog
+        self.author_id = author_id
+        self.sort = sort
+        self.page = 0
+        self.message = None
+        self.sort_select.options = [
+            discord.SelectOption(label=label, value=value, default=value == sort)
+            for value, label in LIST_SORT_OPTIONS.items()
+        ]
+        self.update_buttons()
+    
+    def current_embed(self):
+        pages = self.cog.get_repo_pages(self.sort)
+        if not pages:
+            return discord.Embed(title="📭 Chưa có repository nào được thêm!", color=discord.Color.blue())
+        # Registry có thể đã nhỏ đi kể từ lần bấm trước
+        self.page = max(0, min(self.page, len(pages) - 1))
+        return pages[self.page]
+    
+    def update_buttons(self):
+        total = len(self.cog.get_repo_pages(self.sort))
+        self.previous_button.disabled = self.page <= 0
+        self.next_button.disabled = self.page >= total - 1
+    
+    async def show(self, interaction: discord.Interaction):
+        embed = self.current_embed()
+        self.update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+    
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id == self.author_id:
+            return True
+        await interaction.response.send_message(
+            "🚫 Chỉ người gọi lệnh mới dùng được các nút này, hãy tự gọi lệnh để xem danh sách!",
+            ephemeral=True
+        )
+        return False
+    
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await self.show(interaction)
+    
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self.show(interaction)
+    
+    @discord.ui.select(placeholder="Sắp xếp theo...")
+    async def sort_select(self, interaction: discord.Interaction, select: discord.ui.Select):
+        self.sort = select.values[0]
+        self.page = 0
+        for option in select.options:
+            option.default = option.value == self.sort
+        await self.show(interaction)
+    
+    async def on_timeout(self):
+        # Vô hiệu hoá các nút khi view hết hạn
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+
 async def setup(bot):
     await bot.add_cog(GitHubManager(bot))
@@ -1,19 +1,35 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
 import os
 import json
-import sys
 import asyncio
 import platform
 import logging
 from dotenv import load_dotenv
+from utils.message_router import MessageRouter, preview
+from utils.handoff import spawn_successor
+from utils.dependency_installer import ensure_dependencies
+from utils.deploy_queue import DeployCoordinator, DEPLOYED, RESTART, FAILED
+from utils.command_helper import get_command_name
 
 # Load environment variables từ .env (chỉ dùng khi không có trong system env) test pull
 load_dotenv()
 
 # Ưu tiên lấy từ system environment variables (từ systemd) trước
 MONITOR_CHANNEL_ID = int(os.environ.get('MONITOR_CHANNEL_ID') or os.getenv('MONITOR_CHANNEL_ID', 0))
+# Nhiều channel theo dõi, phân cách bằng dấu phẩy (gộp thêm MONITOR_CHANNEL_ID cũ nếu có)
+MONITOR_CHANNEL_IDS = sorted({
+    int(channel_id)
+    for channel_id in (os.environ.get('MONITOR_CHANNEL_IDS') or os.getenv('MONITOR_CHANNEL_IDS', '')).split(',')
+    if channel_id.strip()
+} | ({MONITOR_CHANNEL_ID} if MONITOR_CHANNEL_ID else set()))
 AUTO_DEPLOY_ENABLED = (os.environ.get('AUTO_DEPLOY_ENABLED') or os.getenv('AUTO_DEPLOY_ENABLED', 'false')).lower() == 'true'
+# Thời gian tối đa chờ process mới sẵn sàng khi deploy (giây)
+DEPLOY_HANDOFF_TIMEOUT = float(os.environ.get('DEPLOY_HANDOFF_TIMEOUT') or os.getenv('DEPLOY_HANDOFF_TIMEOUT', '180'))
+# Các push đến trong khoảng này (giây) được gộp thành một lần deploy
+DEPLOY_DEBOUNCE_SECONDS = float(os.environ.get('DEPLOY_DEBOUNCE_SECONDS') or os.getenv('DEPLOY_DEBOUNCE_SECONDS', '15'))
+GUILD_ID = int(os.environ.get('GUILD_ID') or os.getenv('GUILD_ID'))
 
 
 class MessageMonitor(commands.Cog):
@@ -21,16 +37,35 @@ class MessageMonitor(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.monitor_channel_id = MONITOR_CHANNEL_ID
+        self.monitor_channel_ids = MONITOR_CHANNEL_IDS
         self.auto_deploy_enabled = AUTO_DEPLOY_ENABLED
         self.is_ubuntu = self.check_is_ubuntu()
+        self.started_head = None
         
-        if self.monitor_channel_id:
-            logging.info(f"Message Monitor đã được kích hoạt cho channel ID: {self.monitor_channel_id}")
+        self.router = MessageRouter()
+        self.router.add_rule(self.monitor_channel_ids, self.log_message)
+        self.router.add_rule(self.monitor_channel_ids, self.handle_github_push, json_type='github_push')
+        
+        # Deploy tuần tự, gộp push theo debounce, bỏ qua SHA đã deploy
+        self.deploy_queue = DeployCoordinator(
+            self.run_deploy,
+            on_restart=self.bot.close,
+            debounce=DEPLOY_DEBOUNCE_SECONDS
+        )
+        
+        self.deployqueue_command = app_commands.Command(
+            name=get_command_name("deployqueue"),
+            description="Xem trạng thái hàng đợi auto deploy",
+            callback=self.deployqueue_callback
+        )
+        self.bot.tree.add_command(self.deployqueue_command, guild=discord.Object(id=GUILD_ID))
+        
+        if self.monitor_channel_ids:
+            logging.info(f"Message Monitor đã được kích hoạt cho channel ID: {', '.join(map(str, self.monitor_channel_ids))}")
             logging.info(f"Auto Deploy: {'Enabled' if self.auto_deploy_enabled else 'Disabled'}")
             logging.info(f"Platform: {platform.system()} (Ubuntu: {self.is_ubuntu})")
         else:
-            logging.warning("MONITOR_CHANNEL_ID chưa được cấu hình trong .env file")
+            logging.warning("MONITOR_CHANNEL_IDS / MONITOR_CHANNEL_ID chưa được cấu hình trong .env file")
     
     def check_is_ubuntu(self):
         """Kiểm tra xem có đang chạy trên Ubuntu server không"""
@@ -48,69 +83,82 @@ class MessageMonitor(commands.Cog):
         except:
             return False
     
+    async def cog_load(self):
+        # Commit mà process này đang chạy
+        self.started_head = await self.get_head_sha()
+        if self.auto_deploy_enabled and self.is_ubuntu:
+            self.deploy_queue.start()
+    
+    async def cog_unload(self):
+        await self.deploy_queue.stop()
+        self.bot.tree.remove_command(self.deployqueue_command.name, guild=discord.Object(id=GUILD_ID))
+    
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
-        """Lắng nghe tất cả tin nhắn và in ra nếu đúng channel"""
+        """Chuyển tin nhắn cho router; channel không theo dõi bị bỏ qua ngay"""
+        if self.router.is_routed(message.channel.id):
+            await self.router.dispatch(message)
+    
+    async def log_message(self, message, payload):
+        """Ghi log gọn cho mỗi tin nhắn trong channel theo dõi (nội dung đầy đủ chỉ ở mức DEBUG)"""
+        logging.info(
+            f"Tin nhắn mới #{getattr(message.channel, 'name', message.channel.id)} "
+            f"từ {message.author.name} ({message.author.id}): {preview(message.content)}"
+        )
+        logging.debug(f"Nội dung gốc: {message.content}")
+    
+    async def handle_github_push(self, message, json_data):
+        """Xử lý webhook GitHub push: auto deploy nếu đúng repo/branch"""
+        repo = json_data.get('repo', '')
+        branch = json_data.get('branch', '')
+        logging.info(f"GitHub push: {repo} ({branch})")
+        logging.debug(f"PARSED JSON DATA: {json.dumps(json_data, ensure_ascii=False)}")
         
-        # Kiểm tra xem có phải channel được theo dõi không
-        if self.monitor_channel_id and message.channel.id == self.monitor_channel_id:
-            # In thông tin tin nhắn
-            logging.info("\n" + "="*60)
-            logging.info(f"TIN NHẮN MỚI TỪ CHANNEL: {message.channel.name}")
-            logging.info("="*60)
-            logging.info(f"Người gửi: {message.author.name} ({message.author.id})")
-            logging.info(f"Thời gian: {message.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-            logging.info(f"Nội dung gốc: {message.content}")
-
-            # Thử parse JSON nếu nội dung là JSON
-            try:
-                # Làm sạch content - loại bỏ ```json, backticks, và newlines
-                content = message.content.strip()
-                
-                # Loại bỏ code block markdown nếu có
-                if content.startswith('```'):
-                    # Loại bỏ ```json hoặc ```
-                    lines = content.split('\n')
-                    if lines[0].startswith('```'):
-                        lines = lines[1:]  # Bỏ dòng đầu (```json hoặc ```)
-                    if lines and lines[-1].strip() == '```':
-                        lines = lines[:-1]  # Bỏ dòng cuối (```)
-                    content = '\n'.join(lines).strip()
-                
-                # Kiểm tra xem có phải JSON không
-                if content.startswith('{') and content.endswith('}'):
-                    json_data = json.loads(content)
-                    logging.info("\nPARSED JSON DATA:")
-                    logging.info(json.dumps(json_data, indent=2, ensure_ascii=False))
-                    
-                    # In từng field của JSON một cách rõ ràng
-                    logging.info("\nCHI TIẾT:")
-                    for key, value in json_data.items():
-                        logging.info(f"  • {key}: {value}")
-                    
-                    # Kiểm tra nếu là GitHub push webhook và thực hiện auto deploy
-                    if (json_data.get('type') == 'github_push' and 
-                        self.auto_deploy_enabled and 
-                        self.is_ubuntu):
-                        
-                        repo = json_data.get('repo', '')
-                        branch = json_data.get('branch', '')
-
-                        # Chỉ deploy nếu là repo ngongtopro/bot_discord và branch main
-                        if 'ngongtopro/bot_discord' in repo.lower() and branch == 'main':
-                            logging.info("\nTRIGGER AUTO DEPLOY!")
-                            await self.auto_deploy()
-                        else:
-                            logging.info(f"\nBỏ qua deploy - Repo: {repo}, Branch: {branch}")
-                    
-            except json.JSONDecodeError:
-                # Nếu không phải JSON, chỉ in nội dung bình thường
-                pass
-            except Exception as e:
-                logging.error(f"Lỗi khi parse JSON: {e}")
+        if not (self.auto_deploy_enabled and self.is_ubuntu):
+            return
+        
+        # Chỉ deploy nếu là repo ngongtopro/bot_discord và branch main
+        if 'ngongtopro/bot_discord' in repo.lower() and branch == 'main':
+            sha = json_data.get('commit_sha') or json_data.get('sha') or ''
+            self.deploy_queue.submit(sha, repo=repo, branch=branch)
+        else:
+            logging.info(f"Bỏ qua deploy - Repo: {repo}, Branch: {branch}")
+    
+    async def run_deploy(self, job):
+        """Deploy function cho DeployCoordinator"""
+        logging.info(f"TRIGGER AUTO DEPLOY! {job['sha'] or '?'} (gộp {job['pushes']} push)")
+        return await self.auto_deploy()
+    
+    async def deployqueue_callback(self, interaction: discord.Interaction):
+        snapshot = self.deploy_queue.snapshot()
+        
+        def describe(job):
+            if not job:
+                return "—"
+            return f"`{(job.get('sha') or '?')[:10]}` ({job.get('pushes', 1)} push)"
+        
+        embed = discord.Embed(
+            title="🚚 Deploy Queue",
+            color=discord.Color.orange() if snapshot['running'] or snapshot['pending'] else discord.Color.green()
+        )
+        embed.add_field(name="Đang deploy", value=describe(snapshot['running']), inline=True)
+        embed.add_field(name="Đang chờ", value=describe(snapshot['pending']), inline=True)
+        embed.add_field(name="Đã deploy", value=f"`{(snapshot['deployed_sha'] or '—')[:10]}`", inline=True)
+        last = snapshot['last_result']
+        if last:
+            embed.add_field(
+                name="Lần gần nhất",
+                value=f"`{(last['sha'] or '?')[:10]}` → **{last['result']}** lúc {last['finished_at'][:19]}",
+                inline=False
+            )
+        embed.set_footer(text=f"Debounce: {snapshot['debounce']:.0f}s • Auto Deploy: {'Enabled' if self.auto_deploy_enabled else 'Disabled'}")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
     
     async def auto_deploy(self):
-        """Tự động pull code và restart bot"""
+        """Tự động pull code và chuyển sang process mới (process cũ phục vụ tới khi process mới sẵn sàng)
+        
+        Returns: DEPLOYED (không có gì mới), RESTART (process mới đã sẵn sàng) hoặc FAILED
+        """
         try:
             logging.info("="*60)
             logging.info("BẮT ĐẦU AUTO DEPLOY")
@@ -130,32 +178,44 @@ class MessageMonitor(commands.Cog):
                 output = stdout.decode('utf-8', errors='ignore')
                 logging.info(f"Pull thành công:\n{output}")
                 
-                if 'Already up to date' in output or 'Already up-to-date' in output:
+                # Code trên đĩa có thể đã mới hơn process đang chạy (handoff lần trước thất bại)
+                if await self.get_head_sha() == self.started_head:
                     logging.info("ℹCode đã là phiên bản mới nhất")
-                    return
+                    return DEPLOYED
                 
-                # Cài đặt dependencies nếu có thay đổi requirements.txt
-                if 'requirements.txt' in output:
-                    logging.info("Đang cài đặt dependencies...")
-                    pip_process = await asyncio.create_subprocess_exec(
-                        sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt',
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-                    await pip_process.communicate()
-                    logging.info("Đã cài đặt dependencies")
+                # Cài dependencies vào virtualenv mới nếu hash requirements.txt đổi
+                deps = await ensure_dependencies()
+                if not deps['success']:
+                    logging.error(f"Cài dependencies thất bại ({deps['message']}), huỷ deploy")
+                    return FAILED
                 
-                # Restart bot
-                logging.info("\nĐANG RESTART BOT...")
-                await asyncio.sleep(2)
-                os.execv(sys.executable, [sys.executable] + sys.argv)
+                # Chạy bot mới song song, chỉ thoát khi bot mới đã sẵn sàng
+                logging.info("ĐANG HANDOFF SANG PROCESS MỚI...")
+                if await spawn_successor(DEPLOY_HANDOFF_TIMEOUT, python=deps['python']):
+                    # DeployCoordinator lưu state rồi mới đóng kết nối gateway của process cũ
+                    return RESTART
+                logging.error("Handoff thất bại, bot hiện tại tiếp tục chạy")
+                return FAILED
                 
             else:
                 error = stderr.decode('utf-8', errors='ignore')
                 logging.error(f"Lỗi khi pull code:\n{error}")
+                return FAILED
                 
         except Exception as e:
             logging.error(f"Lỗi auto deploy: {e}")
+            return FAILED
+    
+    async def get_head_sha(self):
+        """SHA của HEAD hiện tại trên đĩa"""
+        process = await asyncio.create_subprocess_exec(
+            'git', 'rev-parse', 'HEAD',
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=os.getcwd()
+        )
+        stdout, _ = await process.communicate()
+        return stdout.decode('utf-8', errors='ignore').strip() if process.returncode == 0 else None
 
 
 async def setup(bot):
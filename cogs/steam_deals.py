@@ -1,11 +1,15 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import aiohttp
 import os
-import json
+import asyncio
 import logging
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from utils.http_cache import HttpCache
+from utils.paced_sender import PacedSender
+from utils.scheduler import daily_at
+from utils.price_history import PriceHistoryStore, NEW, PRICE_DROP, BACK_ON_SALE
 
 # Setup logging
 logger = logging.getLogger('steam_deals')
@@ -15,66 +19,202 @@ load_dotenv()
 
 # Ưu tiên lấy từ system environment variables
 STEAM_DEALS_CHANNEL_ID = int(os.environ.get('STEAM_DEALS_CHANNEL_ID') or os.getenv('STEAM_DEALS_CHANNEL_ID', '0'))
-CHECK_INTERVAL_HOURS = int(os.environ.get('STEAM_DEALS_INTERVAL_HOURS') or os.getenv('STEAM_DEALS_INTERVAL_HOURS', '1'))
+# Giờ check deals mỗi ngày (HH:MM, giờ local)
+CHECK_TIME = os.environ.get('STEAM_DEALS_CHECK_TIME') or os.getenv('STEAM_DEALS_CHECK_TIME', '01:00')
+JOB_NAME = "steam_deals_daily"
+# Thử lại trong ngày khi Steam lỗi / không trả về deals (phút, mỗi lần thử dùng giá trị kế tiếp)
+RETRY_DELAYS_MINUTES = [int(m) for m in (os.environ.get('STEAM_DEALS_RETRY_MINUTES') or os.getenv('STEAM_DEALS_RETRY_MINUTES', '15,30,60,120')).split(',') if m.strip()]
+# Danh sách khu vực (country code) fetch song song, khu vực đầu tiên là khu vực chính
+REGIONS = [cc.strip().lower() for cc in (os.environ.get('STEAM_DEALS_REGIONS') or os.getenv('STEAM_DEALS_REGIONS', 'us')).split(',') if cc.strip()] or ['us']
+REGION_TIMEOUT_SECONDS = float(os.environ.get('STEAM_DEALS_REGION_TIMEOUT') or os.getenv('STEAM_DEALS_REGION_TIMEOUT', '15'))
+CACHE_TTL_SECONDS = int(os.environ.get('STEAM_DEALS_CACHE_TTL') or os.getenv('STEAM_DEALS_CACHE_TTL', '600'))
+# Chế độ digest: 'off' (mỗi deal một embed), 'on' (luôn dùng bảng gọn), 'auto' (bảng gọn khi nhiều hơn threshold)
+DIGEST_MODE = (os.environ.get('STEAM_DEALS_DIGEST_MODE') or os.getenv('STEAM_DEALS_DIGEST_MODE', 'auto')).lower()
+DIGEST_THRESHOLD = int(os.environ.get('STEAM_DEALS_DIGEST_THRESHOLD') or os.getenv('STEAM_DEALS_DIGEST_THRESHOLD', '20'))
+DIGEST_PAGE_CHARS = 4000
+# File JSON cũ, chỉ dùng để nhập vào lịch sử giá ở lần chạy đầu tiên
 DEALS_DATA_FILE = "data/steam_deals_data.json"
 
+ANNOUNCE_KINDS = (NEW, PRICE_DROP, BACK_ON_SALE)
+KIND_LABELS = {
+    NEW: "🔥 Giảm giá",
+    PRICE_DROP: "📉 Giảm sâu hơn",
+    BACK_ON_SALE: "🔁 Quay lại sale"
+}
+
+def format_price(amount, currency):
+    """Định dạng giá theo loại tiền (USD giữ kiểu $x.xx như trước)"""
+    if not currency or currency == 'USD':
+        return f"${amount:.2f}"
+    return f"{amount:,.2f} {currency}"
+
+
 class SteamDealsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.has_sent_restart_notification = False  # Flag để chỉ gửi 1 lần thông báo restart
-        self.check_steam_deals.start()
+        self.deals_cache = HttpCache('steam_featured', ttl=CACHE_TTL_SECONDS)
+        self._parsed_deals = {}
+        self._restart_notice_task = None
+        self.price_history = PriceHistoryStore()
+        # Số lần đã thử lại theo ngày check
+        self._retry_attempts = {}
+        
+        # Đăng ký job với scheduler của bot thay vì polling; lịch được lưu qua các lần restart
+        self.bot.scheduler.add_job(
+            JOB_NAME,
+            self.check_steam_deals,
+            daily_at(CHECK_TIME),
+            run_on_first_start=True
+        )
+    
+    def get_deals_to_announce(self, classified_deals):
+        """Lọc các deals cần thông báo: deal mới, giảm sâu hơn, hoặc quay lại sale"""
+        return [deal for deal in classified_deals if deal['kind'] in ANNOUNCE_KINDS]
+
+    def use_digest(self, deal_count):
+        """Có dùng chế độ digest (bảng gọn) cho số deals này không"""
+        if DIGEST_MODE == 'on':
+            return True
+        if DIGEST_MODE == 'auto':
+            return deal_count > DIGEST_THRESHOLD
+        return False
+    
+    def build_deal_embed(self, deal, today):
+        """Embed chi tiết cho một deal (kèm giá từng khu vực nếu có nhiều khu vực)"""
+        currency = deal.get('currency')
+        description = (
+            f"💰 Giá mới: **{format_price(deal['price'], currency)}**\n"
+            f"~~Giá cũ: {format_price(deal['old_price'], currency)}~~\n"
+            f"📉 Giảm: **{deal['discount']}%**"
+        )
+        if deal.get('kind') == PRICE_DROP and deal.get('previous_price') is not None:
+            description += f"\n⬇️ Giảm thêm từ {format_price(deal['previous_price'], currency)}"
+        if deal.get('is_lowest') and deal.get('lowest_price') is not None:
+            description += "\n🏆 Giá thấp nhất từng ghi nhận!"
+        
+        embed = discord.Embed(
+            title=f"{KIND_LABELS.get(deal.get('kind'), '🔥 Giảm giá')}: {deal['name']}",
+            url=deal['url'],
+            description=description,
+            color=discord.Color.red(),
+            timestamp=datetime.now()
+        )
+        
+        prices = deal.get('prices', {})
+        if len(prices) > 1:
+            embed.add_field(
+                name="🌍 Giá theo khu vực",
+                value="\n".join(
+                    f"**{region.upper()}**: {format_price(p['price'], p['currency'])} (-{p['discount']}%)"
+                    for region, p in prices.items()
+                ),
+                inline=False
+            )
+        embed.set_thumbnail(url=deal['image'])
+        embed.set_footer(text=f"Steam Deal • {today}")
+        return embed
     
-    def load_deals_data(self):
-        """Đọc dữ liệu deals từ file JSON"""
+    def build_digest_embeds(self, deals, today):
+        """Gom nhiều deals thành các embed dạng bảng (mỗi deal một dòng)"""
+        lines = [
+            f"`-{deal['discount']:>2}%` `{format_price(deal['price'], deal.get('currency')):>9}` [{deal['name'][:60]}]({deal['url']})"
+            + "".join(
+                f" · {region.upper()} {format_price(p['price'], p['currency'])}"
+                for region, p in list(deal.get('prices', {}).items())[1:]
+            )
+            + (f" {KIND_LABELS[deal['kind']].split()[0]}" if deal.get('kind') in (PRICE_DROP, BACK_ON_SALE) else "")
+            + (" 🏆" if deal.get('is_lowest') and deal.get('lowest_price') is not None else "")
+            for deal in sorted(deals, key=lambda d: d['discount'], reverse=True)
+        ]
+        
+        pages = []
+        current = []
+        current_len = 0
+        for line in lines:
+            if current and current_len + len(line) + 1 > DIGEST_PAGE_CHARS:
+                pages.append(current)
+                current = []
+                current_len = 0
+            current.append(line)
+            current_len += len(line) + 1
+        if current:
+            pages.append(current)
+        
+        embeds = []
+        for index, page in enumerate(pages, 1):
+            embed = discord.Embed(
+                title=f"🔥 Steam Deals mới ({len(deals)} deals)" + (f" - {index}/{len(pages)}" if len(pages) > 1 else ""),
+                description="\n".join(page),
+                color=discord.Color.red(),
+                timestamp=datetime.now()
+            )
+            embed.set_footer(text=f"Steam Deal • {today}")
+            embeds.append(embed)
+        return embeds
+    
+    async def send_deals(self, channel, deals, today):
+        """Gửi deals mới: tối đa 10 embeds mỗi tin nhắn, hoặc digest dạng bảng khi có nhiều deals"""
+        if self.use_digest(len(deals)):
+            embeds = self.build_digest_embeds(deals, today)
+        else:
+            embeds = [self.build_deal_embed(deal, today) for deal in deals]
+        
+        sender = PacedSender()
         try:
-            if os.path.exists(DEALS_DATA_FILE):
-                with open(DEALS_DATA_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data
+            await sender.send_embeds(channel, embeds)
         except Exception as e:
-            logger.error(f"Lỗi đọc deals data: {e}")
-        return {
-            'last_check_date': None,
-            'deals': {}
-        }
+            logger.error(f"❌ Lỗi gửi tin nhắn deals: {e}")
+        
+        logger.info(f"✅ Đã gửi {len(deals)} deals mới trong {sender.sent} tin nhắn")
+    
+    async def cog_load(self):
+        await self.price_history.open()
+        await self.price_history.import_legacy_json(DEALS_DATA_FILE)
+        self._restart_notice_task = asyncio.create_task(self.send_restart_notification())
     
-    def save_deals_data(self, deals_list):
-        """Lưu dữ liệu deals vào file JSON theo ngày"""
+    async def cog_unload(self):
+        self.bot.scheduler.remove_job(JOB_NAME)
+        if self._restart_notice_task:
+            self._restart_notice_task.cancel()
+        await self.price_history.close()
+    
+    async def send_restart_notification(self):
+        """Gửi thông báo restart 1 lần duy nhất khi bot khởi động (nếu không có lượt check chạy ngay)"""
+        await self.bot.wait_until_ready()
+        if self.has_sent_restart_notification:
+            return
+        
+        now = datetime.now()
+        next_check_time = self.bot.scheduler.next_run(JOB_NAME)
+        if not next_check_time or next_check_time <= now:
+            # Job sắp chạy ngay, bản thân lượt check sẽ gửi tin nhắn
+            return
+        
+        hours_until_next = (next_check_time - now).total_seconds() / 3600
+        logger.info(f"⏭  Hẹn check lúc {next_check_time:%Y-%m-%d %H:%M} ({hours_until_next:.1f} giờ nữa)")
+        
         try:
-            os.makedirs("data", exist_ok=True)
+            channel = await self.bot.fetch_channel(STEAM_DEALS_CHANNEL_ID)
+            last_check = await self.price_history.last_check()
+            embed = discord.Embed(
+                title="🤖 Bot đã được restart",
+                description=f"Steam Deals checker đang hoạt động.\n\n"
+                           f"🕐 Lần check tiếp theo: **{next_check_time:%H:%M %d/%m}** (~{hours_until_next:.0f}h nữa)\n"
+                           f"📊 Số deals hiện tại: **{last_check['deal_count'] if last_check else 0}** deals",
+                color=discord.Color.blue(),
+                timestamp=datetime.now()
+            )
+            embed.set_footer(text=f"Check mỗi ngày lúc {CHECK_TIME}")
             
-            # Lấy ngày hiện tại
-            today = datetime.now().strftime('%Y-%m-%d')
-            
-            # Tạo dict deals với key là deal_id
-            deals_dict = {str(deal['id']): deal for deal in deals_list}
-            
-            data = {
-                'last_check_date': today,
-                'deals': deals_dict
-            }
-            
-            with open(DEALS_DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                
-            logger.info(f"💾 Đã lưu {len(deals_dict)} deals cho ngày {today}")
+            await channel.send(embed=embed)
+            self.has_sent_restart_notification = True
+            logger.info("Đã gửi thông báo restart")
         except Exception as e:
-            logger.error(f"Lỗi lưu deals data: {e}")
+            logger.error(f"Không thể gửi thông báo restart: {e}")
     
-    def get_new_deals(self, current_deals, old_deals_dict):
-        """So sánh và lấy danh sách deals mới"""
-        new_deals = []
-        for deal in current_deals:
-            deal_id = str(deal['id'])
-            if deal_id not in old_deals_dict:
-                new_deals.append(deal)
-        return new_deals
-
-    def cog_unload(self):
-        self.check_steam_deals.cancel()
-
-    @tasks.loop(hours=CHECK_INTERVAL_HOURS)
     async def check_steam_deals(self):
+        """Job chạy mỗi ngày lúc CHECK_TIME (được đăng ký với bot.scheduler)"""
         logger.info("Bắt đầu kiểm tra deals...")
         
         channel = await self.bot.fetch_channel(STEAM_DEALS_CHANNEL_ID)
@@ -85,87 +225,45 @@ class SteamDealsCog(commands.Cog):
         
         logger.info(f"Tìm thấy channel: {channel.name} ({channel.id})")
         
-        # Load dữ liệu deals cũ
-        deals_data = self.load_deals_data()
-        last_check_date = deals_data.get('last_check_date')
-        old_deals_dict = deals_data.get('deals', {})
+        last_check = await self.price_history.last_check()
+        last_check_date = last_check['check_date'] if last_check else None
         
         today = datetime.now().strftime('%Y-%m-%d')
-        now = datetime.now()
         
-        # Kiểm tra xem đã check hôm nay chưa
+        logger.info(f"📅 Last check: {last_check_date or 'Chưa có'} -> Today: {today}")
+
+        # Job có thể chạy lại trong ngày (scheduler chạy bù sau restart, process mới sau deploy handoff)
         if last_check_date == today:
-            logger.info(f"✅ Đã check deals hôm nay ({today})")
-            
-            # Tính toán thời gian đến 1h sáng ngày mai
-            tomorrow = now + timedelta(days=1)
-            next_check_time = tomorrow.replace(hour=1, minute=0, second=0, microsecond=0)
-            time_until_next = next_check_time - now
-            hours_until_next = time_until_next.total_seconds() / 3600
-            
-            logger.info(f"⏭  Hẹn check lại lúc 1h sáng ngày mai ({hours_until_next:.1f} giờ nữa)")
-            
-            # Chỉ gửi thông báo restart 1 lần duy nhất khi bot khởi động
-            if not self.has_sent_restart_notification:
-                embed = discord.Embed(
-                    title="🤖 Bot đã được restart",
-                    description=f"Steam Deals checker đang hoạt động.\n\n"
-                               f"📅 Đã check deals hôm nay: **{today}**\n"
-                               f"🕐 Lần check tiếp theo: **1h sáng ngày mai** (~{hours_until_next:.0f}h nữa)\n"
-                               f"📊 Số deals hiện tại: **{len(old_deals_dict)}** deals",
-                    color=discord.Color.blue(),
-                    timestamp=datetime.now()
-                )
-                embed.set_footer(text=f"Check mỗi {CHECK_INTERVAL_HOURS}h cho đến 1h sáng")
-                
-                try:
-                    await channel.send(embed=embed)
-                    self.has_sent_restart_notification = True
-                    logger.info("Đã gửi thông báo restart")
-                except Exception as e:
-                    logger.error(f"Không thể gửi thông báo restart: {e}")
-            
+            logger.info(f"✅ Đã check deals hôm nay ({today}), bỏ qua")
             return
-        
-        logger.info(f"📅 Ngày mới! Last check: {last_check_date or 'Chưa có'} -> Today: {today}")
+
         logger.info("🔍 Bắt đầu fetch deals từ Steam...")
         
         # Thực hiện fetch deals
+        recorded = False
         try:
             current_deals = await self.fetch_steam_deals()
             logger.info(f"Tìm thấy {len(current_deals)} deals từ Steam API")
 
             if not current_deals:
                 logger.warning("⚠️  Không có deals nào được tìm thấy từ API")
+                self.schedule_retry(today)
                 return
             
-            # So sánh với deals cũ để tìm deals mới
-            new_deals = self.get_new_deals(current_deals, old_deals_dict)
-            logger.info(f"🆕 Tìm thấy {len(new_deals)} deals mới so với lần check trước")
+            # Ghi lịch sử giá và phân loại từng deal bằng query theo index (app_id, check_date)
+            classified = await self.price_history.record_check(current_deals, today)
+            recorded = True
+            self._retry_attempts.pop(today, None)
+            new_deals = self.get_deals_to_announce(classified)
+            counts = {kind: sum(1 for d in classified if d['kind'] == kind) for kind in ANNOUNCE_KINDS}
+            logger.info(
+                f"🆕 {counts[NEW]} deals mới, 📉 {counts[PRICE_DROP]} giảm sâu hơn, "
+                f"🔁 {counts[BACK_ON_SALE]} quay lại sale so với lần check trước"
+            )
             
-            # Gửi thông báo deals mới
+            # Gửi thông báo deals mới (gom nhiều embeds mỗi tin nhắn, gửi qua paced sender)
             if new_deals:
-                for deal in new_deals:
-                    try:
-                        embed = discord.Embed(
-                            title=f"🔥 Giảm giá: {deal['name']}",
-                            url=deal['url'],
-                            description=f"💰 Giá mới: **${deal['price']:.2f}**\n"
-                                       f"~~Giá cũ: ${deal['old_price']:.2f}~~\n"
-                                       f"📉 Giảm: **{deal['discount']}%**",
-                            color=discord.Color.red(),
-                            timestamp=datetime.now()
-                        )
-                        embed.set_thumbnail(url=deal['image'])
-                        embed.set_footer(text=f"Steam Deal • {today}")
-                        
-                        await channel.send(embed=embed)
-                        logger.info(f"📢 Đã gửi deal: {deal['name']} (-{deal['discount']}%)")
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Lỗi gửi tin nhắn cho deal {deal['name']}: {e}")
-                
-                logger.info(f"✅ Đã gửi {len(new_deals)} deals mới")
+                await self.send_deals(channel, new_deals, today)
             else:
                 logger.info("ℹ️  Không có deals mới để thông báo")
                 
@@ -184,83 +282,129 @@ class SteamDealsCog(commands.Cog):
                     await channel.send(embed=embed)
                 except Exception as e:
                     logger.error(f"Không thể gửi thông báo: {e}")
-            
-            # Lưu deals hiện tại vào file
-            self.save_deals_data(current_deals)
                 
         except Exception as e:
             logger.error(f"❌ Lỗi khi kiểm tra deals: {e}")
             logger.exception(e)
+            # Lỗi sau khi đã ghi lần check (ví dụ lúc gửi tin nhắn) thì không check lại
+            if not recorded:
+                self.schedule_retry(today)
+    
+    def schedule_retry(self, today):
+        """Hẹn chạy lại job trong ngày (backoff theo RETRY_DELAYS_MINUTES) cho tới khi ghi được lần check hôm nay"""
+        attempt = self._retry_attempts.get(today, 0)
+        if attempt >= len(RETRY_DELAYS_MINUTES):
+            logger.error(f"❌ Đã thử lại {attempt} lần trong ngày {today}, chờ lịch check tiếp theo")
+            return
+        self._retry_attempts = {today: attempt + 1}
+        next_run = self.bot.scheduler.run_soon(JOB_NAME, timedelta(minutes=RETRY_DELAYS_MINUTES[attempt]))
+        logger.info(f"🔁 Thử lại lần {attempt + 1}/{len(RETRY_DELAYS_MINUTES)} lúc {next_run:%H:%M}")
 
-    async def fetch_steam_deals(self):
+    async def fetch_region_deals(self, region):
+        """Fetch và parse deals của một khu vực (cc=region)"""
         # Sử dụng API của Steam hoặc third-party (ví dụ: steamdb.info, isthereanydeal.com)
         # Ở đây demo với Steam Store search specials
-        url = "https://store.steampowered.com/api/featuredcategories/?cc=us&l=en"
+        url = f"https://store.steampowered.com/api/featuredcategories/?cc={region}&l=en"
         deals = []
         
-        logger.info(f"🌐 Đang gọi API Steam: {url}")
+        logger.info(f"🌐 Đang gọi API Steam [{region.upper()}]: {url}")
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, ssl=False) as resp:  # Tắt SSL verification nếu gặp lỗi certificate
-                    logger.info(f"📡 HTTP Status: {resp.status}")
-                    
-                    if resp.status == 200:
-                        try:
-                            data = await resp.json()
-                            logger.info("📋 Nhận được dữ liệu từ Steam API")
-                            
-                            # Kiểm tra xem data có đúng cấu trúc không
-                            if not isinstance(data, dict):
-                                logger.warning("⚠️  Dữ liệu không đúng định dạng (không phải dict)")
-                                return deals
-                            
-                            specials = data.get('specials', {})
-                            if not isinstance(specials, dict):
-                                logger.warning("⚠️  'specials' không đúng định dạng")
-                                return deals
-                                
-                            items = specials.get('items', [])
-                            logger.info(f"🎯 Số lượng specials từ API: {len(items)}")
-                            
-                            for i, item in enumerate(items):
-                                try:
-                                    discount = item.get('discount_percent', 0)
-                                    if discount > 0:
-                                        deal = {
-                                            'id': item['id'],
-                                            'name': item['name'],
-                                            'url': f"https://store.steampowered.com/app/{item['id']}/",
-                                            'price': item.get('final_price', 0) / 100,
-                                            'old_price': item.get('original_price', 0) / 100,
-                                            'discount': discount,
-                                            'image': item.get('small_capsule_image', '')
-                                        }
-                                        deals.append(deal)
-                                        
-                                        if i < 3:  # Log first 3 deals for debugging
-                                            logger.debug(f"   Deal {i+1}: {deal['name']} (-{discount}%)")
-                                except (KeyError, TypeError) as e:
-                                    logger.warning(f"⚠️  Bỏ qua item không hợp lệ (index {i}): {e}")
-                                    continue
-                                    
-                        except aiohttp.ContentTypeError as e:
-                            logger.warning("⚠️  Lỗi parse JSON từ Steam API: Response không phải JSON")
-                        except Exception as e:
-                            logger.warning(f"⚠️  Lỗi xử lý dữ liệu từ Steam API: {e}")
-                    else:
-                        logger.error(f"❌ HTTP Error: {resp.status}")
+            # Qua HTTP cache (TTL + ETag/Last-Modified), dùng session chung của bot, timeout riêng mỗi khu vực
+            result = await self.deals_cache.get_json(
+                self.bot.http_session,
+                url,
+                ssl=False,  # Tắt SSL verification nếu gặp lỗi certificate
+                timeout=aiohttp.ClientTimeout(total=REGION_TIMEOUT_SECONDS)
+            )
+            logger.info(f"📡 Steam API [{region.upper()}]: {result['source']} ({self.deals_cache.format_stats()})")
+            
+            data = result['data']
+            if data is None:
+                return deals
+            
+            # Dữ liệu không đổi -> dùng lại danh sách deals đã parse lần trước
+            if not result['changed'] and result['source'] != 'miss' and region in self._parsed_deals:
+                logger.info(f"♻️  Dữ liệu Steam [{region.upper()}] không đổi, dùng lại {len(self._parsed_deals[region])} deals")
+                return list(self._parsed_deals[region])
+            
+            # Kiểm tra xem data có đúng cấu trúc không
+            if not isinstance(data, dict):
+                logger.warning("⚠️  Dữ liệu không đúng định dạng (không phải dict)")
+                return deals
+            
+            specials = data.get('specials', {})
+            if not isinstance(specials, dict):
+                logger.warning("⚠️  'specials' không đúng định dạng")
+                return deals
+                
+            items = specials.get('items', [])
+            logger.info(f"🎯 Số lượng specials từ API [{region.upper()}]: {len(items)}")
+            
+            for i, item in enumerate(items):
+                try:
+                    discount = item.get('discount_percent', 0)
+                    if discount > 0:
+                        deal = {
+                            'id': item['id'],
+                            'name': item['name'],
+                            'url': f"https://store.steampowered.com/app/{item['id']}/",
+                            'price': item.get('final_price', 0) / 100,
+                            'old_price': item.get('original_price', 0) / 100,
+                            'discount': discount,
+                            'currency': item.get('currency', 'USD'),
+                            'image': item.get('small_capsule_image', '')
+                        }
+                        deals.append(deal)
                         
-        except aiohttp.ClientConnectorCertificateError as e:
-            logger.error("⚠️  Lỗi SSL Certificate - Không thể kết nối đến Steam (certificate verification failed)")
-        except aiohttp.ClientConnectorError as e:
-            logger.error("⚠️  Lỗi kết nối đến Steam API - Kiểm tra internet hoặc Steam có thể đang down")
-        except aiohttp.ClientError as e:
-            logger.error(f"⚠️  Lỗi client khi gọi Steam API: {type(e).__name__}")
+                        if i < 3:  # Log first 3 deals for debugging
+                            logger.debug(f"   Deal {i+1}: {deal['name']} (-{discount}%)")
+                except (KeyError, TypeError) as e:
+                    logger.warning(f"⚠️  Bỏ qua item không hợp lệ (index {i}): {e}")
+                    continue
+            
+            self._parsed_deals[region] = list(deals)
+                    
         except Exception as e:
-            logger.error(f"❌ Lỗi không xác định khi fetch Steam API: {type(e).__name__} - {e}")
+            logger.error(f"❌ Lỗi không xác định khi fetch Steam API [{region.upper()}]: {type(e).__name__} - {e}")
             
-        logger.info(f"✅ Tổng cộng {len(deals)} deals có discount")
+        return deals
+    
+    async def fetch_steam_deals(self):
+        """Fetch song song tất cả khu vực và gộp theo app ID
+        
+        Giá chính (price/old_price/discount/currency) lấy từ khu vực đầu tiên trong STEAM_DEALS_REGIONS;
+        mỗi deal có thêm 'prices' = {region: {price, old_price, discount, currency}}.
+        Nếu khu vực chính không có dữ liệu thì trả về rỗng: lịch sử giá chỉ lưu một loại tiền,
+        ghi giá của khu vực khác sẽ làm lần check sau báo sai giảm giá.
+        """
+        results = await asyncio.gather(*(self.fetch_region_deals(region) for region in REGIONS))
+        
+        primary_region, primary_deals = REGIONS[0], results[0]
+        if not primary_deals:
+            other = sum(len(deals) for deals in results[1:])
+            logger.warning(
+                f"⚠️  Khu vực chính {primary_region.upper()} không có dữ liệu"
+                + (f", bỏ qua {other} deals của các khu vực khác" if other else "")
+            )
+            return []
+        
+        merged = {}
+        for deal in primary_deals:
+            merged[deal['id']] = {**deal, 'prices': {}}
+        
+        for region, deals in zip(REGIONS, results):
+            for deal in deals:
+                if deal['id'] in merged:
+                    merged[deal['id']]['prices'][region] = {
+                        'price': deal['price'],
+                        'old_price': deal['old_price'],
+                        'discount': deal['discount'],
+                        'currency': deal['currency']
+                    }
+        
+        deals = list(merged.values())
+        logger.info(f"✅ Tổng cộng {len(deals)} deals có discount (khu vực chính: {primary_region.upper()})")
         return deals
 
 async def setup(bot):
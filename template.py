@@ -11,6 +11,10 @@ load_dotenv()
 # Ưu tiên lấy từ system environment variables
 GUILD_ID = int(os.environ.get('GUILD_ID') or os.getenv('GUILD_ID'))
 
+# Tên các cogs (tên file trong ./cogs) phải load xong trước cog này.
+# Cogs không khai báo dependency sẽ được load song song.
+COG_DEPENDENCIES = []
+
 
 class Template(commands.Cog):
     
@@ -0,0 +1,155 @@
+"""
+GitHubRefresher chạy với một API server giả lập (aiohttp.web) trên localhost
+"""
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.github_refresher import GitHubRefresher, MAX_PACE_DELAY
+from utils.repo_registry import RepoRegistry
+
+ETAG = '"v1"'
+
+
+def repo_payload(full_name, stars):
+    owner, name = full_name.split('/', 1)
+    return {
+        "name": name,
+        "full_name": full_name,
+        "owner": {"login": owner},
+        "description": "demo",
+        "html_url": f"https://github.com/{full_name}",
+        "stargazers_count": stars,
+        "forks_count": 1,
+        "language": "Python",
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-06-01T00:00:00Z",
+        "open_issues_count": 0
+    }
+
+
+class StubGitHub:
+    """API giả: trả 304 khi If-None-Match khớp ETag, 404 với repo không có trong `repos`"""
+
+    def __init__(self, repos, remaining=4999, reset_in=3600):
+        self.repos = repos
+        self.remaining = remaining
+        self.reset_in = reset_in
+        self.requests = []
+
+    def rate_headers(self):
+        return {
+            'X-RateLimit-Limit': '5000',
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': str(int(time.time() + self.reset_in))
+        }
+
+    async def handle(self, request):
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        self.requests.append((full_name, request.headers.get('If-None-Match')))
+        headers = self.rate_headers()
+        if full_name not in self.repos:
+            return web.json_response({"message": "Not Found"}, status=404, headers=headers)
+        if request.headers.get('If-None-Match') == ETAG:
+            return web.Response(status=304, headers=headers)
+        return web.json_response(self.repos[full_name], headers={**headers, 'ETag': ETAG})
+
+
+async def run_with_stub(stub, tmp_path, repos, scenario):
+    app = web.Application()
+    app.router.add_get('/repos/{owner}/{repo}', stub.handle)
+    server = TestServer(app, host='127.0.0.1')
+    await server.start_server()
+
+    registry = RepoRegistry(str(tmp_path / 'repos.json'))
+    for repo in repos:
+        registry.add(repo)
+
+    session = aiohttp.ClientSession()
+    try:
+        refresher = GitHubRefresher(
+            registry,
+            lambda: session,
+            api_url=str(server.make_url('')),
+            token=None,
+            state_file=str(tmp_path / 'github_refresh.json')
+        )
+        return await scenario(refresher, registry)
+    finally:
+        await session.close()
+        await server.close()
+
+
+def registry_entry(full_name, stars):
+    return {'full_name': full_name, 'name': full_name.split('/')[1], 'stars': stars}
+
+
+def test_etag_revalidation_returns_not_modified(tmp_path):
+    stub = StubGitHub({'octo/demo': repo_payload('octo/demo', 42)})
+
+    async def scenario(refresher, registry):
+        first = await refresher.refresh_repo(registry.get('octo/demo'))
+        second = await refresher.refresh_repo(registry.get('octo/demo'))
+        return first, second, registry.get('octo/demo')['stars']
+
+    first, second, stars = asyncio.run(run_with_stub(stub, tmp_path, [registry_entry('octo/demo', 1)], scenario))
+
+    assert (first, second) == ('updated', 'not_modified')
+    assert stars == 42
+    assert stub.requests == [('octo/demo', None), ('octo/demo', ETAG)]
+
+
+def test_pacing_spreads_remaining_budget_until_reset(tmp_path):
+    stub = StubGitHub({'octo/demo': repo_payload('octo/demo', 1)}, remaining=110, reset_in=1000)
+
+    async def scenario(refresher, registry):
+        await refresher.refresh_repo(registry.get('octo/demo'))
+        return refresher.pace_delay(), refresher.state['rate']
+
+    delay, rate = asyncio.run(run_with_stub(stub, tmp_path, [registry_entry('octo/demo', 1)], scenario))
+
+    assert rate['remaining'] == 110 and rate['limit'] == 5000
+    # 100 request dùng được (trừ 10 dự trữ) cho khoảng 1000 giây
+    assert delay == pytest.approx(10, abs=0.5)
+
+
+def test_pacing_is_capped(tmp_path):
+    stub = StubGitHub({'octo/demo': repo_payload('octo/demo', 1)}, remaining=12, reset_in=3600)
+
+    async def scenario(refresher, registry):
+        await refresher.refresh_repo(registry.get('octo/demo'))
+        return refresher.pace_delay()
+
+    assert asyncio.run(run_with_stub(stub, tmp_path, [registry_entry('octo/demo', 1)], scenario)) == MAX_PACE_DELAY
+
+
+def test_exhausted_budget_defers_remaining_repos(tmp_path):
+    names = ['octo/a', 'octo/b', 'octo/c']
+    stub = StubGitHub({name: repo_payload(name, 1) for name in names}, remaining=5)
+
+    async def scenario(refresher, registry):
+        counts = await refresher.refresh_all()
+        return counts, refresher.stats
+
+    counts, stats = asyncio.run(run_with_stub(stub, tmp_path, [registry_entry(n, 1) for n in names], scenario))
+
+    assert [name for name, _ in stub.requests] == ['octo/a']
+    assert counts == {'updated': 1}
+    assert stats['deferred'] == 2
+
+
+def test_missing_repo_is_reported_and_left_in_registry(tmp_path):
+    stub = StubGitHub({})
+
+    async def scenario(refresher, registry):
+        result = await refresher.refresh_repo(registry.get('octo/gone'))
+        return result, registry.get('octo/gone')
+
+    result, repo = asyncio.run(run_with_stub(stub, tmp_path, [registry_entry('octo/gone', 3)], scenario))
+
+    assert result == 'missing'
+    assert repo['stars'] == 3
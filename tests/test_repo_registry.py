@@ -0,0 +1,52 @@
+"""
+RepoRegistry: cập nhật tại chỗ và đổi tên giữ index nhất quán
+"""
+from utils.repo_registry import RepoRegistry
+
+
+def make_repo(full_name):
+    owner, name = full_name.split('/', 1)
+    return {'full_name': full_name, 'name': name, 'owner': owner, 'html_url': f"https://github.com/{full_name}"}
+
+
+def make_registry(tmp_path, *full_names):
+    registry = RepoRegistry(str(tmp_path / 'repos.json'))
+    for full_name in full_names:
+        registry.add(make_repo(full_name))
+    return registry
+
+
+def test_rename_keeps_position_and_reindexes(tmp_path):
+    registry = make_registry(tmp_path, 'octo/a', 'octo/b', 'octo/c')
+
+    repo = registry.update('octo/b', make_repo('octo/renamed'))
+
+    assert repo['full_name'] == 'octo/renamed'
+    assert [r['full_name'] for r in registry.all()] == ['octo/a', 'octo/renamed', 'octo/c']
+    assert registry.find('renamed') is repo
+    assert registry.find('https://github.com/octo/renamed') is repo
+    assert registry.find('octo/b') is None
+    assert 'octo/b' not in registry.suggest('octo/')
+
+
+def test_rename_onto_existing_repo_is_rejected(tmp_path):
+    registry = make_registry(tmp_path, 'octo/a', 'octo/b')
+    version = registry.version
+
+    assert registry.update('octo/a', make_repo('octo/b')) is None
+
+    assert len(registry) == 2
+    assert registry.version == version
+    assert registry.get('octo/a')['name'] == 'a'
+    assert registry.find('a') is registry.get('octo/a')
+    assert registry.find('b') is registry.get('octo/b')
+    assert sorted(registry.suggest('octo/')) == ['octo/a', 'octo/b']
+
+
+def test_update_non_indexed_field(tmp_path):
+    registry = make_registry(tmp_path, 'octo/a')
+
+    registry.update('octo/a', {'stars': 7})
+
+    assert registry.get('octo/a')['stars'] == 7
+    assert registry.find('a')['stars'] == 7
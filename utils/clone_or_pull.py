@@ -1,19 +1,86 @@
 import os
+import time
 import asyncio
+from collections import deque
+from contextlib import nullcontext
 
+# Clone mới mặc định không tải blob cho tới khi cần (partial clone); đặt CLONE_FILTER= để clone đầy đủ
+CLONE_FILTER = os.environ.get('CLONE_FILTER', 'blob:none')
+# Đặt CLONE_DEPTH (ví dụ 1) để clone shallow thay cho partial clone
+CLONE_DEPTH = int(os.environ.get('CLONE_DEPTH') or 0)
 
-async def run_docker_compose(repo_path, repo_name):
-    """Chạy docker compose để build và deploy container
+# Docker compose: số dòng output cuối giữ lại, khoảng cách giữa các lần báo tiến độ (giây), độ dài lỗi trả về
+DOCKER_OUTPUT_TAIL_LINES = 15
+DOCKER_PROGRESS_INTERVAL = 5
+DOCKER_ERROR_CHARS = 800
+# Đọc output theo chunk; mỗi dòng chỉ giữ tối đa chừng này byte
+STREAM_CHUNK_BYTES = 1 << 16
+STREAM_LINE_MAX_BYTES = 4096
+
+# Thư mục checkout -> asyncio.Lock, xem clone_or_pull_repo
+_path_locks = {}
+
+
+async def _stream_process(cmd, cwd, on_line, env=None):
+    """Chạy lệnh và gọi on_line(line) cho từng dòng output (stdout + stderr gộp), trả về returncode
+
+    Đọc theo chunk thay vì readline(): dòng dài hơn giới hạn của StreamReader (progress của docker build)
+    không làm lỗi, chỉ bị cắt bớt. Lỗi hoặc huỷ giữa chừng thì kill process và chờ nó thoát (không để zombie).
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        cwd=cwd,
+        env=env
+    )
+    
+    async def emit(raw):
+        await on_line(raw[:STREAM_LINE_MAX_BYTES].decode('utf-8', errors='ignore').rstrip())
+    
+    try:
+        buffer = b''
+        while True:
+            chunk = await process.stdout.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                await emit(line)
+            if len(buffer) > STREAM_LINE_MAX_BYTES:
+                # Dòng rất dài chưa có newline: báo phần đầu, bỏ phần còn lại của buffer
+                await emit(buffer)
+                buffer = b''
+        if buffer:
+            await emit(buffer)
+        return await process.wait()
+    finally:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+
+async def run_docker_compose(repo_path, repo_name, progress=None):
+    """Build image rồi thay container tại chỗ (rolling): build -> up -d, không chạy down
+    
+    Container cũ vẫn chạy trong suốt quá trình build, chỉ bị thay khi `up -d` tạo lại container.
     
     Args:
         repo_path (str): Đường dẫn đến repository
         repo_name (str): Tên repository
+        progress (callable): async progress(text) được gọi định kỳ với phase và các dòng output cuối
         
     Returns:
         dict: Kết quả của thao tác docker compose với các keys:
             - success (bool): Thành công hay không
             - message (str): Thông báo chi tiết
+            - timings (dict): Thời gian (giây) của build và up
     """
+    timings = {}
     try:
         # Kiểm tra xem có file docker-compose.yml không
         docker_compose_file = None
@@ -26,69 +93,163 @@ async def run_docker_compose(repo_path, repo_name):
         if not docker_compose_file:
             return {
                 'success': False,
-                'message': f"⚠️ Không tìm thấy file docker-compose trong **{repo_name}**"
+                'message': f"⚠️ Không tìm thấy file docker-compose trong **{repo_name}**",
+                'timings': timings
             }
         
         print(f"Tìm thấy {docker_compose_file}, đang chạy docker compose...")
         
-        # Dừng và xóa containers cũ (nếu có)
-        print(f"Dừng containers cũ của {repo_name}...")
-        stop_process = await asyncio.create_subprocess_exec(
-            'docker', 'compose', '-f', docker_compose_file, 'down',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=repo_path
-        )
-        await stop_process.communicate()
+        tail = deque(maxlen=DOCKER_OUTPUT_TAIL_LINES)
+        state = {'phase': '', 'last_progress': 0.0}
         
-        # Build và chạy containers mới
-        print(f"Build và deploy containers cho {repo_name}...")
-        up_process = await asyncio.create_subprocess_exec(
-            'docker', 'compose', '-f', docker_compose_file, 
-            'up', '-d', '--build',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=repo_path
-        )
-        stdout, stderr = await up_process.communicate()
+        async def report(force=False):
+            if not progress:
+                return
+            now = time.monotonic()
+            if not force and now - state['last_progress'] < DOCKER_PROGRESS_INTERVAL:
+                return
+            state['last_progress'] = now
+            text = "\n".join(tail)[-1500:]
+            try:
+                await progress(f"🐳 **{repo_name}** – {state['phase']}\n```\n{text or '...'}\n```")
+            except Exception as e:
+                print(f"Không cập nhật được tiến độ docker: {e}")
         
-        if up_process.returncode == 0:
-            return {
-                'success': True,
-                'message': f"🐳 Đã deploy **{repo_name}** lên Docker thành công!"
-            }
-        else:
-            error_msg = stderr.decode('utf-8', errors='ignore')
-            return {
-                'success': False,
-                'message': f"⚠️ Lỗi khi deploy Docker cho **{repo_name}**: {error_msg[:150]}"
-            }
+        async def on_line(line):
+            if not line:
+                return
+            print(f"[{repo_name}] {line}")
+            tail.append(line[:200])
+            await report()
+        
+        # BuildKit in từng bước dạng text thay vì thanh tiến độ TTY
+        env = {**os.environ, 'BUILDKIT_PROGRESS': 'plain'}
+        
+        steps = [
+            ('build', "Đang build image...", ('docker', 'compose', '-f', docker_compose_file, 'build')),
+            # Thay container tại chỗ bằng image vừa build, xoá container của service đã bị bỏ
+            ('up', "Đang thay container...", ('docker', 'compose', '-f', docker_compose_file,
+                                              'up', '-d', '--remove-orphans')),
+        ]
+        for phase, label, cmd in steps:
+            print(f"{label} ({repo_name})")
+            state['phase'] = label
+            tail.append(f"$ {' '.join(cmd)}")
+            await report(force=True)
+            
+            started = time.perf_counter()
+            returncode = await _stream_process(cmd, repo_path, on_line, env=env)
+            timings[phase] = time.perf_counter() - started
+            
+            if returncode != 0:
+                state['phase'] = f"❌ {phase} thất bại"
+                await report(force=True)
+                error_tail = "\n".join(tail)[-DOCKER_ERROR_CHARS:]
+                return {
+                    'success': False,
+                    'message': f"⚠️ Lỗi khi {phase} Docker cho **{repo_name}**:\n```\n{error_tail}\n```",
+                    'timings': timings
+                }
+        
+        state['phase'] = "✅ Hoàn tất"
+        await report(force=True)
+        return {
+            'success': True,
+            'message': f"🐳 Đã deploy **{repo_name}** lên Docker thành công! (build {timings['build']:.1f}s, up {timings['up']:.1f}s)",
+            'timings': timings
+        }
             
     except FileNotFoundError:
         return {
             'success': False,
-            'message': f"❌ Docker hoặc Docker Compose chưa được cài đặt hoặc không có trong PATH"
+            'message': f"❌ Docker hoặc Docker Compose chưa được cài đặt hoặc không có trong PATH",
+            'timings': timings
         }
     except Exception as e:
         return {
             'success': False,
-            'message': f"❌ Lỗi khi chạy Docker Compose: {str(e)[:150]}"
+            'message': f"❌ Lỗi khi chạy Docker Compose: {str(e)[:150]}",
+            'timings': timings
         }
 
 
-async def clone_or_pull_repo(repo_info, projects_dir="projects"):
+async def _git(*args):
+    """Chạy lệnh git, trả về (returncode, stdout, stderr)"""
+    process = await asyncio.create_subprocess_exec(
+        'git', *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    return (
+        process.returncode,
+        stdout.decode('utf-8', errors='ignore').strip(),
+        stderr.decode('utf-8', errors='ignore').strip()
+    )
+
+
+async def get_local_and_remote_sha(repo_path):
+    """Lấy SHA của HEAD local và của branch tương ứng trên remote (ls-remote, không tải object)
+
+    Returns:
+        tuple: (local_sha, remote_sha), None nếu không lấy được
+    """
+    code, local_sha, _ = await _git('-C', repo_path, 'rev-parse', 'HEAD')
+    if code != 0:
+        return None, None
+
+    code, branch, _ = await _git('-C', repo_path, 'rev-parse', '--abbrev-ref', 'HEAD')
+    ref = f"refs/heads/{branch}" if code == 0 and branch != 'HEAD' else 'HEAD'
+
+    code, output, _ = await _git('-C', repo_path, 'ls-remote', 'origin', ref)
+    if code != 0 or not output:
+        return local_sha, None
+    return local_sha, output.split()[0]
+
+
+def _path_lock(repo_path):
+    """Lock riêng cho từng thư mục checkout"""
+    return _path_locks.setdefault(os.path.abspath(repo_path), asyncio.Lock())
+
+
+def _combine_message(message, docker_result):
+    if docker_result and docker_result['message']:
+        message += f"\n{docker_result['message']}"
+    return message
+
+
+async def clone_or_pull_repo(repo_info, projects_dir="projects", force=False, progress=None,
+                             git_semaphore=None, docker_semaphore=None):
     """Clone repository nếu chưa có hoặc pull nếu đã có
+
+    Nếu repo đã có và HEAD local trùng với remote thì bỏ qua cả pull lẫn docker compose
+    (trừ khi force=True). Clone mới dùng --filter=blob:none (CLONE_FILTER) để tải ít hơn.
+    Hai repo khác owner nhưng trùng tên dùng chung thư mục projects/<name>, nên các lần gọi
+    cho cùng một thư mục chạy lần lượt, không clone/pull/deploy chồng lên nhau.
     
     Args:
         repo_info (dict): Thông tin repository từ GitHub API
         projects_dir (str): Đường dẫn thư mục chứa các projects
+        force (bool): Luôn pull và deploy lại kể cả khi không có commit mới
+        progress (callable): async progress(text) nhận tiến độ docker compose (xem run_docker_compose)
+        git_semaphore / docker_semaphore (asyncio.Semaphore): giới hạn số thao tác git / docker chạy cùng lúc
+            khi xử lý nhiều repo song song
         
     Returns:
         dict: Kết quả của thao tác clone/pull với các keys:
             - success (bool): Thành công hay không
-            - action (str): 'cloned', 'pulled', 'clone_failed', 'pull_failed', hoặc 'error'
+            - action (str): 'cloned', 'pulled', 'up_to_date', 'clone_failed', 'pull_failed', hoặc 'error'
             - message (str): Thông báo chi tiết
+            - skipped (bool): True nếu không có thay đổi nên không pull/deploy
+            - timings (dict): Thời gian (giây) của từng bước: check, fetch, build, up
     """
+    repo_path = os.path.join(projects_dir, repo_info.get('name') or '')
+    async with _path_lock(repo_path):
+        return await _clone_or_pull_repo(repo_info, projects_dir, force, progress, git_semaphore, docker_semaphore)
+
+
+async def _clone_or_pull_repo(repo_info, projects_dir, force, progress, git_semaphore, docker_semaphore):
+    timings = {}
     try:
         repo_name = repo_info['name']
         repo_url = repo_info['html_url']
@@ -96,84 +257,87 @@ async def clone_or_pull_repo(repo_info, projects_dir="projects"):
         
         # Kiểm tra xem repo đã tồn tại chưa
         if os.path.exists(repo_path):
-            # Nếu đã tồn tại, thực hiện git pull
-            print(f"Repository {repo_name} đã tồn tại, đang pull...")
+            # So sánh HEAD local với remote trước khi pull
+            async with git_semaphore or nullcontext():
+                started = time.perf_counter()
+                local_sha, remote_sha = await get_local_and_remote_sha(repo_path)
+                timings['check'] = time.perf_counter() - started
             
-            # Chạy git pull
-            process = await asyncio.create_subprocess_exec(
-                'git', '-C', repo_path, 'pull',
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode == 0:
-                # Sau khi pull thành công, chạy docker compose
-                docker_result = await run_docker_compose(repo_path, repo_name)
-                
-                # Kết hợp thông báo
-                message = f"✅ Đã pull repository **{repo_name}** thành công!"
-                if docker_result['success']:
-                    message += f"\n{docker_result['message']}"
-                elif docker_result['message']:
-                    message += f"\n{docker_result['message']}"
-                
+            if not force and local_sha and local_sha == remote_sha:
+                print(f"Repository {repo_name} không có commit mới ({local_sha[:7]}), bỏ qua pull/deploy")
                 return {
                     'success': True,
-                    'action': 'pulled',
-                    'message': message,
-                    'docker_deployed': docker_result['success']
+                    'action': 'up_to_date',
+                    'message': f"ℹ️ **{repo_name}** đã ở commit mới nhất (`{local_sha[:7]}`), bỏ qua pull và deploy",
+                    'docker_deployed': False,
+                    'skipped': True,
+                    'timings': timings
                 }
-            else:
-                error_msg = stderr.decode('utf-8', errors='ignore')
+            
+            # Nếu có commit mới, thực hiện git pull
+            print(f"Repository {repo_name} đã tồn tại, đang pull...")
+            async with git_semaphore or nullcontext():
+                started = time.perf_counter()
+                code, _, error_msg = await _git('-C', repo_path, 'pull')
+                timings['fetch'] = time.perf_counter() - started
+            
+            if code != 0:
                 return {
                     'success': False,
                     'action': 'pull_failed',
                     'message': f"⚠️ Không thể pull repository **{repo_name}**: {error_msg[:100]}",
-                    'docker_deployed': False
+                    'docker_deployed': False,
+                    'skipped': False,
+                    'timings': timings
                 }
+            action = 'pulled'
+            message = f"✅ Đã pull repository **{repo_name}** thành công!"
         else:
             # Nếu chưa tồn tại, thực hiện git clone
             print(f"Repository {repo_name} chưa tồn tại, đang clone...")
+            clone_args = ['clone']
+            if CLONE_FILTER:
+                clone_args.append(f"--filter={CLONE_FILTER}")
+            if CLONE_DEPTH:
+                clone_args.append(f"--depth={CLONE_DEPTH}")
             
-            # Chạy git clone
-            process = await asyncio.create_subprocess_exec(
-                'git', 'clone', repo_url, repo_path,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
+            async with git_semaphore or nullcontext():
+                started = time.perf_counter()
+                code, _, error_msg = await _git(*clone_args, repo_url, repo_path)
+                timings['fetch'] = time.perf_counter() - started
             
-            if process.returncode == 0:
-                # Sau khi clone thành công, chạy docker compose
-                docker_result = await run_docker_compose(repo_path, repo_name)
-                
-                # Kết hợp thông báo
-                message = f"✅ Đã clone repository **{repo_name}** thành công!"
-                if docker_result['success']:
-                    message += f"\n{docker_result['message']}"
-                elif docker_result['message']:
-                    message += f"\n{docker_result['message']}"
-                
-                return {
-                    'success': True,
-                    'action': 'cloned',
-                    'message': message,
-                    'docker_deployed': docker_result['success']
-                }
-            else:
-                error_msg = stderr.decode('utf-8', errors='ignore')
+            if code != 0:
                 return {
                     'success': False,
                     'action': 'clone_failed',
                     'message': f"⚠️ Không thể clone repository **{repo_name}**: {error_msg[:100]}",
-                    'docker_deployed': False
+                    'docker_deployed': False,
+                    'skipped': False,
+                    'timings': timings
                 }
+            action = 'cloned'
+            message = f"✅ Đã clone repository **{repo_name}** thành công!"
+        
+        # Sau khi clone/pull thành công, chạy docker compose
+        async with docker_semaphore or nullcontext():
+            docker_result = await run_docker_compose(repo_path, repo_name, progress=progress)
+        timings.update(docker_result['timings'])
+        
+        return {
+            'success': True,
+            'action': action,
+            'message': _combine_message(message, docker_result),
+            'docker_deployed': docker_result['success'],
+            'skipped': False,
+            'timings': timings
+        }
                 
     except Exception as e:
         return {
             'success': False,
             'action': 'error',
             'message': f"❌ Lỗi khi xử lý repository: {str(e)[:100]}",
-            'docker_deployed': False
+            'docker_deployed': False,
+            'skipped': False,
+            'timings': timings
         }
@@ -0,0 +1,154 @@
+"""
+Cài dependencies khi deploy: so hash requirements.txt, build wheel vào wheelhouse cục bộ,
+cài vào virtualenv mới rồi đổi symlink data/venv-current một cách atomic
+
+Chạy lần đầu (bootstrap) bằng: python -m utils.dependency_installer
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+
+logger = logging.getLogger('dependency_installer')
+
+REQUIREMENTS_FILE = "requirements.txt"
+STATE_FILE = "data/dependency_state.json"
+WHEELHOUSE_DIR = "data/wheelhouse"
+VENVS_DIR = "data/venvs"
+CURRENT_LINK = "data/venv-current"
+# Số virtualenv cũ giữ lại để rollback thủ công
+KEEP_OLD_VENVS = 1
+
+
+def requirements_hash(path=REQUIREMENTS_FILE):
+    """Hash nội dung requirements.txt + phiên bản Python (đổi Python cũng cần cài lại)"""
+    digest = hashlib.sha256()
+    digest.update(f"{sys.version_info.major}.{sys.version_info.minor}\n".encode('utf-8'))
+    with open(path, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def venv_python(venv_dir):
+    if os.name == 'nt':
+        return os.path.join(venv_dir, 'Scripts', 'python.exe')
+    return os.path.join(venv_dir, 'bin', 'python')
+
+
+def current_python():
+    """Python của virtualenv đang được trỏ tới, hoặc Python hiện tại nếu chưa có"""
+    python = venv_python(CURRENT_LINK)
+    return os.path.abspath(python) if os.path.exists(python) else sys.executable
+
+
+def load_state():
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.error(f"❌ Lỗi đọc {STATE_FILE}: {e}")
+        return {}
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    tmp_path = f"{STATE_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+async def _run(*cmd):
+    """Chạy lệnh, trả về (returncode, output)"""
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+    stdout, _ = await process.communicate()
+    return process.returncode, stdout.decode('utf-8', errors='ignore')
+
+
+def _swap_current_link(venv_dir):
+    """Đổi data/venv-current sang venv mới bằng rename (atomic)"""
+    tmp_link = f"{CURRENT_LINK}.tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.abspath(venv_dir), tmp_link)
+    os.replace(tmp_link, CURRENT_LINK)
+
+
+def _cleanup_old_venvs(keep):
+    if not os.path.isdir(VENVS_DIR):
+        return
+    venvs = sorted(
+        (os.path.join(VENVS_DIR, name) for name in os.listdir(VENVS_DIR)),
+        key=os.path.getmtime,
+        reverse=True
+    )
+    keep = {os.path.abspath(path) for path in keep}
+    old = [path for path in venvs if os.path.abspath(path) not in keep]
+    for path in old[KEEP_OLD_VENVS:]:
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"🧹 Đã xoá virtualenv cũ {path}")
+
+
+async def ensure_dependencies(requirements=REQUIREMENTS_FILE):
+    """Đảm bảo có virtualenv khớp với requirements.txt hiện tại
+
+    Returns:
+        dict: {'success', 'changed', 'python', 'message'}
+        - python: interpreter dùng để chạy bot mới
+        - Khi lỗi, venv-current không đổi (bot đang chạy không bị ảnh hưởng)
+    """
+    # Hash file, xoá / đổi venv chạy trong worker thread để không chặn event loop (gateway heartbeat)
+    req_hash = await asyncio.to_thread(requirements_hash, requirements)
+    state = load_state()
+
+    if state.get('hash') == req_hash and os.path.exists(venv_python(CURRENT_LINK)):
+        logger.info("ℹ️  requirements.txt không đổi, bỏ qua cài dependencies")
+        return {'success': True, 'changed': False, 'python': current_python(), 'message': 'unchanged'}
+
+    venv_dir = os.path.join(VENVS_DIR, req_hash[:12])
+    python = venv_python(venv_dir)
+    os.makedirs(WHEELHOUSE_DIR, exist_ok=True)
+
+    if os.path.exists(venv_dir):
+        # Venv dở dang từ lần cài lỗi trước
+        await asyncio.to_thread(shutil.rmtree, venv_dir, ignore_errors=True)
+
+    steps = [
+        ("Tạo virtualenv", (sys.executable, '-m', 'venv', venv_dir)),
+        # Chỉ tải các wheel còn thiếu, wheel đã có trong wheelhouse được dùng lại
+        ("Build wheelhouse", (python, '-m', 'pip', 'wheel', '-q', '-r', requirements,
+                              '-w', WHEELHOUSE_DIR, '--find-links', WHEELHOUSE_DIR)),
+        ("Cài từ wheelhouse", (python, '-m', 'pip', 'install', '-q', '--no-index',
+                               '--find-links', WHEELHOUSE_DIR, '-r', requirements)),
+    ]
+    for label, cmd in steps:
+        logger.info(f"📦 {label}...")
+        returncode, output = await _run(*cmd)
+        if returncode != 0:
+            logger.error(f"❌ {label} thất bại:\n{output}")
+            await asyncio.to_thread(shutil.rmtree, venv_dir, ignore_errors=True)
+            return {'success': False, 'changed': True, 'python': current_python(), 'message': f"{label} thất bại"}
+
+    previous = os.path.realpath(CURRENT_LINK) if os.path.lexists(CURRENT_LINK) else None
+    _swap_current_link(venv_dir)
+    save_state({'hash': req_hash, 'venv': venv_dir})
+    await asyncio.to_thread(_cleanup_old_venvs, [venv_dir] + ([previous] if previous else []))
+
+    logger.info(f"✅ Đã cài dependencies vào {venv_dir}")
+    return {'success': True, 'changed': True, 'python': os.path.abspath(venv_python(CURRENT_LINK)), 'message': 'installed'}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s')
+    result = asyncio.run(ensure_dependencies())
+    print(result['python'])
+    sys.exit(0 if result['success'] else 1)
@@ -0,0 +1,179 @@
+"""
+Hàng đợi deploy: chạy tuần tự, gộp các push đến gần nhau (debounce) và bỏ qua commit đã deploy
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+
+logger = logging.getLogger('deploy_queue')
+
+STATE_FILE = "data/deploy_state.json"
+DEBOUNCE_SECONDS = 15
+# Số SHA đã deploy được nhớ lại để bỏ qua push trùng
+HISTORY_SIZE = 50
+
+# Kết quả trả về từ deploy function
+DEPLOYED = 'deployed'    # Đã cập nhật, không cần restart
+RESTART = 'restart'      # Process mới đã sẵn sàng, process hiện tại cần thoát
+FAILED = 'failed'
+
+
+class DeployCoordinator:
+    """Nhận push, chờ hết debounce rồi deploy commit mới nhất (mỗi lần chỉ một deploy)
+
+    deploy_func(job) nhận dict {'sha', 'repo', 'branch', 'pushes', 'received_at'} và trả về
+    DEPLOYED / RESTART / FAILED. Khi RESTART, state được lưu trước rồi mới gọi on_restart().
+    Push đang chờ cũng được lưu, nên process mới sau restart sẽ tiếp tục xử lý.
+    Job đang deploy được lưu là 'running' trước khi gọi deploy_func, nên process mới (handoff) không deploy lại nó.
+    """
+
+    def __init__(self, deploy_func, on_restart=None, debounce=DEBOUNCE_SECONDS, state_file=STATE_FILE):
+        self.deploy_func = deploy_func
+        self.on_restart = on_restart
+        self.debounce = debounce
+        self.state_file = state_file
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self.running = None
+        self.state = self._load_state()
+        self.pending = self.state.get('pending')
+        # Job process trước đang deploy khi process này khởi động (thường là chính lần deploy đã handoff sang đây)
+        self._interrupted = self.state.get('running')
+
+    # ------------------------------------------------------------------
+    # Trạng thái
+    # ------------------------------------------------------------------
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        except Exception as e:
+            logger.error(f"❌ Lỗi đọc {self.state_file}: {e}")
+            state = {}
+        state.setdefault('deployed', [])
+        state.setdefault('last_result', None)
+        return state
+
+    def _save_state(self):
+        self.state['pending'] = self.pending
+        self.state['running'] = self.running
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.error(f"❌ Lỗi lưu {self.state_file}: {e}")
+
+    @property
+    def deployed_sha(self):
+        deployed = self.state['deployed']
+        return deployed[-1]['sha'] if deployed else None
+
+    def is_deployed(self, sha):
+        return bool(sha) and any(entry['sha'] == sha for entry in self.state['deployed'])
+
+    # ------------------------------------------------------------------
+    # Nhận push
+    # ------------------------------------------------------------------
+    def start(self):
+        """Tiếp tục push đang chờ từ lần chạy trước (nếu có)"""
+        if self._interrupted:
+            job, self._interrupted = self._interrupted, None
+            logger.info(f"✅ Deploy {job.get('sha') or '?'} đã chạy ở process trước, không deploy lại")
+            self._record_result(job, RESTART)
+            self._save_state()
+        if self.pending:
+            logger.info(f"🔁 Tiếp tục deploy đang chờ: {self.pending.get('sha') or '?'}")
+            self._schedule()
+
+    def submit(self, sha, repo='', branch=''):
+        """Thêm một push vào hàng đợi, trả về 'queued' hoặc 'ignored'"""
+        if self.is_deployed(sha) or (self.running and sha and self.running['sha'] == sha):
+            logger.info(f"⏭  Bỏ qua {sha}: đã deploy hoặc đang deploy")
+            return 'ignored'
+
+        pushes = (self.pending or {}).get('pushes', 0) + 1
+        self.pending = {
+            'sha': sha,
+            'repo': repo,
+            'branch': branch,
+            'pushes': pushes,
+            'received_at': datetime.now().isoformat()
+        }
+        self._save_state()
+        self._schedule()
+        logger.info(f"📥 Đã xếp hàng deploy {sha or '?'} ({pushes} push), chờ {self.debounce}s")
+        return 'queued'
+
+    def _schedule(self):
+        # Push mới đặt lại debounce timer (chỉ huỷ task còn đang chờ, không huỷ deploy đang chạy)
+        if self._timer and not self._timer.done():
+            self._timer.cancel()
+        self._timer = asyncio.create_task(self._run_after_debounce())
+
+    async def _run_after_debounce(self):
+        await asyncio.sleep(self.debounce)
+        if self._timer is asyncio.current_task():
+            self._timer = None
+        async with self._lock:
+            job = self.pending
+            if not job:
+                return
+            self.pending = None
+            if self.is_deployed(job['sha']):
+                self._save_state()
+                return
+            # Lưu trước khi deploy: process mới được khởi động trong deploy_func đọc state này
+            self.running = job
+            self._save_state()
+            try:
+                result = await self.deploy_func(job)
+            except Exception as e:
+                logger.error(f"❌ Deploy {job['sha']} lỗi: {e}")
+                result = FAILED
+            finally:
+                self.running = None
+
+            self._record_result(job, result)
+            self._save_state()
+
+        if result == RESTART and self.on_restart:
+            await self.on_restart()
+
+    def _record_result(self, job, result):
+        self.state['last_result'] = {
+            'sha': job['sha'],
+            'result': result,
+            'pushes': job['pushes'],
+            'finished_at': datetime.now().isoformat()
+        }
+        if result in (DEPLOYED, RESTART) and job['sha'] and not self.is_deployed(job['sha']):
+            self.state['deployed'] = (self.state['deployed'] + [{
+                'sha': job['sha'],
+                'deployed_at': datetime.now().isoformat()
+            }])[-HISTORY_SIZE:]
+
+    async def stop(self):
+        """Huỷ debounce timer đang chờ (push đang chờ vẫn nằm trong state file)"""
+        if self._timer and not self._timer.done():
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+
+    def snapshot(self):
+        """Trạng thái hàng đợi để hiển thị"""
+        return {
+            'pending': self.pending,
+            'running': self.running,
+            'deployed_sha': self.deployed_sha,
+            'last_result': self.state['last_result'],
+            'debounce': self.debounce
+        }
@@ -0,0 +1,204 @@
+"""
+Làm mới metadata GitHub (stars, forks, issues, updated_at) của các repo trong registry
+
+Dùng conditional request (ETag / Last-Modified): response 304 không bị GitHub tính vào rate limit.
+Tốc độ gọi API được chia đều theo số request còn lại (X-RateLimit-Remaining) tới lúc reset.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+logger = logging.getLogger('github_refresher')
+
+# Đổi GITHUB_API_URL để trỏ tới GitHub Enterprise hoặc một API server giả lập khi test
+GITHUB_API_URL = (os.environ.get('GITHUB_API_URL') or 'https://api.github.com').rstrip('/')
+GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN') or None
+
+STATE_FILE = "data/github_refresh.json"
+# Luôn chừa lại chừng này request cho các lệnh như /addrepo
+RATE_LIMIT_RESERVE = 10
+# Không chờ quá lâu giữa hai request, dù budget còn ít
+MAX_PACE_DELAY = 60
+
+
+def github_headers(token=GITHUB_TOKEN):
+    headers = {'Accept': 'application/vnd.github+json'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    return headers
+
+
+def repo_fields_from_api(data):
+    """Các field của repo lưu trong registry, lấy từ response /repos/{owner}/{repo}"""
+    return {
+        "name": data.get("name"),
+        "full_name": data.get("full_name"),
+        "owner": data.get("owner", {}).get("login"),
+        "description": data.get("description", "Không có mô tả"),
+        "html_url": data.get("html_url"),
+        "stars": data.get("stargazers_count", 0),
+        "forks": data.get("forks_count", 0),
+        "language": data.get("language", "Unknown"),
+        "created_at": data.get("created_at"),
+        "updated_at": data.get("updated_at"),
+        "open_issues": data.get("open_issues_count", 0)
+    }
+
+
+class GitHubRefresher:
+    """Revalidate từng repo trong registry và ghi lại thay đổi
+
+    State (ETag, Last-Modified theo repo và rate limit gần nhất) lưu ở data/github_refresh.json.
+    """
+
+    def __init__(self, registry, get_session, api_url=GITHUB_API_URL, token=GITHUB_TOKEN,
+                 state_file=STATE_FILE, reserve=RATE_LIMIT_RESERVE):
+        self.registry = registry
+        self.get_session = get_session
+        self.api_url = api_url.rstrip('/')
+        self.token = token
+        self.state_file = state_file
+        self.reserve = reserve
+        self.state = self._load_state()
+        self.stats = {'checked': 0, 'not_modified': 0, 'updated': 0, 'errors': 0, 'deferred': 0}
+        self._lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # Trạng thái
+    # ------------------------------------------------------------------
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        except Exception as e:
+            logger.error(f"❌ Lỗi đọc {self.state_file}: {e}")
+            state = {}
+        state.setdefault('repos', {})
+        state.setdefault('rate', {})
+        return state
+
+    def _save_state(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.error(f"❌ Lỗi lưu {self.state_file}: {e}")
+
+    # ------------------------------------------------------------------
+    # Rate limit
+    # ------------------------------------------------------------------
+    def _update_rate(self, headers):
+        if 'X-RateLimit-Remaining' not in headers:
+            return
+        try:
+            self.state['rate'] = {
+                'limit': int(headers.get('X-RateLimit-Limit', 0)),
+                'remaining': int(headers['X-RateLimit-Remaining']),
+                'reset': int(headers.get('X-RateLimit-Reset', 0))
+            }
+        except ValueError:
+            pass
+
+    def pace_delay(self, now=None):
+        """Số giây nên chờ trước request tiếp theo, None nếu đã hết budget tới lúc reset"""
+        rate = self.state['rate']
+        if not rate:
+            return 0
+        now = time.time() if now is None else now
+        until_reset = rate['reset'] - now
+        if until_reset <= 0:
+            return 0
+        budget = rate['remaining'] - self.reserve
+        if budget <= 0:
+            return None
+        # Chia đều budget còn lại cho tới lúc reset
+        return min(until_reset / budget, MAX_PACE_DELAY)
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+    async def refresh_repo(self, repo):
+        """Revalidate một repo, trả về 'not_modified', 'updated', 'unchanged', 'missing' hoặc 'error'"""
+        full_name = repo['full_name']
+        cached = self.state['repos'].get(full_name, {})
+        headers = github_headers(self.token)
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        try:
+            async with self.get_session().get(f"{self.api_url}/repos/{full_name}", headers=headers) as response:
+                self._update_rate(response.headers)
+                cached['checked_at'] = datetime.now().isoformat()
+                self.state['repos'][full_name] = cached
+
+                if response.status == 304:
+                    return 'not_modified'
+                if response.status == 404:
+                    logger.warning(f"⚠️  {full_name} không còn tồn tại hoặc đã chuyển sang private")
+                    return 'missing'
+                if response.status != 200:
+                    logger.warning(f"⚠️  GitHub trả về {response.status} cho {full_name}")
+                    return 'error'
+
+                data = await response.json()
+                cached['etag'] = response.headers.get('ETag')
+                cached['last_modified'] = response.headers.get('Last-Modified')
+        except Exception as e:
+            logger.error(f"❌ Lỗi refresh {full_name}: {type(e).__name__} - {e}")
+            return 'error'
+
+        fields = repo_fields_from_api(data)
+        changes = {key: value for key, value in fields.items() if repo.get(key) != value}
+        if not changes:
+            return 'unchanged'
+        if self.registry.update(full_name, changes) is None:
+            return 'error'
+        return 'updated'
+
+    async def refresh_all(self):
+        """Một lượt refresh toàn bộ registry (dùng làm job của scheduler)"""
+        if self._lock.locked():
+            logger.info("⏭  Lượt refresh GitHub trước vẫn đang chạy")
+            return
+        async with self._lock:
+            repos = self.registry.all()
+            started = time.perf_counter()
+            counts = {}
+            for index, repo in enumerate(repos):
+                delay = self.pace_delay()
+                if delay is None:
+                    deferred = len(repos) - index
+                    self.stats['deferred'] += deferred
+                    logger.warning(f"⏸  Gần hết rate limit GitHub, hoãn {deferred} repo tới lượt sau")
+                    break
+                if delay and index:
+                    await asyncio.sleep(delay)
+
+                result = await self.refresh_repo(repo)
+                counts[result] = counts.get(result, 0) + 1
+                self.stats['checked'] += 1
+                if result == 'error':
+                    self.stats['errors'] += 1
+                elif result in self.stats:
+                    self.stats[result] += 1
+
+            if counts.get('updated'):
+                await self.registry.save()
+            self._save_state()
+
+            rate = self.state['rate']
+            logger.info(
+                f"🔄 Refresh GitHub: {counts} trong {time.perf_counter() - started:.1f}s"
+                + (f" | rate limit còn {rate['remaining']}/{rate['limit']}" if rate else "")
+            )
+            return counts
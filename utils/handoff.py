@@ -0,0 +1,100 @@
+"""
+Deploy không downtime: chạy process mới song song, chờ nó báo sẵn sàng rồi mới cho process cũ thoát
+
+Process mới báo sẵn sàng bằng cách ghi PID vào file BOT_HANDOFF_READY_FILE (do process cũ truyền qua env).
+Nếu chạy dưới systemd (NOTIFY_SOCKET), process mới còn gửi MAINPID/READY để systemd theo dõi PID mới.
+"""
+import asyncio
+import logging
+import os
+import socket
+import sys
+import time
+
+logger = logging.getLogger('handoff')
+
+READY_FILE_ENV = 'BOT_HANDOFF_READY_FILE'
+HANDOFF_DIR = "data/handoff"
+POLL_INTERVAL = 0.5
+
+
+def sd_notify(state):
+    """Gửi trạng thái cho systemd (bỏ qua nếu không chạy dưới systemd)"""
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        address = '\0' + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode('utf-8'))
+        return True
+    except OSError as e:
+        logger.warning(f"⚠️  Không gửi được sd_notify: {e}")
+        return False
+
+
+def signal_ready():
+    """Gọi trong process mới khi bot đã sẵn sàng hoàn toàn"""
+    pid = os.getpid()
+    sd_notify(f"MAINPID={pid}\nREADY=1")
+
+    ready_file = os.environ.pop(READY_FILE_ENV, None)
+    if not ready_file:
+        return
+    try:
+        tmp_path = f"{ready_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(pid))
+        os.replace(tmp_path, ready_file)
+        logger.info(f"🤝 Đã báo sẵn sàng cho process cũ (PID {pid})")
+    except Exception as e:
+        logger.error(f"❌ Không ghi được file sẵn sàng {ready_file}: {e}")
+
+
+async def spawn_successor(timeout, python=None):
+    """Chạy process mới với cùng lệnh khởi động và chờ nó báo sẵn sàng
+
+    `python` là interpreter cho process mới (ví dụ virtualenv vừa cài), mặc định là interpreter hiện tại.
+
+    Trả về True nếu process mới đã sẵn sàng (process cũ nên đóng kết nối và thoát).
+    Nếu hết timeout hoặc process mới thoát sớm thì dừng nó và trả về False, process cũ tiếp tục chạy.
+    """
+    os.makedirs(HANDOFF_DIR, exist_ok=True)
+    ready_file = os.path.abspath(os.path.join(HANDOFF_DIR, f"ready-{os.getpid()}-{int(time.time())}"))
+    if os.path.exists(ready_file):
+        os.remove(ready_file)
+
+    env = dict(os.environ)
+    env[READY_FILE_ENV] = ready_file
+
+    logger.info("🚀 Khởi động process mới song song...")
+    process = await asyncio.create_subprocess_exec(
+        python or sys.executable, *sys.argv,
+        env=env,
+        cwd=os.getcwd(),
+        start_new_session=True  # Không bị kill theo process cũ
+    )
+
+    started = time.monotonic()
+    try:
+        while time.monotonic() - started < timeout:
+            if os.path.exists(ready_file):
+                logger.info(f"✅ Process mới (PID {process.pid}) sẵn sàng sau {time.monotonic() - started:.1f}s")
+                return True
+            if process.returncode is not None:
+                logger.error(f"❌ Process mới thoát sớm với mã {process.returncode}, giữ process hiện tại")
+                return False
+            await asyncio.sleep(POLL_INTERVAL)
+
+        logger.error(f"❌ Process mới không sẵn sàng sau {timeout:.0f}s, dừng nó và giữ process hiện tại")
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            process.kill()
+        return False
+    finally:
+        if os.path.exists(ready_file):
+            os.remove(ready_file)
@@ -0,0 +1,132 @@
+"""
+HTTP cache cho các fetcher JSON: TTL, revalidate bằng ETag / Last-Modified, fallback bản cũ khi server lỗi
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+import aiohttp
+
+logger = logging.getLogger('http_cache')
+
+CACHE_DIR = "data/http_cache"
+
+
+class HttpCache:
+    """Cache response JSON theo URL (trong bộ nhớ + trên đĩa)
+
+    Mỗi lần get_json trả về dict:
+        - data: JSON đã parse (None nếu không lấy được)
+        - source: 'hit' (còn TTL), 'revalidated' (304), 'miss' (tải mới), 'stale' (server lỗi, dùng bản cũ), 'error'
+        - changed: dữ liệu có khác lần trước không
+    """
+
+    def __init__(self, name, ttl=600, cache_dir=CACHE_DIR):
+        self.name = name
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.stats = {'hits': 0, 'misses': 0, 'revalidations': 0, 'stale': 0, 'errors': 0}
+        self._entries = {}
+
+    # ------------------------------------------------------------------
+    # Lưu trữ
+    # ------------------------------------------------------------------
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        base = os.path.join(self.cache_dir, f"{self.name}-{key}")
+        return f"{base}.meta.json", f"{base}.body.json"
+
+    def _read_disk(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'r', encoding='utf-8') as f:
+                meta['data'] = json.load(f)
+            return meta
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️  Cache {self.name} hỏng, bỏ qua: {e}")
+            return None
+
+    def _write_disk(self, url, entry, body=None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        if body is not None:
+            tmp_path = f"{body_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(body)
+            os.replace(tmp_path, body_path)
+        meta = {key: entry[key] for key in ('etag', 'last_modified', 'fetched_at')}
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    async def _load_entry(self, url):
+        if url not in self._entries:
+            self._entries[url] = await asyncio.to_thread(self._read_disk, url)
+        return self._entries[url]
+
+    # ------------------------------------------------------------------
+    # Fetch
+    # ------------------------------------------------------------------
+    async def get_json(self, session, url, ttl=None, **request_kwargs):
+        """GET một URL JSON qua cache"""
+        ttl = self.ttl if ttl is None else ttl
+        entry = await self._load_entry(url)
+        now = time.time()
+
+        if entry and now - entry['fetched_at'] < ttl:
+            self.stats['hits'] += 1
+            return {'data': entry['data'], 'source': 'hit', 'changed': False}
+
+        headers = dict(request_kwargs.pop('headers', None) or {})
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            async with session.get(url, headers=headers, **request_kwargs) as resp:
+                if resp.status == 304 and entry:
+                    self.stats['revalidations'] += 1
+                    entry['fetched_at'] = now
+                    await asyncio.to_thread(self._write_disk, url, entry)
+                    return {'data': entry['data'], 'source': 'revalidated', 'changed': False}
+
+                if resp.status != 200:
+                    raise aiohttp.ClientResponseError(
+                        resp.request_info, resp.history, status=resp.status, message=resp.reason or ''
+                    )
+
+                body = await resp.text()
+                data = json.loads(body)
+                new_entry = {
+                    'etag': resp.headers.get('ETag'),
+                    'last_modified': resp.headers.get('Last-Modified'),
+                    'fetched_at': now,
+                    'data': data
+                }
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self.stats['errors'] += 1
+            if entry:
+                self.stats['stale'] += 1
+                logger.warning(f"⚠️  {self.name}: lỗi khi fetch ({type(e).__name__}: {e}), dùng bản cache cũ")
+                return {'data': entry['data'], 'source': 'stale', 'changed': False}
+            logger.error(f"❌ {self.name}: lỗi khi fetch và không có cache ({type(e).__name__}: {e})")
+            return {'data': None, 'source': 'error', 'changed': False}
+
+        self.stats['misses'] += 1
+        changed = not entry or entry['data'] != data
+        self._entries[url] = new_entry
+        await asyncio.to_thread(self._write_disk, url, new_entry, body)
+        return {'data': data, 'source': 'miss', 'changed': changed}
+
+    def format_stats(self):
+        return " | ".join(f"{key}: {value}" for key, value in self.stats.items())
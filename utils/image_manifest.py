@@ -0,0 +1,164 @@
+"""
+Manifest content-addressed cho thư mục ảnh: hash/size/mtime từng file và emoji tương ứng với từng hash
+"""
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger('image_manifest')
+
+MANIFEST_FILE = "data/image_manifest.json"
+
+
+def hash_file(path, chunk_size=1 << 16):
+    """SHA-256 của nội dung file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageManifest:
+    """Ánh xạ filename -> {hash, size, mtime} và hash -> emoji
+
+    Một ảnh lưu dưới nhiều tên chỉ có một emoji (theo hash), đổi tên file không cần upload lại.
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.files = {}
+        self.emojis = {}
+
+    # ------------------------------------------------------------------
+    # Load / save
+    # ------------------------------------------------------------------
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.files = data.get('files', {})
+            self.emojis = data.get('emojis', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"❌ Lỗi đọc {self.path}: {e}")
+        return self
+
+    def dumps(self):
+        """Serialize manifest thành bytes (gọi trên event loop, nơi files/emojis được sửa)"""
+        return json.dumps({'files': self.files, 'emojis': self.emojis}, ensure_ascii=False, indent=2).encode('utf-8')
+
+    def write(self, data):
+        """Ghi bytes từ dumps() ra file (ghi file tạm rồi rename), an toàn khi chạy trong worker thread"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def save(self):
+        """Ghi manifest ra file ngay trên thread hiện tại"""
+        self.write(self.dumps())
+
+    # ------------------------------------------------------------------
+    # Tra cứu O(1)
+    # ------------------------------------------------------------------
+    def resolve(self, filename):
+        """Trả về emoji (dict có emoji_name, emoji_id, emoji_mention) của một file, hoặc None"""
+        entry = self.files.get(filename)
+        return self.emojis.get(entry['hash']) if entry else None
+
+    def resolve_hash(self, content_hash):
+        return self.emojis.get(content_hash)
+
+    # ------------------------------------------------------------------
+    # Scan và phân loại thay đổi
+    # ------------------------------------------------------------------
+    def scan(self, folder, extensions):
+        """Quét thư mục, chỉ hash lại những file có size/mtime thay đổi (chạy trong worker thread)
+
+        Returns:
+            dict: filename -> {hash, size, mtime}
+        """
+        current = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(extensions):
+                    continue
+                stat = entry.stat()
+                old = self.files.get(entry.name)
+                if old and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime:
+                    content_hash = old['hash']
+                else:
+                    content_hash = hash_file(entry.path)
+                current[entry.name] = {'hash': content_hash, 'size': stat.st_size, 'mtime': stat.st_mtime}
+        return current
+
+    def diff(self, current):
+        """So sánh kết quả scan với manifest hiện tại
+
+        Returns:
+            dict với các keys:
+                - new / changed: list filename cần emoji cho nội dung mới
+                - renamed: list (old_filename, new_filename) cùng nội dung
+                - duplicates: list filename trùng nội dung với file khác đã/đang có emoji
+                - unchanged: list filename không đổi
+                - removed: list filename không còn trong thư mục
+                - uploads: dict hash -> filename đại diện, mỗi nội dung chỉ upload một lần
+        """
+        result = {'new': [], 'changed': [], 'renamed': [], 'duplicates': [], 'unchanged': [], 'removed': [], 'uploads': {}}
+
+        removed = [name for name in self.files if name not in current]
+        removed_by_hash = {}
+        for name in removed:
+            removed_by_hash.setdefault(self.files[name]['hash'], []).append(name)
+
+        for name in sorted(current):
+            content_hash = current[name]['hash']
+            old = self.files.get(name)
+
+            if old and old['hash'] == content_hash:
+                result['unchanged'].append(name)
+            elif not old and removed_by_hash.get(content_hash):
+                result['renamed'].append((removed_by_hash[content_hash].pop(0), name))
+            elif content_hash in self.emojis or content_hash in result['uploads']:
+                result['duplicates'].append(name)
+            else:
+                result['changed' if old else 'new'].append(name)
+
+            # Nội dung chưa có emoji (mới, đổi nội dung, hoặc lần trước upload lỗi)
+            if content_hash not in self.emojis and content_hash not in result['uploads']:
+                result['uploads'][content_hash] = name
+
+        result['removed'] = [name for name in removed if not any(old == name for old, _ in result['renamed'])]
+        return result
+
+    def orphaned_emojis(self, current):
+        """Các hash có emoji nhưng không còn file nào trỏ tới (sau khi áp dụng scan mới)"""
+        used = {entry['hash'] for entry in current.values()}
+        return [content_hash for content_hash in self.emojis if content_hash not in used]
+
+    def commit_files(self, current):
+        """Thay danh sách file bằng kết quả scan mới"""
+        self.files = current
+
+    def set_emoji(self, content_hash, emoji_name, emoji_id):
+        self.emojis[content_hash] = {
+            'emoji_name': emoji_name,
+            'emoji_id': str(emoji_id),
+            'emoji_mention': f"<:{emoji_name}:{emoji_id}>"
+        }
+
+    def remove_emoji(self, content_hash):
+        return self.emojis.pop(content_hash, None)
+
+    def emoji_entries(self):
+        """Danh sách {filename, emoji_name, emoji_id, emoji_mention} cho emoji_data.json"""
+        entries = []
+        for name in sorted(self.files):
+            emoji = self.emojis.get(self.files[name]['hash'])
+            if emoji:
+                entries.append({'filename': name, **emoji})
+        return entries
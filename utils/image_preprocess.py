@@ -0,0 +1,162 @@
+"""
+Tiền xử lý ảnh trước khi upload emoji: kiểm tra kích thước/dung lượng, resize hoặc nén lại nếu vượt giới hạn
+
+Các hàm ở đây được gọi trong ProcessPoolExecutor nên phải là hàm top-level và chỉ nhận/trả về dữ liệu picklable.
+"""
+import hashlib
+import io
+import os
+
+try:
+    from PIL import Image, ImageSequence
+except ImportError:  # Pillow là optional, thiếu thì upload nguyên file
+    Image = None
+    ImageSequence = None
+
+# Giới hạn emoji của Discord
+MAX_EMOJI_BYTES = 256 * 1024
+MAX_EMOJI_DIMENSION = 128
+MIN_EMOJI_DIMENSION = 32
+
+# Tăng khi thay đổi thuật toán để cache cũ tự động hết hiệu lực
+PREPROCESS_VERSION = 1
+
+CACHE_DIR = "data/emoji_cache"
+
+
+def _cache_key(data, max_bytes, max_dimension):
+    digest = hashlib.sha256(data)
+    digest.update(f"|v{PREPROCESS_VERSION}|{max_bytes}|{max_dimension}".encode())
+    return digest.hexdigest()
+
+
+def _encode_static(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        image.convert('RGB').save(buffer, format='JPEG', quality=85, optimize=True)
+    else:
+        image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def _encode_animated(frames, durations, fmt, loop):
+    buffer = io.BytesIO()
+    options = {
+        'format': fmt,
+        'save_all': True,
+        'append_images': frames[1:],
+        'duration': durations,
+        'loop': loop,
+    }
+    if fmt == 'GIF':
+        options['disposal'] = 2
+        options['optimize'] = True
+    else:
+        options['quality'] = 80
+    frames[0].save(buffer, **options)
+    return buffer.getvalue()
+
+
+def _fit(image, max_bytes, max_dimension):
+    """Thu nhỏ/nén ảnh tới khi vừa giới hạn, trả về (bytes, extension) hoặc None"""
+    animated = getattr(image, 'is_animated', False)
+    source_format = image.format or 'PNG'
+    dimension = min(max_dimension, max(image.size))
+
+    if animated:
+        fmt = 'WEBP' if source_format == 'WEBP' else 'GIF'
+        raw_frames = [frame.copy().convert('RGBA') for frame in ImageSequence.Iterator(image)]
+        durations = [frame.info.get('duration', image.info.get('duration', 100)) for frame in ImageSequence.Iterator(image)]
+        loop = image.info.get('loop', 0)
+    else:
+        fmt = 'JPEG' if source_format == 'JPEG' else 'PNG'
+        raw_frames = [image.convert('RGBA') if fmt == 'PNG' else image.convert('RGB')]
+        durations = None
+        loop = 0
+
+    while dimension >= MIN_EMOJI_DIMENSION:
+        frames = []
+        for frame in raw_frames:
+            resized = frame.copy()
+            resized.thumbnail((dimension, dimension), Image.LANCZOS)
+            frames.append(resized)
+
+        if animated:
+            data = _encode_animated(frames, durations, fmt, loop)
+        else:
+            data = _encode_static(frames[0], fmt)
+            if len(data) > max_bytes and fmt == 'PNG':
+                # Giảm xuống bảng màu 256 trước khi phải thu nhỏ thêm
+                data = _encode_static(frames[0].quantize(colors=256), fmt)
+
+        if len(data) <= max_bytes:
+            return data, fmt.lower().replace('jpeg', 'jpg')
+
+        dimension = int(dimension * 0.8)
+
+    return None
+
+
+def preprocess_image(path, cache_dir=CACHE_DIR, max_bytes=MAX_EMOJI_BYTES, max_dimension=MAX_EMOJI_DIMENSION):
+    """Đảm bảo ảnh vừa giới hạn emoji, kết quả được cache theo hash nội dung
+
+    Returns:
+        dict với các keys:
+            - success (bool): Có file hợp lệ để upload không
+            - path (str): File dùng để upload (file gốc hoặc file trong cache)
+            - hash (str): Cache key của nội dung gốc
+            - processed (bool): Ảnh có bị resize/nén lại không
+            - cached (bool): Kết quả lấy từ cache
+            - message (str): Thông báo chi tiết
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    key = _cache_key(data, max_bytes, max_dimension)
+    result = {'success': True, 'path': path, 'hash': key, 'processed': False, 'cached': False, 'message': ''}
+
+    # Cache hit: ảnh đã xử lý trước đó hoặc đã được xác nhận là hợp lệ
+    os.makedirs(cache_dir, exist_ok=True)
+    ok_marker = os.path.join(cache_dir, f"{key}.ok")
+    if os.path.exists(ok_marker):
+        result['cached'] = True
+        return result
+    for ext in ('png', 'jpg', 'gif', 'webp'):
+        cached_path = os.path.join(cache_dir, f"{key}.{ext}")
+        if os.path.exists(cached_path):
+            result.update(path=cached_path, processed=True, cached=True)
+            return result
+
+    if Image is None:
+        result['message'] = "Pillow chưa được cài, upload file gốc"
+        return result
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if len(data) <= max_bytes and max(image.size) <= max_dimension:
+                open(ok_marker, 'w').close()
+                return result
+
+            original_size = image.size
+            fitted = _fit(image, max_bytes, max_dimension)
+    except Exception as e:
+        result.update(success=False, message=f"Không đọc được ảnh: {e}")
+        return result
+
+    if not fitted:
+        result.update(success=False, message=f"Không thể nén ảnh xuống dưới {max_bytes // 1024}KB")
+        return result
+
+    fitted_data, ext = fitted
+    cached_path = os.path.join(cache_dir, f"{key}.{ext}")
+    tmp_path = f"{cached_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(fitted_data)
+    os.replace(tmp_path, cached_path)
+
+    result.update(
+        path=cached_path,
+        processed=True,
+        message=f"{original_size[0]}x{original_size[1]}, {len(data) // 1024}KB -> {len(fitted_data) // 1024}KB"
+    )
+    return result
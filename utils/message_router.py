@@ -0,0 +1,128 @@
+"""
+Định tuyến tin nhắn theo channel: dict channel ID -> danh sách rule (prefix / regex / JSON type)
+Channel không được theo dõi sẽ bị bỏ qua ngay bằng một lần tra dict.
+"""
+import json
+import logging
+import re
+
+logger = logging.getLogger('message_router')
+
+# Tin nhắn dài hơn chừng này ký tự sẽ không được parse JSON
+MAX_JSON_CHARS = 8000
+# Số ký tự nội dung tối đa được ghi vào log
+LOG_PREVIEW_CHARS = 200
+
+
+def preview(text, limit=LOG_PREVIEW_CHARS):
+    """Rút gọn nội dung để ghi log"""
+    text = text.replace('\n', ' ')
+    return text if len(text) <= limit else f"{text[:limit]}… (+{len(text) - limit} ký tự)"
+
+
+def parse_json_content(content, max_chars=MAX_JSON_CHARS):
+    """Parse nội dung tin nhắn thành dict JSON (bỏ code block ```json nếu có)
+
+    Trả về None nếu không phải JSON object hoặc quá dài.
+    """
+    content = content.strip()
+    if not content or len(content) > max_chars:
+        return None
+
+    # Loại bỏ code block markdown nếu có
+    if content.startswith('```'):
+        lines = content.split('\n')
+        lines = lines[1:]  # Bỏ dòng đầu (```json hoặc ```)
+        if lines and lines[-1].strip() == '```':
+            lines = lines[:-1]  # Bỏ dòng cuối (```)
+        content = '\n'.join(lines).strip()
+
+    if not (content.startswith('{') and content.endswith('}')):
+        return None
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class Rule:
+    """Một rule xử lý tin nhắn; mọi điều kiện đặt ra đều phải khớp
+
+    Handler được gọi với (message, payload):
+        - payload là dict JSON nếu rule có json_type
+        - payload là re.Match nếu rule có regex
+        - None trong các trường hợp còn lại
+    """
+
+    def __init__(self, name, handler, prefix=None, regex=None, json_type=None):
+        self.name = name
+        self.handler = handler
+        self.prefix = prefix
+        self.pattern = re.compile(regex) if isinstance(regex, str) else regex
+        self.json_type = json_type
+
+    def match(self, content, get_json):
+        if self.prefix is not None and not content.startswith(self.prefix):
+            return False, None
+        payload = None
+        if self.pattern is not None:
+            payload = self.pattern.search(content)
+            if not payload:
+                return False, None
+        if self.json_type is not None:
+            payload = get_json()
+            if payload is None or payload.get('type') != self.json_type:
+                return False, None
+        return True, payload
+
+
+class MessageRouter:
+    """Bảng channel ID -> rules; JSON chỉ được parse một lần và chỉ khi có rule cần"""
+
+    def __init__(self, max_json_chars=MAX_JSON_CHARS):
+        self.max_json_chars = max_json_chars
+        self._routes = {}
+
+    @property
+    def channel_ids(self):
+        return set(self._routes)
+
+    def add_rule(self, channel_ids, handler, name=None, prefix=None, regex=None, json_type=None):
+        """Đăng ký rule cho một hoặc nhiều channel"""
+        if isinstance(channel_ids, int):
+            channel_ids = [channel_ids]
+        rule = Rule(name or handler.__name__, handler, prefix=prefix, regex=regex, json_type=json_type)
+        for channel_id in channel_ids:
+            self._routes.setdefault(channel_id, []).append(rule)
+        return rule
+
+    def is_routed(self, channel_id):
+        return channel_id in self._routes
+
+    async def dispatch(self, message):
+        """Chạy các rule khớp với tin nhắn, trả về số rule đã xử lý"""
+        rules = self._routes.get(message.channel.id)
+        if not rules:
+            return 0
+
+        content = message.content
+        parsed = []
+
+        def get_json():
+            if not parsed:
+                parsed.append(parse_json_content(content, self.max_json_chars))
+            return parsed[0]
+
+        handled = 0
+        for rule in rules:
+            matched, payload = rule.match(content, get_json)
+            if not matched:
+                continue
+            handled += 1
+            try:
+                await rule.handler(message, payload)
+            except Exception as e:
+                logger.error(f"❌ Rule {rule.name} lỗi: {e}")
+                logger.exception(e)
+        return handled
@@ -0,0 +1,280 @@
+"""
+Metrics cho slash commands: histogram thời gian chạy, thời gian tới response đầu tiên (TTFR),
+số lần lỗi / timeout theo command và stage; xuất dạng Prometheus text qua HTTP local
+"""
+import bisect
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import discord
+from aiohttp import web
+from discord import app_commands
+
+logger = logging.getLogger('metrics')
+
+# Bucket (giây) cho histogram, đủ rộng cho /addrepo (GitHub + git + docker)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30, 60, 120, 300)
+# Discord yêu cầu response đầu tiên trong 3 giây
+RESPONSE_DEADLINE = 3.0
+
+# Key lưu trong Interaction.extras
+START_KEY = 'metrics_start'
+FIRST_RESPONSE_KEY = 'metrics_first_response'
+
+
+class Histogram:
+    """Histogram cumulative kiểu Prometheus (chỉ lưu số đếm theo bucket, không lưu từng giá trị)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Ước lượng quantile bằng cận trên của bucket chứa nó"""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+class CommandMetrics:
+    """Bộ đếm trong bộ nhớ cho mọi app command"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.started_at = time.time()
+        self.durations = {}    # (command, stage) -> Histogram
+        self.ttfr = {}         # command -> Histogram
+        self.invocations = {}  # command -> int
+        self.errors = {}       # (command, stage, error) -> int
+        self.timeouts = {}     # command -> int
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+        return histogram
+
+    # ------------------------------------------------------------------
+    # Ghi nhận
+    # ------------------------------------------------------------------
+    def start(self, interaction):
+        interaction.extras[START_KEY] = time.perf_counter()
+
+    def finish(self, interaction, error=None):
+        """Ghi nhận khi command chạy xong (thành công hoặc lỗi)"""
+        started = interaction.extras.pop(START_KEY, None)
+        if started is None:
+            return
+        now = time.perf_counter()
+        command = command_name(interaction)
+
+        self.invocations[command] = self.invocations.get(command, 0) + 1
+        self._histogram(self.durations, (command, 'total')).observe(now - started)
+
+        first_response = interaction.extras.get(FIRST_RESPONSE_KEY)
+        ttfr = (first_response if first_response is not None else now) - started
+        if first_response is not None:
+            self._histogram(self.ttfr, command).observe(ttfr)
+
+        if ttfr > RESPONSE_DEADLINE or is_unknown_interaction(error):
+            self.timeouts[command] = self.timeouts.get(command, 0) + 1
+        if error is not None:
+            self.record_error(command, 'total', error)
+
+    def record_error(self, command, stage, error):
+        original = getattr(error, 'original', None) or error
+        key = (command, stage, type(original).__name__)
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    @contextmanager
+    def stage(self, interaction, stage):
+        """Đo một bước bên trong command: with bot.metrics.stage(interaction, 'git'): ..."""
+        command = command_name(interaction)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record_error(command, stage, e)
+            raise
+        finally:
+            self._histogram(self.durations, (command, stage)).observe(time.perf_counter() - started)
+
+    # ------------------------------------------------------------------
+    # Xuất
+    # ------------------------------------------------------------------
+    def _render_histogram(self, lines, name, histogram, labels):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+    def render_prometheus(self):
+        """Text exposition format của Prometheus"""
+        lines = [
+            "# HELP bot_command_duration_seconds Thời gian chạy app command theo stage (total = cả command)",
+            "# TYPE bot_command_duration_seconds histogram",
+        ]
+        for (command, stage), histogram in sorted(self.durations.items()):
+            self._render_histogram(lines, 'bot_command_duration_seconds', histogram, _labels(command=command, stage=stage))
+
+        lines += [
+            "# HELP bot_command_first_response_seconds Thời gian tới response đầu tiên (defer/send_message)",
+            "# TYPE bot_command_first_response_seconds histogram",
+        ]
+        for command, histogram in sorted(self.ttfr.items()):
+            self._render_histogram(lines, 'bot_command_first_response_seconds', histogram, _labels(command=command))
+
+        lines += [
+            "# HELP bot_command_invocations_total Số lần app command chạy xong",
+            "# TYPE bot_command_invocations_total counter",
+        ]
+        lines += [f'bot_command_invocations_total{{{_labels(command=c)}}} {n}' for c, n in sorted(self.invocations.items())]
+
+        lines += [
+            "# HELP bot_command_errors_total Số lỗi theo command, stage và loại exception",
+            "# TYPE bot_command_errors_total counter",
+        ]
+        lines += [
+            f'bot_command_errors_total{{{_labels(command=c, stage=s, error=e)}}} {n}'
+            for (c, s, e), n in sorted(self.errors.items())
+        ]
+
+        lines += [
+            "# HELP bot_command_timeouts_total Số lần không response kịp trong 3 giây",
+            "# TYPE bot_command_timeouts_total counter",
+        ]
+        lines += [f'bot_command_timeouts_total{{{_labels(command=c)}}} {n}' for c, n in sorted(self.timeouts.items())]
+
+        lines += [
+            "# TYPE bot_metrics_start_time_seconds gauge",
+            f"bot_metrics_start_time_seconds {self.started_at:.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Tóm tắt theo command cho slash command /metrics, sắp theo số lần chạy"""
+        rows = []
+        for command, invocations in sorted(self.invocations.items(), key=lambda item: -item[1]):
+            total = self.durations.get((command, 'total'))
+            ttfr = self.ttfr.get(command)
+            stages = {
+                stage: histogram for (name, stage), histogram in self.durations.items()
+                if name == command and stage != 'total'
+            }
+            rows.append({
+                'command': command,
+                'count': invocations,
+                'avg': total.sum / total.count if total and total.count else None,
+                'p50': total.quantile(0.5) if total else None,
+                'p95': total.quantile(0.95) if total else None,
+                'ttfr_p95': ttfr.quantile(0.95) if ttfr else None,
+                'errors': sum(n for (c, _, _), n in self.errors.items() if c == command),
+                'timeouts': self.timeouts.get(command, 0),
+                'stages': {stage: histogram.sum / histogram.count for stage, histogram in stages.items()}
+            })
+        return rows
+
+
+def command_name(interaction):
+    command = interaction.command
+    return command.qualified_name if command else 'unknown'
+
+
+def is_unknown_interaction(error):
+    """Lỗi 10062: response tới sau khi interaction đã hết hạn"""
+    original = getattr(error, 'original', None) or error
+    return isinstance(original, discord.NotFound) and original.code == 10062
+
+
+# ----------------------------------------------------------------------
+# Gắn vào discord.py
+# ----------------------------------------------------------------------
+def install_response_timing():
+    """Ghi thời điểm response đầu tiên của mỗi interaction vào Interaction.extras (chỉ cài một lần)"""
+    response_cls = discord.InteractionResponse
+    if getattr(response_cls, '_metrics_installed', False):
+        return
+
+    def wrap(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            result = await method(self, *args, **kwargs)
+            extras = self._parent.extras
+            if START_KEY in extras and FIRST_RESPONSE_KEY not in extras:
+                extras[FIRST_RESPONSE_KEY] = time.perf_counter()
+            return result
+        return wrapper
+
+    for name in ('defer', 'send_message', 'edit_message', 'send_modal'):
+        setattr(response_cls, name, wrap(getattr(response_cls, name)))
+    response_cls._metrics_installed = True
+
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """CommandTree đo mọi app command (bỏ qua autocomplete); bot cần có thuộc tính `metrics`"""
+
+    async def interaction_check(self, interaction):
+        if interaction.type is discord.InteractionType.application_command:
+            self.client.metrics.start(interaction)
+        return True
+
+    async def on_error(self, interaction, error):
+        self.client.metrics.finish(interaction, error)
+        await super().on_error(interaction, error)
+
+
+class MetricsServer:
+    """HTTP server local trả về /metrics (Prometheus text format)"""
+
+    def __init__(self, metrics, host='127.0.0.1', port=9464):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def _handle(self, request):
+        return web.Response(text=self.metrics.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        # reuse_port: process mới (deploy handoff) bind được cổng khi process cũ còn chạy
+        site = web.TCPSite(self._runner, self.host, self.port, reuse_port=os.name != 'nt')
+        await site.start()
+        logger.info(f"📈 Metrics tại http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,66 @@
+"""
+Gửi tin nhắn Discord có giới hạn tốc độ (token bucket) để không chạm rate limit của channel
+"""
+import asyncio
+import time
+
+# Discord cho phép khoảng 5 tin nhắn / 5 giây mỗi channel
+DEFAULT_RATE = 5
+DEFAULT_PER = 5.0
+
+# Giới hạn của một tin nhắn
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+
+class PacedSender:
+    """Token bucket: tối đa `rate` tin nhắn trong mỗi `per` giây"""
+
+    def __init__(self, rate=DEFAULT_RATE, per=DEFAULT_PER):
+        self.rate = rate
+        self.per = per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.sent = 0
+
+    async def _acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.per)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.per / self.rate)
+
+    async def send(self, channel, **kwargs):
+        """Gửi một tin nhắn sau khi lấy được token"""
+        await self._acquire()
+        message = await channel.send(**kwargs)
+        self.sent += 1
+        return message
+
+    async def send_embeds(self, channel, embeds, **kwargs):
+        """Gom embeds thành các tin nhắn (tối đa 10 embeds và 6000 ký tự mỗi tin) rồi gửi lần lượt"""
+        messages = []
+        for batch in chunk_embeds(embeds):
+            messages.append(await self.send(channel, embeds=batch, **kwargs))
+        return messages
+
+
+def chunk_embeds(embeds, max_embeds=MAX_EMBEDS_PER_MESSAGE, max_chars=MAX_EMBED_CHARS_PER_MESSAGE):
+    """Chia embeds thành các nhóm thỏa giới hạn của một tin nhắn"""
+    batch = []
+    batch_chars = 0
+    for embed in embeds:
+        size = len(embed)
+        if batch and (len(batch) >= max_embeds or batch_chars + size > max_chars):
+            yield batch
+            batch = []
+            batch_chars = 0
+        batch.append(embed)
+        batch_chars += size
+    if batch:
+        yield batch
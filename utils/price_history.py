@@ -0,0 +1,197 @@
+"""
+Lịch sử giá Steam (SQLite, append-only theo ngày check) và phân loại deal: mới / giảm sâu hơn / quay lại sale
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('price_history')
+
+DB_FILE = "data/steam_prices.db"
+
+# Loại deal trả về từ record_check
+NEW = 'new'
+PRICE_DROP = 'price_drop'
+BACK_ON_SALE = 'back_on_sale'
+UNCHANGED = 'unchanged'
+
+
+class PriceHistoryStore:
+    """Chuỗi giá theo app_id, mỗi lần check (theo ngày) ghi thêm một điểm giá
+
+    Mọi query chạy trên một worker thread riêng, giống UserdataStore.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._executor = None
+        self._conn = None
+
+    async def open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price_history")
+        await self._run(self._connect)
+
+    async def close(self):
+        if self._executor:
+            await self._run(self._disconnect)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS price_points (
+                app_id INTEGER NOT NULL,
+                check_date TEXT NOT NULL,
+                name TEXT,
+                price REAL NOT NULL,
+                old_price REAL,
+                discount INTEGER,
+                url TEXT,
+                image TEXT,
+                PRIMARY KEY (app_id, check_date)
+            );
+            CREATE INDEX IF NOT EXISTS idx_price_points_date ON price_points (check_date);
+            CREATE TABLE IF NOT EXISTS checks (
+                check_date TEXT PRIMARY KEY,
+                deal_count INTEGER NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _disconnect(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ------------------------------------------------------------------
+    # Ghi + phân loại
+    # ------------------------------------------------------------------
+    def _record_check(self, deals, check_date):
+        cursor = self._conn.cursor()
+        row = cursor.execute(
+            "SELECT MAX(check_date) FROM checks WHERE check_date < ?", (check_date,)
+        ).fetchone()
+        previous_check = row[0]
+
+        results = []
+        for deal in deals:
+            app_id = int(deal['id'])
+            last = cursor.execute(
+                "SELECT check_date, price FROM price_points "
+                "WHERE app_id = ? AND check_date < ? ORDER BY check_date DESC LIMIT 1",
+                (app_id, check_date)
+            ).fetchone()
+            lowest = cursor.execute(
+                "SELECT MIN(price) FROM price_points WHERE app_id = ? AND check_date < ?",
+                (app_id, check_date)
+            ).fetchone()[0]
+            # Điểm giá đã ghi trong cùng ngày (lần check chạy lại) -> chỉ báo nếu giá còn giảm tiếp
+            recorded = cursor.execute(
+                "SELECT price FROM price_points WHERE app_id = ? AND check_date = ?",
+                (app_id, check_date)
+            ).fetchone()
+
+            previous_price = last['price'] if last else None
+            if recorded is not None:
+                # Đã phân loại và báo trong lần chạy trước cùng ngày
+                if deal['price'] < recorded['price']:
+                    kind = PRICE_DROP
+                    previous_price = recorded['price']
+                else:
+                    kind = UNCHANGED
+            elif last is None:
+                kind = NEW
+            elif last['check_date'] != previous_check:
+                kind = BACK_ON_SALE
+            elif deal['price'] < last['price']:
+                kind = PRICE_DROP
+            else:
+                kind = UNCHANGED
+
+            results.append({
+                **deal,
+                'kind': kind,
+                'previous_price': previous_price,
+                'lowest_price': lowest,
+                'is_lowest': lowest is None or deal['price'] < lowest
+            })
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO price_points "
+                "(app_id, check_date, name, price, old_price, discount, url, image) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (int(d['id']), check_date, d['name'], d['price'], d['old_price'],
+                     d['discount'], d['url'], d['image'])
+                    for d in deals
+                ]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checks (check_date, deal_count) VALUES (?, ?)",
+                (check_date, len(deals))
+            )
+        return results
+
+    async def record_check(self, deals, check_date):
+        """Ghi giá của lần check và trả về deals kèm 'kind', 'previous_price', 'lowest_price', 'is_lowest'
+
+        Gọi lại với cùng check_date không báo lại deals đã ghi (chỉ PRICE_DROP nếu giá thấp hơn lần trước trong ngày).
+        """
+        return await self._run(self._record_check, deals, check_date)
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def _lowest_price(self, app_id):
+        return self._conn.execute(
+            "SELECT MIN(price) FROM price_points WHERE app_id = ?", (int(app_id),)
+        ).fetchone()[0]
+
+    async def lowest_price(self, app_id):
+        """Giá thấp nhất từng ghi nhận của một app"""
+        return await self._run(self._lowest_price, app_id)
+
+    def _last_check(self):
+        row = self._conn.execute(
+            "SELECT check_date, deal_count FROM checks ORDER BY check_date DESC LIMIT 1"
+        ).fetchone()
+        return dict(row) if row else None
+
+    async def last_check(self):
+        """Lần check gần nhất: {'check_date', 'deal_count'} hoặc None"""
+        return await self._run(self._last_check)
+
+    # ------------------------------------------------------------------
+    # Import dữ liệu cũ
+    # ------------------------------------------------------------------
+    async def import_legacy_json(self, path):
+        """Nhập file steam_deals_data.json cũ (nếu DB còn trống) để không báo lại toàn bộ deals"""
+        if not os.path.exists(path) or await self.last_check():
+            return 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            check_date = data.get('last_check_date')
+            deals = list(data.get('deals', {}).values())
+            if not check_date or not deals:
+                return 0
+            await self.record_check(deals, check_date)
+            logger.info(f"📥 Đã nhập {len(deals)} deals từ {path} ({check_date})")
+            return len(deals)
+        except Exception as e:
+            logger.error(f"❌ Lỗi nhập {path}: {e}")
+            return 0
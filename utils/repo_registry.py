@@ -0,0 +1,286 @@
+"""
+Registry các GitHub repositories: load một lần, tra cứu qua index, lưu file bằng atomic write
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+
+logger = logging.getLogger('repo_registry')
+
+# Độ giống tối thiểu (Dice theo bigram ký tự) để một key được gợi ý khi gõ sai chính tả
+FUZZY_MIN_SCORE = 0.4
+# Các field dùng làm key của index phụ; đổi field khác (stars, forks...) không cần đánh index lại
+INDEXED_FIELDS = ('full_name', 'name', 'owner', 'html_url')
+
+
+def _bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+class RepoRegistry:
+    """Danh sách repos trong bộ nhớ, key chính là full_name
+
+    Index phụ:
+        - full_name (lowercase) -> full_name
+        - name (lowercase) -> [full_name, ...] (nhiều owner có thể trùng tên repo)
+        - html_url (lowercase) -> full_name
+        - prefix index: mảng đã sắp xếp (key, full_name) với key là name / full_name / owner (lowercase),
+          cập nhật bằng bisect khi thêm/xóa, dùng cho autocomplete
+        - bigram index: bigram -> {key}, dùng cho gợi ý gần đúng khi không có key nào khớp tiền tố
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = 0
+
+        self._repos = {}
+        self._by_full_name_lower = {}
+        self._by_name = {}
+        self._by_url = {}
+        self._prefix_index = []
+        self._bigram_index = {}
+        self._key_refs = {}
+        self._key_bigram_count = {}
+        self._save_lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # Load / save
+    # ------------------------------------------------------------------
+    def load(self):
+        """Đọc file JSON một lần khi khởi động"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                repos = json.load(f)
+        except FileNotFoundError:
+            repos = []
+        except Exception as e:
+            logger.error(f"❌ Lỗi đọc {self.path}: {e}")
+            repos = []
+
+        self._repos.clear()
+        self._by_full_name_lower.clear()
+        self._by_name.clear()
+        self._by_url.clear()
+        self._prefix_index.clear()
+        self._bigram_index.clear()
+        self._key_refs.clear()
+        self._key_bigram_count.clear()
+        for repo in repos:
+            if repo.get('full_name'):
+                self._index(repo)
+        self.version += 1
+        logger.info(f"📚 Đã load {len(self._repos)} repos từ {self.path}")
+
+    def _write_file(self, repos):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(repos, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        """Ghi toàn bộ registry ra file (ghi file tạm rồi rename, chạy ngoài event loop)"""
+        async with self._save_lock:
+            snapshot = self.all()
+            await asyncio.to_thread(self._write_file, snapshot)
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+    def _index(self, repo):
+        self._repos[repo['full_name']] = repo
+        self._index_keys(repo)
+
+    def _unindex(self, repo):
+        self._repos.pop(repo['full_name'], None)
+        self._unindex_keys(repo)
+
+    def _index_keys(self, repo):
+        full_name = repo['full_name']
+        self._by_full_name_lower[full_name.lower()] = full_name
+        self._by_name.setdefault((repo.get('name') or '').lower(), []).append(full_name)
+        if repo.get('html_url'):
+            self._by_url[repo['html_url'].lower().rstrip('/')] = full_name
+        for key in self._prefix_keys(repo):
+            bisect.insort(self._prefix_index, (key, full_name))
+            self._key_refs[key] = self._key_refs.get(key, 0) + 1
+            if self._key_refs[key] == 1:
+                bigrams = _bigrams(key)
+                self._key_bigram_count[key] = len(bigrams)
+                for bigram in bigrams:
+                    self._bigram_index.setdefault(bigram, set()).add(key)
+
+    def _unindex_keys(self, repo):
+        full_name = repo['full_name']
+        self._by_full_name_lower.pop(full_name.lower(), None)
+        name_key = (repo.get('name') or '').lower()
+        owners = self._by_name.get(name_key, [])
+        if full_name in owners:
+            owners.remove(full_name)
+        if not owners:
+            self._by_name.pop(name_key, None)
+        if repo.get('html_url'):
+            self._by_url.pop(repo['html_url'].lower().rstrip('/'), None)
+        for key in self._prefix_keys(repo):
+            entry = (key, full_name)
+            index = bisect.bisect_left(self._prefix_index, entry)
+            if index < len(self._prefix_index) and self._prefix_index[index] == entry:
+                del self._prefix_index[index]
+            self._key_refs[key] = self._key_refs.get(key, 1) - 1
+            if self._key_refs[key] <= 0:
+                del self._key_refs[key]
+                del self._key_bigram_count[key]
+                for bigram in _bigrams(key):
+                    keys = self._bigram_index.get(bigram)
+                    if keys:
+                        keys.discard(key)
+                        if not keys:
+                            del self._bigram_index[bigram]
+
+    @staticmethod
+    def _prefix_keys(repo):
+        full_name = repo['full_name']
+        owner = repo.get('owner') or full_name.split('/', 1)[0]
+        return {key.lower() for key in (full_name, repo.get('name') or '', owner) if key}
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return len(self._repos)
+
+    def __contains__(self, full_name):
+        return full_name in self._repos
+
+    def all(self):
+        """Danh sách repos theo thứ tự thêm vào"""
+        return list(self._repos.values())
+
+    def get(self, full_name):
+        return self._repos.get(full_name)
+
+    def find(self, identifier):
+        """Tìm repo theo name, owner/repo (full_name) hoặc URL GitHub
+
+        Tra cứu qua index trước, chỉ quét danh sách khi input là một phần của URL.
+        """
+        search_term = identifier.strip().lower()
+        if not search_term:
+            return None
+
+        full_name = self._by_full_name_lower.get(search_term) or self._by_url.get(search_term.rstrip('/'))
+        if full_name:
+            return self._repos[full_name]
+
+        owners = self._by_name.get(search_term)
+        if owners:
+            return self._repos[owners[0]]
+
+        # Cho phép match một phần URL (vd: github.com/owner/repo)
+        for url, full_name in self._by_url.items():
+            if search_term in url:
+                return self._repos[full_name]
+        return None
+
+    def suggest(self, text, limit=25):
+        """Gợi ý full_name cho autocomplete: khớp tiền tố (name, full_name, owner) trước, sau đó fuzzy
+
+        Chỉ dùng index trong bộ nhớ, không đọc file.
+        """
+        search_term = text.strip().lower()
+        if not search_term:
+            return list(self._repos)[-limit:][::-1]
+
+        # Cho phép dán URL GitHub
+        if '/' in search_term and 'github.com/' in search_term:
+            search_term = search_term.split('github.com/', 1)[1].rstrip('/')
+
+        results = []
+        seen = set()
+        index = bisect.bisect_left(self._prefix_index, (search_term, ''))
+        while index < len(self._prefix_index) and len(results) < limit:
+            key, full_name = self._prefix_index[index]
+            if not key.startswith(search_term):
+                break
+            if full_name not in seen:
+                seen.add(full_name)
+                results.append(full_name)
+            index += 1
+
+        if not results:
+            # Gõ sai chính tả: chấm điểm Dice theo bigram, chỉ xét các key có chung bigram
+            term_bigrams = _bigrams(search_term)
+            common = {}
+            for bigram in term_bigrams:
+                for key in self._bigram_index.get(bigram, ()):
+                    common[key] = common.get(key, 0) + 1
+            scored = []
+            key_sizes = self._key_bigram_count
+            for key, count in common.items():
+                score = 2 * count / (len(term_bigrams) + key_sizes[key])
+                if score >= FUZZY_MIN_SCORE:
+                    scored.append((score, key))
+            scored.sort(key=lambda item: (-item[0], item[1]))
+            for _, key in scored:
+                index = bisect.bisect_left(self._prefix_index, (key, ''))
+                while index < len(self._prefix_index) and self._prefix_index[index][0] == key:
+                    full_name = self._prefix_index[index][1]
+                    if full_name not in seen:
+                        seen.add(full_name)
+                        results.append(full_name)
+                    index += 1
+                if len(results) >= limit:
+                    break
+            results = results[:limit]
+        return results
+
+    # ------------------------------------------------------------------
+    # Thay đổi
+    # ------------------------------------------------------------------
+    def add(self, repo):
+        """Thêm repo mới, trả về False nếu full_name đã tồn tại"""
+        if repo['full_name'] in self._repos:
+            return False
+        self._index(repo)
+        self.version += 1
+        return True
+
+    def update(self, full_name, fields):
+        """Cập nhật các field của repo tại chỗ, trả về repo hoặc None
+
+        Giữ nguyên vị trí của repo trong thứ tự thêm vào; chỉ đánh index lại khi name/owner/url/full_name đổi.
+        Đổi full_name sang tên của một repo khác đã có trong registry bị từ chối (trả về None, không đổi gì).
+        """
+        repo = self._repos.get(full_name)
+        if not repo:
+            return None
+        new_full_name = fields.get('full_name', full_name)
+        if new_full_name != full_name and new_full_name in self._repos:
+            logger.warning(f"⚠️  Không đổi tên {full_name} -> {new_full_name}: repo này đã có trong registry")
+            return None
+        if not any(field in fields and fields[field] != repo.get(field) for field in INDEXED_FIELDS):
+            repo.update(fields)
+        else:
+            self._unindex_keys(repo)
+            repo.update(fields)
+            if repo['full_name'] != full_name:
+                # Repo đổi tên trên GitHub: đổi key nhưng giữ vị trí
+                self._repos = {
+                    (repo['full_name'] if key == full_name else key): value
+                    for key, value in self._repos.items()
+                }
+            self._index_keys(repo)
+        self.version += 1
+        return repo
+
+    def remove(self, full_name):
+        """Xóa repo theo full_name, trả về repo đã xóa hoặc None"""
+        repo = self._repos.get(full_name)
+        if not repo:
+            return None
+        self._unindex(repo)
+        self.version += 1
+        return repo
@@ -0,0 +1,232 @@
+"""
+Scheduler theo giờ thực: chạy job "mỗi ngày lúc HH:MM" hoặc theo chu kỳ, lưu lịch chạy qua các lần restart
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('scheduler')
+
+STATE_FILE = "data/scheduler.json"
+
+# Ngủ tối đa chừng này giây mỗi lần để tự điều chỉnh khi đồng hồ hệ thống thay đổi
+MAX_SLEEP_SECONDS = 300
+
+
+class DailyTrigger:
+    """Chạy mỗi ngày vào một giờ cố định (giờ local)"""
+
+    def __init__(self, hour, minute=0):
+        self.hour = hour
+        self.minute = minute
+
+    def next_after(self, moment):
+        candidate = moment.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if candidate <= moment:
+            candidate += timedelta(days=1)
+        return candidate
+
+    def describe(self):
+        return f"daily {self.hour:02d}:{self.minute:02d}"
+
+
+class IntervalTrigger:
+    """Chạy lặp lại sau mỗi khoảng thời gian"""
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def next_after(self, moment):
+        return moment + self.interval
+
+    def describe(self):
+        return f"every {int(self.interval.total_seconds())}s"
+
+
+def daily_at(time_text):
+    """Tạo DailyTrigger từ chuỗi "HH:MM" """
+    hour, minute = (int(part) for part in time_text.strip().split(':', 1))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Giờ không hợp lệ: {time_text}")
+    return DailyTrigger(hour, minute)
+
+
+def every(hours=0, minutes=0, seconds=0):
+    return IntervalTrigger(timedelta(hours=hours, minutes=minutes, seconds=seconds))
+
+
+class Job:
+    def __init__(self, name, func, trigger):
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.next_run = None
+        self.last_run = None
+        self.running = False
+        # Giờ đến hạn của lượt đang chạy (lưu lại cho tới khi chạy xong)
+        self.running_due = None
+
+
+class Scheduler:
+    """Chạy các job đã đăng ký khi tới giờ, sau khi bot sẵn sàng
+
+    Lịch (next_run, last_run) được lưu ở data/scheduler.json. Job bị lỡ trong lúc bot tắt
+    sẽ chạy một lần ngay khi bot khởi động lại.
+    """
+
+    def __init__(self, bot, state_file=STATE_FILE):
+        self.bot = bot
+        self.state_file = state_file
+        self.jobs = {}
+        self._state = self._load_state()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._tasks = set()
+
+    # ------------------------------------------------------------------
+    # Trạng thái
+    # ------------------------------------------------------------------
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"❌ Lỗi đọc {self.state_file}: {e}")
+            return {}
+
+    def _save_state(self):
+        for job in self.jobs.values():
+            # Job đang chạy vẫn lưu giờ đến hạn cũ, để chạy lại nếu bot tắt giữa chừng
+            next_run = job.running_due if job.running else job.next_run
+            self._state[job.name] = {
+                'trigger': job.trigger.describe(),
+                'next_run': next_run.isoformat() if next_run else None,
+                'last_run': job.last_run.isoformat() if job.last_run else None
+            }
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.error(f"❌ Lỗi lưu {self.state_file}: {e}")
+
+    # ------------------------------------------------------------------
+    # Đăng ký job
+    # ------------------------------------------------------------------
+    def add_job(self, name, func, trigger, run_on_first_start=False):
+        """Đăng ký job
+
+        Args:
+            name: Tên duy nhất, dùng làm key lưu lịch
+            func: Coroutine function không tham số
+            trigger: DailyTrigger / IntervalTrigger
+            run_on_first_start: Chạy ngay nếu job chưa từng có lịch được lưu
+        """
+        now = datetime.now()
+        job = Job(name, func, trigger)
+        saved = self._state.get(name, {})
+
+        if saved.get('last_run'):
+            job.last_run = datetime.fromisoformat(saved['last_run'])
+
+        if saved.get('next_run') and saved.get('trigger') == trigger.describe():
+            # Nếu next_run đã qua (bot tắt lúc tới giờ) thì job sẽ chạy ngay
+            job.next_run = datetime.fromisoformat(saved['next_run'])
+        elif not saved and run_on_first_start:
+            job.next_run = now
+        else:
+            job.next_run = trigger.next_after(now)
+
+        self.jobs[name] = job
+        self._save_state()
+        self._wakeup.set()
+        logger.info(f"🗓  Đăng ký job {name} ({trigger.describe()}), lần chạy tới: {job.next_run:%Y-%m-%d %H:%M}")
+        return job
+
+    def remove_job(self, name):
+        self.jobs.pop(name, None)
+        self._wakeup.set()
+
+    def run_soon(self, name, delay):
+        """Chạy job thêm một lượt sau `delay` (timedelta), ví dụ để thử lại khi lượt vừa rồi thất bại
+
+        Chỉ đổi nếu sớm hơn lịch hiện tại; sau lượt đó job quay lại lịch của trigger. Trả về lần chạy tới.
+        """
+        job = self.jobs.get(name)
+        if not job:
+            return None
+        run_at = datetime.now() + delay
+        if not job.next_run or run_at < job.next_run:
+            job.next_run = run_at
+            self._save_state()
+            self._wakeup.set()
+        return job.next_run
+
+    def next_run(self, name):
+        job = self.jobs.get(name)
+        return job.next_run if job else None
+
+    # ------------------------------------------------------------------
+    # Vòng chạy
+    # ------------------------------------------------------------------
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_job(self, job):
+        started = datetime.now()
+        logger.info(f"▶️  Chạy job {job.name}")
+        try:
+            await job.func()
+        except Exception as e:
+            logger.error(f"❌ Job {job.name} lỗi: {e}")
+            logger.exception(e)
+        finally:
+            job.running = False
+            job.running_due = None
+            job.last_run = started
+            self._save_state()
+
+    async def _run_loop(self):
+        await self.bot.wait_until_ready()
+        while True:
+            now = datetime.now()
+            for job in list(self.jobs.values()):
+                if not job.next_run or job.next_run > now:
+                    continue
+                due = job.next_run
+                job.next_run = job.trigger.next_after(now)
+                if job.running:
+                    logger.warning(f"⏭  Job {job.name} vẫn đang chạy, bỏ qua lượt này")
+                    continue
+                job.running = True
+                job.running_due = due
+                task = asyncio.create_task(self._run_job(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            upcoming = [job.next_run for job in self.jobs.values() if job.next_run]
+            delay = MAX_SLEEP_SECONDS
+            if upcoming:
+                delay = min(delay, max(0.0, (min(upcoming) - datetime.now()).total_seconds()))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
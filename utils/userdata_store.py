@@ -0,0 +1,200 @@
+"""
+Userdata store: SQLite (WAL) chạy ngoài event loop, gom writes theo batch và có LRU cache
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('userdata')
+
+# Đánh dấu key đã đọc từ DB nhưng không có giá trị (cache cả kết quả rỗng)
+_MISSING = object()
+# Đánh dấu key chưa có trong cache
+_NOT_CACHED = object()
+
+
+class UserdataStore:
+    """Lưu trữ userdata theo (user_id, variable)
+
+    - Mọi query chạy trên một worker thread riêng (sqlite connection chỉ dùng trong thread đó)
+    - set() chỉ ghi vào bộ đệm, flush định kỳ trong một transaction duy nhất
+    - get() đọc từ bộ đệm ghi -> LRU cache -> DB
+    """
+
+    def __init__(self, path, flush_interval=2.0, cache_size=1024):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+
+        self._executor = None
+        self._conn = None
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # Vòng đời
+    # ------------------------------------------------------------------
+    async def open(self):
+        """Mở database (WAL) và bắt đầu vòng flush định kỳ"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="userdata")
+        await self._run(self._connect)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"💾 Đã mở userdata database: {self.path}")
+
+    async def close(self):
+        """Flush toàn bộ writes còn lại rồi đóng database"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+        if self._executor:
+            await self.flush()
+            await self._run(self._disconnect)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            logger.info("💾 Đã đóng userdata database")
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS userdata ("
+            "user_id INTEGER NOT NULL, "
+            "variable TEXT NOT NULL, "
+            "value, "
+            "PRIMARY KEY (user_id, variable))"
+        )
+        self._conn.commit()
+
+    def _disconnect(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, func, *args):
+        """Chạy hàm đồng bộ trên worker thread của database"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ------------------------------------------------------------------
+    # LRU cache
+    # ------------------------------------------------------------------
+    def _cache_get(self, key):
+        value = self._cache.get(key, _NOT_CACHED)
+        if value is not _NOT_CACHED:
+            self._cache.move_to_end(key)
+        return value
+
+    def _cache_put(self, key, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Đọc
+    # ------------------------------------------------------------------
+    def _select_many(self, keys):
+        results = {}
+        cursor = self._conn.cursor()
+        for user_id, variable in keys:
+            cursor.execute(
+                "SELECT value FROM userdata WHERE user_id = ? AND variable = ?",
+                (user_id, variable)
+            )
+            row = cursor.fetchone()
+            results[(user_id, variable)] = row[0] if row else _MISSING
+        return results
+
+    async def get(self, user_id, variable, default=None):
+        """Đọc một giá trị, trả về default nếu không có"""
+        results = await self.get_many([(user_id, variable)], default=default)
+        return results[(user_id, variable)]
+
+    async def get_many(self, keys, default=None):
+        """Đọc nhiều (user_id, variable) cùng lúc, chỉ query DB cho những key chưa có trong cache
+
+        Returns:
+            dict: {(user_id, variable): value}
+        """
+        results = {}
+        missing = []
+        for key in keys:
+            if key in self._pending:
+                results[key] = self._pending[key]
+                continue
+            cached = self._cache_get(key)
+            if cached is not _NOT_CACHED:
+                results[key] = default if cached is _MISSING else cached
+            else:
+                missing.append(key)
+
+        if missing:
+            fetched = await self._run(self._select_many, missing)
+            for key, value in fetched.items():
+                # Có thể đã có write mới trong lúc chờ query
+                if key in self._pending:
+                    results[key] = self._pending[key]
+                    continue
+                self._cache_put(key, value)
+                results[key] = default if value is _MISSING else value
+
+        return results
+
+    # ------------------------------------------------------------------
+    # Ghi
+    # ------------------------------------------------------------------
+    def set(self, user_id, variable, value):
+        """Ghi một giá trị vào bộ đệm (được flush trong batch tiếp theo)"""
+        key = (user_id, variable)
+        self._pending[key] = value
+        self._cache_put(key, value)
+
+    def set_many(self, items):
+        """Ghi nhiều giá trị: items là dict {(user_id, variable): value}"""
+        for (user_id, variable), value in items.items():
+            self.set(user_id, variable, value)
+
+    def _write_batch(self, batch):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO userdata (user_id, variable, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, variable) DO UPDATE SET value = excluded.value",
+                [(user_id, variable, value) for (user_id, variable), value in batch.items()]
+            )
+
+    async def flush(self):
+        """Ghi tất cả writes đang chờ trong một transaction"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            try:
+                await self._run(self._write_batch, batch)
+            except Exception as e:
+                # Trả lại batch vào hàng đợi, không ghi đè các giá trị mới hơn
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+                logger.error(f"❌ Lỗi khi flush {len(batch)} userdata: {e}")
+                raise
+            logger.debug(f"💾 Đã flush {len(batch)} userdata")
+            return len(batch)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                pass
@@ -0,0 +1,192 @@
+"""
+Đăng nội dung lên Discord webhook bằng cách sửa các tin nhắn đã gửi (PATCH) thay vì gửi tin mới
+
+Mỗi trang (payload của một tin nhắn) được so hash với lần đăng trước, chỉ trang thay đổi mới được gửi lại.
+Nhiều yêu cầu đăng liên tiếp được gộp thành một lần (debounce).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger('webhook_publisher')
+
+STATE_FILE = "data/webhook_state.json"
+DEBOUNCE_SECONDS = 3
+
+
+def page_hash(page):
+    """Hash nội dung trang, bỏ qua timestamp của embed (timestamp đổi mỗi lần build)"""
+    content = dict(page)
+    if 'embeds' in content:
+        content['embeds'] = [{k: v for k, v in embed.items() if k != 'timestamp'} for embed in content['embeds']]
+    return hashlib.sha1(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class WebhookPublisher:
+    """Giữ danh sách message ID đã đăng cho một webhook và cập nhật chúng tại chỗ
+
+    build_pages() trả về list payload (mỗi payload là một tin nhắn: {"embeds": [...]}) tại thời điểm đăng.
+    """
+
+    def __init__(self, get_session, webhook_url, build_pages, debounce=DEBOUNCE_SECONDS, state_file=STATE_FILE):
+        self.get_session = get_session
+        self.webhook_url = webhook_url
+        self.build_pages = build_pages
+        self.debounce = debounce
+        self.state_file = state_file
+        self.messages = self._load_state()
+        self.last_result = None
+        self._lock = asyncio.Lock()
+        self._timer = None
+
+    # ------------------------------------------------------------------
+    # Trạng thái
+    # ------------------------------------------------------------------
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.error(f"❌ Lỗi đọc {self.state_file}: {e}")
+            return []
+        # State tách theo webhook để đổi URL thì không sửa nhầm tin nhắn của webhook cũ
+        return state.get(self._state_key(), [])
+
+    def _state_key(self):
+        return hashlib.sha1(self.webhook_url.encode('utf-8')).hexdigest()[:12]
+
+    def _save_state(self):
+        try:
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (FileNotFoundError, ValueError):
+                state = {}
+            state[self._state_key()] = self.messages
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.error(f"❌ Lỗi lưu {self.state_file}: {e}")
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+    async def _create(self, page):
+        # ?wait=true để Discord trả về message (lấy ID)
+        async with self.get_session().post(f"{self.webhook_url}?wait=true", json=page) as response:
+            if response.status != 200:
+                logger.error(f"❌ Webhook POST trả về {response.status}")
+                return None
+            data = await response.json()
+            return data['id']
+
+    async def _edit(self, message_id, page):
+        """PATCH một tin nhắn, trả về True / False, hoặc None nếu tin nhắn không còn"""
+        async with self.get_session().patch(f"{self.webhook_url}/messages/{message_id}", json=page) as response:
+            if response.status == 404:
+                return None
+            if response.status != 200:
+                logger.error(f"❌ Webhook PATCH {message_id} trả về {response.status}")
+            return response.status == 200
+
+    async def _delete(self, message_id):
+        async with self.get_session().delete(f"{self.webhook_url}/messages/{message_id}") as response:
+            return response.status in (204, 404)
+
+    # ------------------------------------------------------------------
+    # Đăng
+    # ------------------------------------------------------------------
+    async def _publish(self):
+        pages = self.build_pages()
+        result = {'created': 0, 'edited': 0, 'unchanged': 0, 'deleted': 0, 'failed': 0}
+        messages = []
+        # Số tin nhắn cũ (theo vị trí) đã xử lý xong; phần còn lại được giữ nguyên nếu lỗi/huỷ giữa chừng
+        done = 0
+
+        try:
+            for index, page in enumerate(pages):
+                done = index
+                digest = page_hash(page)
+                previous = self.messages[index] if index < len(self.messages) else None
+
+                if previous and previous['hash'] == digest:
+                    result['unchanged'] += 1
+                    messages.append(previous)
+                    continue
+
+                if previous:
+                    edited = await self._edit(previous['id'], page)
+                    if edited:
+                        result['edited'] += 1
+                        messages.append({'id': previous['id'], 'hash': digest})
+                        continue
+                    if edited is False:
+                        result['failed'] += 1
+                        messages.append(previous)
+                        continue
+                    # Tin nhắn đã bị xoá thủ công -> gửi lại
+
+                message_id = await self._create(page)
+                if message_id:
+                    result['created'] += 1
+                    messages.append({'id': message_id, 'hash': digest})
+                else:
+                    result['failed'] += 1
+
+            # Ít trang hơn lần trước -> xoá các tin nhắn thừa
+            for index in range(len(pages), len(self.messages)):
+                done = index
+                extra = self.messages[index]
+                if await self._delete(extra['id']):
+                    result['deleted'] += 1
+                else:
+                    result['failed'] += 1
+                    messages.append(extra)
+            done = max(len(pages), len(self.messages))
+        finally:
+            # Lưu cả khi lỗi giữa chừng để không mất ID các tin nhắn vừa tạo (lần sau sẽ sửa thay vì gửi trùng)
+            self.messages = messages + self.messages[done:]
+            self._save_state()
+
+        self.last_result = result
+        logger.info(f"📤 Webhook: {result}")
+        return result
+
+    async def publish_now(self):
+        """Đăng ngay (huỷ lần đăng đang chờ debounce), trả về số tin nhắn created/edited/unchanged/deleted/failed"""
+        if self._timer and not self._timer.done():
+            self._timer.cancel()
+        async with self._lock:
+            try:
+                return await self._publish()
+            except Exception as e:
+                logger.error(f"❌ Lỗi đăng webhook: {e}")
+                return None
+
+    def request_publish(self):
+        """Yêu cầu đăng sau debounce; các yêu cầu liên tiếp được gộp thành một lần đăng"""
+        if self._timer and not self._timer.done():
+            self._timer.cancel()
+        self._timer = asyncio.create_task(self._publish_after_debounce())
+
+    async def _publish_after_debounce(self):
+        await asyncio.sleep(self.debounce)
+        self._timer = None
+        async with self._lock:
+            try:
+                await self._publish()
+            except Exception as e:
+                logger.error(f"❌ Lỗi đăng webhook: {e}")
+
+    async def stop(self):
+        """Đăng nốt yêu cầu đang chờ (nếu có) trước khi dừng"""
+        if self._timer and not self._timer.done():
+            self._timer.cancel()
+            await self.publish_now()